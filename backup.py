@@ -0,0 +1,834 @@
+# backup.py
+"""
+Backup & restore dengan format JSON yang sama:
+
+    {"meta": {...}, "accounts": [...], "products": [...], "customers": [...],
+     "suppliers": [...], "expenses": [...], "recipes": {"<product_id>": [...]},
+     "sales": [{..., "items": [...]}], "purchases": [{..., "items": [...]}],
+     "purchase_plans": [{..., "items": [...]}], "stock_movements": [...],
+     "cash_ledger": [...]}
+
+Urutan section = urutan dependency (parent dulu), id asli ikut disimpan.
+
+Export ditulis sebagai stream JSON (+ gzip) supaya memory tetap konstan walau
+jutaan baris:
+- tiap tabel dibaca pakai server-side cursor (yield_per / stream_results)
+- JSON ditulis per baris, gzip di-compress per potongan
+- header + items digabung lewat merge dua cursor yang sama-sama urut id
+  header, tanpa query per order
+
+Backup incremental (`since` = watermark dari backup sebelumnya) hanya berisi
+baris yang berubah: tabel dengan updated_at pakai watermark waktu, tabel
+append-only pakai high-water mark id. Baris yang dihapus tidak ikut, jadi
+rantai tetap perlu di-reset dengan backup full secara berkala.
+
+Restore membaca file (json / json.gz) secara bertahap juga: satu pass untuk
+validasi & hitung baris, lalu wipe tabel (child dulu) dan insert executemany
+per chunk, semua dalam satu transaksi. Backup incremental di-upsert tanpa
+wipe. Sequence id di-reset di akhir.
+"""
+import base64
+import binascii
+import gzip
+import json
+import zlib
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Callable, Iterator
+
+from sqlalchemy import Boolean, Date, DateTime, Integer, Numeric, case, delete, func, insert, or_, select, text
+from sqlalchemy.orm import Session
+
+import models, customer_metrics
+from db import Base, ReadSessionLocal, SessionLocal, dialect_insert, use_deferred_begin
+
+BACKUP_APP = "makadam_inventory"
+BACKUP_VERSION = "3"
+FETCH_SIZE = 2000
+GZIP_CHUNK_SIZE = 256 * 1024
+
+# Overlap watermark: transaksi yang commit telat (updated_at / id-nya lebih kecil
+# dari watermark) tetap terbawa di increment berikutnya. Restore incremental
+# berupa upsert, jadi baris yang terbawa dua kali aman.
+INCREMENTAL_TIME_OVERLAP = timedelta(minutes=10)
+INCREMENTAL_ID_OVERLAP = 1000
+
+
+class BackupError(Exception):
+    """Parameter / file backup tidak valid (ditampilkan ke user sebagai 400)."""
+
+
+@dataclass(frozen=True)
+class Section:
+    name: str
+    model: type
+    item_model: type | None = None   # baris punya "items" (child dengan FK ke header)
+    item_fk: str | None = None
+    grouped: bool = False            # {"<product_id>": [rows]} alih-alih [rows]
+    incremental: str = "id"          # "updated_at" | "id" | "full"
+    # ikutkan juga baris yang parent-nya berubah (kolom FK, model parent ber-updated_at)
+    follow: tuple | None = None
+
+    @property
+    def tables(self) -> list:
+        tables = [self.model.__table__]
+        if self.item_model is not None:
+            tables.append(self.item_model.__table__)
+        return tables
+
+
+SECTIONS = [
+    Section("accounts", models.Account, incremental="updated_at"),
+    Section("products", models.Product, incremental="updated_at"),
+    Section("customers", models.Customer, incremental="updated_at"),
+    Section("suppliers", models.Supplier),
+    Section("expenses", models.Expense),
+    Section("recipes", models.ProductRecipe, grouped=True, incremental="full"),
+    # merge customer memindah sales lama -> ikutkan sales milik customer yang berubah
+    Section("sales", models.SalesOrder, models.SalesOrderItem, "sales_order_id",
+            follow=("customer_id", models.Customer)),
+    Section("purchases", models.PurchaseOrder, models.PurchaseOrderItem, "purchase_order_id"),
+    Section("purchase_plans", models.PurchasePlan, models.PurchasePlanItem, "plan_id", incremental="updated_at"),
+    Section("production_orders", models.ProductionOrder, models.ProductionOrderItem, "production_order_id"),
+    # status & lines stock opname berubah tanpa updated_at -> selalu diganti seluruhnya
+    Section("stock_takes", models.StockTake, models.StockTakeLine, "stock_take_id", incremental="full"),
+    Section("stock_movements", models.StockMovement),
+    Section("cash_ledger", models.CashLedger),
+]
+SECTIONS_BY_NAME = {section.name: section for section in SECTIONS}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Tidak bisa serialize {type(value).__name__}")
+
+
+_encode = json.JSONEncoder(default=_json_default, ensure_ascii=False, separators=(",", ":")).encode
+
+
+# =====================================================
+# WATERMARK (incremental)
+# =====================================================
+def take_watermark(db: Session) -> dict:
+    """Posisi data saat ini: waktu DB + max id tabel append-only (dalam snapshot yang sama)."""
+    now_expr = func.now()
+    if db.get_bind().dialect.name == "postgresql":
+        # di read replica, data baru sampai transaksi terakhir yang di-replay:
+        # pakai waktu itu supaya baris yang belum tereplikasi ikut increment berikutnya
+        now_expr = case(
+            (func.pg_is_in_recovery(), func.coalesce(func.pg_last_xact_replay_timestamp(), func.now())),
+            else_=func.now(),
+        )
+    now = db.execute(select(now_expr)).scalar()
+    if isinstance(now, str):
+        now = datetime.fromisoformat(now)
+    ids = {}
+    for section in SECTIONS:
+        if section.incremental == "id":
+            ids[section.name] = db.execute(select(func.max(section.model.__table__.c.id))).scalar() or 0
+    return {"at": now.isoformat(), "ids": ids}
+
+
+def encode_watermark(watermark: dict) -> str:
+    raw = json.dumps(watermark, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_watermark(token: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        watermark = json.loads(raw)
+        datetime.fromisoformat(watermark["at"])
+        if not isinstance(watermark["ids"], dict):
+            raise TypeError
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise BackupError("Watermark `since` tidak valid")
+    return watermark
+
+
+def _changed_filter(section: Section, since: dict | None):
+    """Kondisi WHERE untuk baris header yang ikut backup incremental (None = semua)."""
+    if since is None or section.incremental == "full":
+        return None
+    table = section.model.__table__
+    changed_at = datetime.fromisoformat(since["at"]) - INCREMENTAL_TIME_OVERLAP
+    if section.incremental == "updated_at":
+        condition = table.c.updated_at >= changed_at
+    else:
+        condition = table.c.id > since["ids"].get(section.name, 0) - INCREMENTAL_ID_OVERLAP
+    if section.follow:
+        fk, parent = section.follow
+        parent_table = parent.__table__
+        condition = or_(
+            condition,
+            table.c[fk].in_(select(parent_table.c.id).where(parent_table.c.updated_at >= changed_at)),
+        )
+    return condition
+
+
+# =====================================================
+# EXPORT
+# =====================================================
+def stream_rows(db: Session, model, order_by=None, where=None) -> Iterator[dict]:
+    """Semua kolom tabel sebagai dict, dibaca bertahap (server-side cursor)."""
+    table = model.__table__
+    stmt = select(table).order_by(*(order_by if order_by is not None else table.primary_key.columns))
+    if where is not None:
+        stmt = stmt.where(where)
+    for row in db.execute(stmt.execution_options(yield_per=FETCH_SIZE)):
+        yield dict(row._mapping)
+
+
+def rows_with_items(db: Session, section: Section, where=None) -> Iterator[dict]:
+    """Header + list items, dari dua cursor yang sama-sama urut id header."""
+    header_table = section.model.__table__
+    fk_col = section.item_model.__table__.c[section.item_fk]
+    item_where = fk_col.isnot(None)
+    if where is not None:
+        item_where = fk_col.in_(select(header_table.c.id).where(where))
+    items = stream_rows(
+        db,
+        section.item_model,
+        order_by=[fk_col, section.item_model.__table__.c.id],
+        where=item_where,
+    )
+    fk = section.item_fk
+    pending = next(items, None)
+
+    for header in stream_rows(db, section.model, where=where):
+        # item yatim (header-nya tidak ada) dilewati
+        while pending is not None and pending[fk] < header["id"]:
+            pending = next(items, None)
+        lines = []
+        while pending is not None and pending[fk] == header["id"]:
+            lines.append(pending)
+            pending = next(items, None)
+        header["items"] = lines
+        yield header
+
+
+def _json_array(rows: Iterator[dict]) -> Iterator[str]:
+    yield "["
+    sep = ""
+    for row in rows:
+        yield sep + _encode(row)
+        sep = ","
+    yield "]"
+
+
+def _json_recipes(db: Session) -> Iterator[str]:
+    """recipes = {product_id: [komponen, ...]}, ditulis bertahap urut product_id."""
+    recipe = models.ProductRecipe.__table__
+    yield "{"
+    current = None
+    for row in stream_rows(
+        db,
+        models.ProductRecipe,
+        order_by=[recipe.c.product_id, recipe.c.id],
+        where=recipe.c.product_id.isnot(None),
+    ):
+        if row["product_id"] != current:
+            if current is not None:
+                yield "],"
+            current = row["product_id"]
+            yield _encode(str(current)) + ":[" + _encode(row)
+        else:
+            yield "," + _encode(row)
+    if current is not None:
+        yield "]"
+    yield "}"
+
+
+def iter_backup_json(db: Session, since: str | None = None) -> Iterator[str]:
+    """Potongan-potongan teks JSON backup (full, atau incremental kalau ada `since`)."""
+    since_watermark = decode_watermark(since) if since else None
+    meta = {
+        "generated_at": datetime.now(timezone.utc),
+        "app": BACKUP_APP,
+        "version": BACKUP_VERSION,
+        "type": "incremental" if since else "full",
+        "since": since,
+        "watermark": encode_watermark(take_watermark(db)),
+    }
+    yield '{"meta":' + _encode(meta)
+
+    for section in SECTIONS:
+        yield f',"{section.name}":'
+        if section.grouped:
+            yield from _json_recipes(db)
+            continue
+        where = _changed_filter(section, since_watermark)
+        if section.item_model is not None:
+            yield from _json_array(rows_with_items(db, section, where=where))
+        else:
+            yield from _json_array(stream_rows(db, section.model, where=where))
+
+    yield "}"
+
+
+def iter_gzip(chunks: Iterator[str], level: int = 6) -> Iterator[bytes]:
+    """Compress stream teks jadi gzip (wbits=31), keluar per ~GZIP_CHUNK_SIZE byte input."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    buffer, size = [], 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        buffer.append(data)
+        size += len(data)
+        if size >= GZIP_CHUNK_SIZE:
+            out = compressor.compress(b"".join(buffer))
+            buffer, size = [], 0
+            if out:
+                yield out
+    out = compressor.compress(b"".join(buffer)) + compressor.flush()
+    if out:
+        yield out
+
+
+def open_snapshot_session(read: bool = False) -> Session:
+    """
+    Session baca dengan satu snapshot konsisten untuk semua tabel (postgres).
+    read=True: dari read replica (DATABASE_READ_URL) kalau ada.
+    """
+    db = ReadSessionLocal() if read else SessionLocal()
+    if db.get_bind().dialect.name == "postgresql":
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    else:
+        use_deferred_begin(db)
+    return db
+
+
+def stream_backup(compress: bool = True, since: str | None = None, read: bool = False) -> Iterator[bytes]:
+    """
+    Generator bytes backup, pakai session sendiri (bukan session request,
+    karena dibaca setelah endpoint return). Validasi `since` dulu
+    (decode_watermark) sebelum mulai streaming.
+    """
+    db = open_snapshot_session(read=read)
+    try:
+        chunks = iter_backup_json(db, since=since)
+        if compress:
+            yield from iter_gzip(chunks)
+        else:
+            for chunk in chunks:
+                yield chunk.encode("utf-8")
+    finally:
+        db.rollback()
+        db.close()
+
+
+# =====================================================
+# RESTORE
+# =====================================================
+RESTORE_CHUNK_SIZE = 1000
+READ_CHUNK_SIZE = 1 << 20
+
+
+class RestoreError(BackupError):
+    """File backup tidak valid / tidak bisa di-restore (ditampilkan ke user sebagai 400)."""
+
+
+# Cache turunan yang ikut dikosongkan kalau tabel sumbernya di-restore
+DERIVED_TABLES = {
+    "products": [models.RecipeCost],
+    "recipes": [models.RecipeCost],
+    "customers": [models.CustomerStats],
+    "sales": [models.CustomerStats],
+}
+
+
+class JsonStreamReader:
+    """
+    Parser JSON incremental di atas file teks: struktur luar (object / array)
+    dibaca token per token, tiap elemen di-decode dengan raw_decode (C), jadi
+    hanya satu elemen yang ada di memory.
+    """
+
+    def __init__(self, f, chunk_size: int = READ_CHUNK_SIZE):
+        self._f = f
+        self._chunk_size = chunk_size
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            buf, pos = self._buf, self._pos
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                raise RestoreError("File backup terpotong (JSON tidak lengkap)")
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise RestoreError(f"JSON tidak valid: diharapkan '{char}' di dekat '{self._buf[self._pos:self._pos + 20]}'")
+        self._pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+                # angka di ujung buffer bisa saja belum lengkap
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return obj
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise RestoreError(f"JSON tidak valid: {e.msg}")
+            self._fill()
+
+    def iter_object(self) -> Iterator[str]:
+        """Yield key; pemanggil wajib membaca value-nya sebelum lanjut."""
+        self.expect("{")
+        if self.peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise RestoreError("JSON tidak valid: key object harus string")
+            self.expect(":")
+            yield key
+            char = self.peek()
+            self._pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise RestoreError("JSON tidak valid: diharapkan ',' atau '}'")
+
+    def iter_array(self) -> Iterator:
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self._pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise RestoreError("JSON tidak valid: diharapkan ',' atau ']'")
+
+    def skip(self):
+        char = self.peek()
+        if char == "[":
+            for _ in self.iter_array():
+                pass
+        elif char == "{":
+            for _ in self.iter_object():
+                self.skip()
+        else:
+            self.value()
+
+    def expect_end(self):
+        try:
+            self.peek()
+        except RestoreError:
+            return
+        raise RestoreError("JSON tidak valid: ada data setelah object utama")
+
+
+def open_backup_file(path: str):
+    """Buka file backup sebagai teks, otomatis gunzip kalau diawali magic gzip."""
+    with open(path, "rb") as f:
+        magic = f.read(2)
+    if magic == b"\x1f\x8b":
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _section_rows(reader: JsonStreamReader, section: Section) -> Iterator:
+    if section.grouped:
+        if reader.peek() != "{":
+            raise RestoreError("Section recipes harus object {product_id: [...]}")
+        for _ in reader.iter_object():
+            yield from reader.iter_array()
+    else:
+        if reader.peek() != "[":
+            raise RestoreError("Section harus berupa array")
+        yield from reader.iter_array()
+
+
+def scan_backup(f) -> tuple[dict | None, dict[str, int]]:
+    """
+    Pass pertama: validasi JSON dan hitung baris per section (urut sesuai file),
+    tanpa menyentuh database.
+    """
+    reader = JsonStreamReader(f)
+    meta = None
+    counts: dict[str, int] = {}
+    for key in reader.iter_object():
+        if key == "meta":
+            meta = reader.value()
+        elif key in SECTIONS_BY_NAME:
+            counts[key] = sum(1 for _ in _section_rows(reader, SECTIONS_BY_NAME[key]))
+        else:
+            reader.skip()
+    reader.expect_end()
+    return meta, counts
+
+
+def _to_datetime(value):
+    return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+
+
+def _to_date(value):
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "t", "yes")
+    return bool(value)
+
+
+def _column_converters(table) -> dict:
+    converters = {}
+    for col in table.columns:
+        if isinstance(col.type, DateTime):
+            converters[col.name] = _to_datetime
+        elif isinstance(col.type, Date):
+            converters[col.name] = _to_date
+        elif isinstance(col.type, Numeric):
+            converters[col.name] = lambda v: Decimal(str(v))
+        elif isinstance(col.type, Integer):
+            converters[col.name] = int
+        elif isinstance(col.type, Boolean):
+            converters[col.name] = _to_bool
+    return converters
+
+
+class TableLoader:
+    """
+    Validasi baris (hanya kolom tabel, tipe di-convert) lalu insert executemany
+    per chunk. upsert=True: ON CONFLICT (pk) DO UPDATE, untuk restore incremental.
+    on_flush(jumlah_baris) dipanggil setiap chunk selesai di-insert.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        model,
+        label: str,
+        chunk_size: int | None = None,
+        parent=None,
+        upsert: bool = False,
+        replace_children: tuple | None = None,
+        on_flush: Callable[[int], None] | None = None,
+    ):
+        self.db = db
+        self.on_flush = on_flush
+        self.parent = parent   # loader header: di-flush dulu supaya FK child valid
+        self.model = model
+        self.upsert = upsert
+        # (tabel child, kolom FK): items lama header yang di-upsert dihapus dulu
+        self.replace_children = replace_children
+        self.table = model.__table__
+        self.pk = [c.name for c in self.table.primary_key.columns]
+        self.label = label
+        self.chunk_size = chunk_size or RESTORE_CHUNK_SIZE
+        self.columns = [c.name for c in self.table.columns]
+        self.converters = _column_converters(self.table)
+        self.pending: list[dict] = []
+        self.count = 0
+
+    def clean(self, row) -> dict:
+        if not isinstance(row, dict):
+            raise RestoreError(f"{self.label}[{self.count}]: baris harus object")
+        out = {}
+        for name in self.columns:
+            if name not in row:
+                continue
+            value = row[name]
+            if value is not None and name in self.converters:
+                try:
+                    value = self.converters[name](value)
+                except (TypeError, ValueError, ArithmeticError):
+                    raise RestoreError(f"{self.label}[{self.count}].{name}: nilai tidak valid {value!r}")
+            out[name] = value
+        return out
+
+    def add(self, row) -> dict:
+        cleaned = self.clean(row)
+        self.pending.append(cleaned)
+        self.count += 1
+        if len(self.pending) >= self.chunk_size:
+            self.flush()
+        return cleaned
+
+    def flush(self):
+        if self.parent is not None:
+            self.parent.flush()
+        if not self.pending:
+            return
+        # executemany butuh key yang sama di semua baris satu statement
+        by_keys: dict[tuple, list[dict]] = {}
+        for row in self.pending:
+            by_keys.setdefault(tuple(row), []).append(row)
+        for keys, rows in by_keys.items():
+            self.db.execute(self._insert_statement(keys), rows)
+
+        if self.replace_children is not None:
+            child_table, fk = self.replace_children
+            ids = [row["id"] for row in self.pending if row.get("id") is not None]
+            if ids:
+                self.db.execute(delete(child_table).where(child_table.c[fk].in_(ids)))
+        flushed = len(self.pending)
+        self.pending = []
+        if self.on_flush is not None:
+            self.on_flush(flushed)
+
+    def _insert_statement(self, keys: tuple):
+        if not self.upsert or not all(k in keys for k in self.pk):
+            return insert(self.table)
+        stmt = dialect_insert(self.db, self.model)
+        updates = {k: stmt.excluded[k] for k in keys if k not in self.pk}
+        if not updates:
+            return stmt.on_conflict_do_nothing(index_elements=self.pk)
+        return stmt.on_conflict_do_update(index_elements=self.pk, set_=updates)
+
+
+def _tables_of(sections) -> set:
+    tables = set()
+    for name in sections:
+        tables.update(SECTIONS_BY_NAME[name].tables)
+        tables.update(m.__table__ for m in DERIVED_TABLES.get(name, ()))
+    return tables
+
+
+def _check_section_order(sections: list[str]):
+    """Section parent harus muncul sebelum child-nya di file (insert jalan urut file)."""
+    seen = set()
+    for name in sections:
+        own_tables = SECTIONS_BY_NAME[name].tables
+        parents = {fk.column.table for table in own_tables for fk in table.foreign_keys}
+        for other in sections:
+            if other in seen or other == name:
+                continue
+            if parents.intersection(SECTIONS_BY_NAME[other].tables):
+                raise RestoreError(f"Section '{other}' harus berada sebelum '{name}' di file backup")
+        seen.add(name)
+
+
+def _load_section(
+    db: Session,
+    reader: JsonStreamReader,
+    key: str,
+    section: Section,
+    upsert: bool = False,
+    progress: Callable[[str, int], None] | None = None,
+) -> dict[str, int]:
+    """
+    Insert satu section; header + items di-batch bersama (header selalu di-flush dulu).
+    progress(section, jumlah_header) dipanggil tiap chunk; chunk items melapor 0
+    baris (total progress = jumlah header) tapi tetap jadi titik cek cancel.
+    """
+    on_header_flush = on_item_flush = None
+    if progress is not None:
+        on_header_flush = lambda rows: progress(key, rows)
+        on_item_flush = lambda rows: progress(key, 0)
+
+    replace_children = None
+    if upsert and section.item_model is not None:
+        replace_children = (section.item_model.__table__, section.item_fk)
+    loader = TableLoader(
+        db, section.model, key, upsert=upsert, replace_children=replace_children, on_flush=on_header_flush,
+    )
+    item_loader = None
+    if section.item_model is not None:
+        item_loader = TableLoader(
+            db, section.item_model, f"{key}.items", parent=loader, upsert=upsert, on_flush=on_item_flush,
+        )
+
+    for row in _section_rows(reader, section):
+        items = row.pop("items", None) if item_loader is not None and isinstance(row, dict) else None
+        header = loader.add(row)
+        if not items:
+            continue
+        if header.get("id") is None:
+            raise RestoreError(f"{key}[{loader.count - 1}]: id wajib diisi kalau ada items")
+        for item in items:
+            if isinstance(item, dict):
+                item = {**item, section.item_fk: header["id"]}
+            item_loader.add(item)
+
+    loader.flush()
+    counts = {key: loader.count}
+    if item_loader is not None:
+        item_loader.flush()
+        counts[f"{key}_items"] = item_loader.count
+    return counts
+
+
+def wipe_tables(db: Session, tables: set):
+    """Kosongkan tabel, child dulu (urutan kebalikan dependency FK)."""
+    for table in reversed(Base.metadata.sorted_tables):
+        if table in tables:
+            db.execute(delete(table))
+
+
+def reset_sequences(db: Session, tables):
+    """Setelah insert dengan id eksplisit, sequence postgres di-set ke max(id) + 1."""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    for table in tables:
+        pk = list(table.primary_key.columns)
+        if len(pk) != 1 or not isinstance(pk[0].type, Integer):
+            continue
+        db.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', '{pk[0].name}'), "
+                f"COALESCE((SELECT MAX({pk[0].name}) FROM {table.name}), 0) + 1, false)"
+            )
+        )
+
+
+def is_incremental(meta: dict | None) -> bool:
+    return isinstance(meta, dict) and meta.get("type") == "incremental"
+
+
+def is_full(meta: dict | None) -> bool:
+    return isinstance(meta, dict) and meta.get("type") == "full"
+
+
+def read_meta(path: str) -> dict | None:
+    """Baca meta saja (section pertama di file hasil export), tanpa scan seluruh file."""
+    with open_backup_file(path) as f:
+        reader = JsonStreamReader(f)
+        for key in reader.iter_object():
+            if key == "meta":
+                return reader.value()
+            return None
+    return None
+
+
+def scan_file(path: str) -> tuple[dict | None, dict[str, int]]:
+    with open_backup_file(path) as f:
+        return scan_backup(f)
+
+
+def apply_backup(
+    db: Session,
+    path: str,
+    meta: dict | None,
+    counts: dict[str, int],
+    progress: Callable[[str, int], None] | None = None,
+) -> dict:
+    """
+    Terapkan file yang sudah di-scan, dalam transaksi pemanggil.
+    - full       : section yang ada di file menggantikan isi tabelnya
+    - incremental: baris di-upsert per primary key (items header diganti),
+                   section "full" (recipes) tetap diganti seluruhnya
+    - tanpa meta.type (backup lama): seperti full, tapi section kosong dilewati
+      (restore_data lama juga begitu; export lama selalu menulis "sales": [] dsb)
+    Section yang tidak ada di file tidak disentuh.
+    progress(section, jumlah_baris) dipanggil tiap chunk insert (lihat _load_section).
+    """
+    sections = list(counts)
+    _check_section_order(sections)
+
+    incremental = is_incremental(meta)
+    if incremental:
+        replaced = [name for name in sections if SECTIONS_BY_NAME[name].incremental == "full"]
+        wipe = _tables_of(replaced)
+        wipe.update(m.__table__ for name in sections for m in DERIVED_TABLES.get(name, ()))
+    else:
+        replaced = sections if is_full(meta) else [name for name in sections if counts[name] > 0]
+        wipe = _tables_of(replaced)
+    wipe_tables(db, wipe)
+
+    restored: dict[str, int] = {}
+    with open_backup_file(path) as f:
+        reader = JsonStreamReader(f)
+        for key in reader.iter_object():
+            if key not in SECTIONS_BY_NAME:
+                reader.skip()
+                continue
+            restored.update(
+                _load_section(
+                    db, reader, key, SECTIONS_BY_NAME[key], upsert=key not in replaced, progress=progress,
+                )
+            )
+
+    reset_sequences(db, [table for name in sections for table in SECTIONS_BY_NAME[name].tables])
+
+    if "customers" in sections or "sales" in sections:
+        customer_metrics.refresh_customer_stats(db)
+
+    return {"meta": meta, "type": "incremental" if incremental else "full", "restored": restored}
+
+
+def restore_backup(db: Session, path: str, progress=None) -> dict:
+    """Restore satu file backup (full / incremental) dalam transaksi pemanggil (belum di-commit)."""
+    meta, counts = scan_file(path)
+    return apply_backup(db, path, meta, counts, progress=progress)
+
+
+def restore_chain(db: Session, paths: list[str], progress=None) -> list[dict]:
+    """
+    Restore backup full + rangkaian increment, urut. Semua file di-scan dan
+    rantainya dicek (since increment == watermark file sebelumnya) sebelum
+    database disentuh.
+    """
+    if not paths:
+        raise RestoreError("Tidak ada file backup")
+
+    scanned = [scan_file(path) for path in paths]
+    previous = None
+    for index, (meta, _) in enumerate(scanned):
+        if index == 0:
+            if is_incremental(meta):
+                raise RestoreError("File pertama harus backup full")
+        else:
+            if not is_incremental(meta):
+                raise RestoreError(f"File ke-{index + 1} harus backup incremental")
+            if meta.get("since") != (previous or {}).get("watermark"):
+                raise RestoreError(f"Rantai backup terputus di file ke-{index + 1} (since != watermark sebelumnya)")
+        previous = meta
+
+    return [
+        apply_backup(db, path, meta, counts, progress=progress)
+        for path, (meta, counts) in zip(paths, scanned)
+    ]
+
+
+def run_restore(path: str) -> dict:
+    """restore_backup dengan session sendiri, commit di akhir atau rollback semua."""
+    return run_restore_chain([path], check_chain=False)[0]
+
+
+def run_restore_chain(paths: list[str], check_chain: bool = True, progress=None) -> list[dict]:
+    """restore_chain dengan session sendiri, satu transaksi untuk semua file."""
+    db = SessionLocal()
+    try:
+        if check_chain:
+            results = restore_chain(db, paths, progress=progress)
+        else:
+            results = [restore_backup(db, path, progress=progress) for path in paths]
+        db.commit()
+        return results
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
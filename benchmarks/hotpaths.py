@@ -0,0 +1,509 @@
+# benchmarks/hotpaths.py
+"""
+Benchmark jalur tulis & baca yang paling sering dipakai, terhadap database lokal.
+
+    python benchmarks/hotpaths.py [--sizes 1000,10000] [--requests 200] [--output hasil.json]
+    python benchmarks/hotpaths.py --compare base.json [--input baru.json] [--threshold 0.2]
+
+Tiap ukuran data jalan di proses baru dengan database baru (default file
+SQLite di folder temp; --database-url untuk postgres lokal yang masih kosong).
+Data dummy di-seed langsung lewat Core insert: `size` sales order (2 item,
+2 stock movement, 1 ledger), size/10 purchase, size/5 expense, tersebar 365
+hari ke belakang.
+
+Request dikirim lewat TestClient (in-process, tanpa network), jadi angka
+latency = FastAPI + ORM + database. Per skenario dicatat:
+
+- p50 / p99 / rata-rata latency
+- queries per request (semua cursor execute, termasuk BEGIN / PRAGMA)
+- rows/sec: baris yang ditulis (INSERT/UPDATE/DELETE) untuk endpoint tulis,
+  baris yang dikembalikan / dirangkum untuk endpoint baca
+
+--compare membandingkan dua hasil JSON (mis. antar commit) dan keluar dengan
+kode 1 kalau p50/p99 naik lebih dari --threshold atau jumlah query bertambah.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, NamedTuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCH_USER = "bench"
+SEED_DAYS = 365
+CHUNK = 5000
+LARGE_QTY = 10 ** 9
+LARGE_BALANCE = 10 ** 12
+
+
+# =====================================================
+# Seed data
+# =====================================================
+def _insert(conn, table, rows: list[dict], returning: bool = False) -> list[int]:
+    """Insert per chunk; kalau `returning`, kembalikan id sesuai urutan rows."""
+    from sqlalchemy import insert
+
+    ids = []
+    for start in range(0, len(rows), CHUNK):
+        chunk = rows[start:start + CHUNK]
+        if returning:
+            stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+            ids.extend(conn.execute(stmt, chunk).scalars().all())
+        else:
+            conn.execute(insert(table), chunk)
+    return ids
+
+
+def seed(engine, size: int) -> dict:
+    import models
+    from sqlalchemy import func, select
+
+    rng = random.Random(size)
+    now = datetime.combine(date.today(), datetime.min.time())
+
+    def past() -> datetime:
+        return now - timedelta(days=rng.randrange(SEED_DAYS), minutes=rng.randrange(24 * 60))
+
+    t = {m.__tablename__: m.__table__ for m in (
+        models.User, models.Account, models.Product, models.ProductRecipe, models.Customer,
+        models.Supplier, models.PurchasePlan, models.PurchasePlanItem, models.SalesOrder,
+        models.SalesOrderItem, models.PurchaseOrder, models.PurchaseOrderItem,
+        models.StockMovement, models.CashLedger, models.Expense,
+    )}
+
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(t["products"])).scalar():
+            raise SystemExit("Database benchmark harus kosong (tabel products sudah berisi data)")
+
+        # password_hash sengaja tidak valid: user ini hanya dipakai lewat token
+        _insert(conn, t["users"], [{"username": BENCH_USER, "password_hash": "!", "is_active": True, "is_admin": True}])
+        account_id, = _insert(conn, t["accounts"], [
+            {"name": "Kas Benchmark", "type": "CASH", "current_balance": LARGE_BALANCE, "is_active": True},
+        ], returning=True)
+        supplier_id, = _insert(conn, t["suppliers"], [{"name": "Supplier Benchmark"}], returning=True)
+
+        raw_ids = _insert(conn, t["products"], [
+            {"sku": f"RAW-{i:03d}", "name": f"Bahan {i}", "product_type": "RAW", "unit": "pcs",
+             "base_cost": 1000 + i, "sell_price": 2000 + i, "stock_qty": LARGE_QTY, "min_stock": 10, "is_active": True}
+            for i in range(50)
+        ], returning=True)
+        # INTERNAL tanpa stok: tiap penjualan memicu auto-build dari resep
+        internal_id, = _insert(conn, t["products"], [
+            {"sku": "PAKET-001", "name": "Paket Benchmark", "product_type": "INTERNAL", "unit": "pcs",
+             "base_cost": 0, "sell_price": 10000, "stock_qty": 0, "min_stock": 0, "is_active": True},
+        ], returning=True)
+        _insert(conn, t["product_recipes"], [
+            {"product_id": internal_id, "component_product_id": raw_ids[0], "qty_per_unit": 2},
+            {"product_id": internal_id, "component_product_id": raw_ids[1], "qty_per_unit": 1},
+        ])
+
+        customer_ids = _insert(conn, t["customers"], [
+            {"name": f"Customer {i}", "phone": f"0812{i:08d}", "is_active": True}
+            for i in range(max(size // 20, 10))
+        ], returning=True)
+
+        plan_id, = _insert(conn, t["purchase_plans"], [
+            {"supplier_id": supplier_id, "supplier_name": "Supplier Benchmark", "status": "OPEN"},
+        ], returning=True)
+        plan_item_ids = _insert(conn, t["purchase_plan_items"], [
+            {"plan_id": plan_id, "product_id": pid, "planned_qty": LARGE_QTY, "received_qty": 0}
+            for pid in raw_ids
+        ], returning=True)
+
+        # sales: item dibuat dulu supaya total header langsung benar
+        sales, sale_items = [], []
+        for _ in range(size):
+            lines = []
+            for pid in rng.sample(raw_ids, 2):
+                qty, price = rng.randint(1, 5), rng.randint(2000, 9000)
+                lines.append({"product_id": pid, "qty": qty, "unit_price": price, "discount": 0, "subtotal": qty * price})
+            sale_items.append(lines)
+            sales.append({
+                "customer_id": rng.choice(customer_ids), "order_date": past(), "status": "PAID",
+                "payment_method": "CASH", "source_account_id": account_id,
+                "total_amount": sum(line["subtotal"] for line in lines),
+            })
+        sale_ids = _insert(conn, t["sales_orders"], sales, returning=True)
+        items, movements, ledger = [], [], []
+        for sale_id, sale, lines in zip(sale_ids, sales, sale_items):
+            for line in lines:
+                items.append(dict(line, sales_order_id=sale_id))
+                movements.append({"product_id": line["product_id"], "movement_date": sale["order_date"], "type": "OUT",
+                                  "ref_type": "SALE", "ref_id": sale_id, "qty_change": line["qty"]})
+            ledger.append({"entry_date": sale["order_date"], "type": "IN", "source": "SALE",
+                           "ref_id": sale_id, "amount": sale["total_amount"]})
+        _insert(conn, t["sales_order_items"], items)
+
+        # purchases
+        purchases, purchase_items = [], []
+        for i in range(size // 10):
+            lines = []
+            for pid in rng.sample(raw_ids, 2):
+                qty, cost = rng.randint(10, 100), rng.randint(1000, 1500)
+                lines.append({"product_id": pid, "qty": qty, "unit_cost": cost, "discount": 0, "subtotal": qty * cost})
+            purchase_items.append(lines)
+            purchases.append({
+                "supplier_id": supplier_id, "supplier_name": "Supplier Benchmark", "invoice_number": f"INV-{i}",
+                "purchase_date": past(), "payment_method": "CASH", "source_account_id": account_id,
+                "total_amount": sum(line["subtotal"] for line in lines),
+            })
+        purchase_ids = _insert(conn, t["purchase_orders"], purchases, returning=True)
+        items = []
+        for purchase_id, purchase, lines in zip(purchase_ids, purchases, purchase_items):
+            for line in lines:
+                items.append(dict(line, purchase_order_id=purchase_id))
+                movements.append({"product_id": line["product_id"], "movement_date": purchase["purchase_date"],
+                                  "type": "IN", "ref_type": "PURCHASE", "ref_id": purchase_id, "qty_change": line["qty"]})
+            ledger.append({"entry_date": purchase["purchase_date"], "type": "OUT", "source": "PURCHASE",
+                           "ref_id": purchase_id, "amount": purchase["total_amount"]})
+        _insert(conn, t["purchase_order_items"], items)
+
+        # expenses
+        expenses = [
+            {"expense_date": past(), "category": rng.choice(["ONGKIR", "LISTRIK", "OPERASIONAL"]),
+             "amount": rng.randint(10, 500) * 1000, "payment_method": "CASH", "source_account_id": account_id}
+            for _ in range(size // 5)
+        ]
+        expense_ids = _insert(conn, t["expenses"], expenses, returning=True)
+        for expense_id, expense in zip(expense_ids, expenses):
+            ledger.append({"entry_date": expense["expense_date"], "type": "OUT", "source": "EXPENSE",
+                           "ref_id": expense_id, "amount": expense["amount"]})
+
+        _insert(conn, t["stock_movements"], movements)
+        _insert(conn, t["cash_ledger"], ledger)
+
+        range_end = now.date()
+        range_start = range_end - timedelta(days=29)
+        ledger_in_range = conn.execute(
+            select(func.count()).select_from(t["cash_ledger"])
+            .where(t["cash_ledger"].c.entry_date >= datetime.combine(range_start, datetime.min.time()))
+        ).scalar()
+
+    return {
+        "size": size,
+        "account_id": account_id,
+        "supplier_id": supplier_id,
+        "customer_ids": customer_ids,
+        "raw_ids": raw_ids,
+        "internal_id": internal_id,
+        "plan_items": dict(zip(raw_ids, plan_item_ids)),
+        "sales": len(sale_ids),
+        "range_start": str(range_start),
+        "range_end": str(range_end),
+        "ledger_in_range": ledger_in_range,
+    }
+
+
+# =====================================================
+# Skenario
+# =====================================================
+class Scenario(NamedTuple):
+    name: str
+    method: str
+    request: Callable[[int], tuple[str, dict | None]]   # i -> (path, body JSON)
+    rows: Callable[[Any, int], int]                      # (response JSON, baris DML) -> baris diproses
+
+
+def _written(body, dml_rows: int) -> int:
+    return dml_rows
+
+
+def _returned(body, dml_rows: int) -> int:
+    return len(body)
+
+
+def scenarios(fx: dict) -> list[Scenario]:
+    customers, raws, account = fx["customer_ids"], fx["raw_ids"], fx["account_id"]
+    today = f"{date.today()}T10:00:00"
+    deep_skip = max(fx["sales"] - 100, 0)
+
+    def sale(i):
+        return "/sales/", {
+            "customer_id": customers[i % len(customers)], "order_date": today,
+            "payment_method": "CASH", "source_account_id": account,
+            "items": [
+                {"product_id": raws[i % len(raws)], "qty": 1, "unit_price": 5000},
+                {"product_id": raws[(i + 7) % len(raws)], "qty": 2, "unit_price": 3000},
+            ],
+        }
+
+    def sale_auto_build(i):
+        return "/sales/", {
+            "customer_id": customers[i % len(customers)], "order_date": today,
+            "payment_method": "CASH", "source_account_id": account,
+            "items": [{"product_id": fx["internal_id"], "qty": 1, "unit_price": 10000}],
+        }
+
+    def purchase(i):
+        pids = (raws[i % len(raws)], raws[(i + 13) % len(raws)])
+        return "/purchases/", {
+            "supplier_id": fx["supplier_id"], "supplier_name": "Supplier Benchmark",
+            "invoice_number": f"BENCH-{i}", "purchase_date": str(date.today()), "notes": None,
+            "payment_method": "CASH", "source_account_id": account,
+            "items": [
+                {"product_id": pid, "qty": 5, "unit_cost": 1200, "plan_item_id": fx["plan_items"][pid]}
+                for pid in pids
+            ],
+        }
+
+    def expense(i):
+        return "/expenses/", {
+            "category": "OPERASIONAL", "description": f"Benchmark {i}", "amount": 15000,
+            "payment_method": "CASH", "source_account_id": account,
+        }
+
+    report_path = f"/reports/range?start_date={fx['range_start']}&end_date={fx['range_end']}"
+    return [
+        Scenario("reports_range", "GET", lambda i: (report_path, None), lambda body, _: fx["ledger_in_range"]),
+        Scenario("list_sales_deep", "GET", lambda i: (f"/sales/?skip={deep_skip}&limit=100", None), _returned),
+        Scenario("list_stock_movements", "GET", lambda i: ("/stock-movements/?limit=200", None), _returned),
+        Scenario("create_sale", "POST", sale, _written),
+        Scenario("create_sale_auto_build", "POST", sale_auto_build, _written),
+        Scenario("create_purchase_plan_receipt", "POST", purchase, _written),
+        Scenario("create_expense", "POST", expense, _written),
+    ]
+
+
+# =====================================================
+# Pengukuran
+# =====================================================
+class QueryCounter:
+    """Hitung cursor execute + baris DML di semua engine (sync & async)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.dml_rows = 0
+
+    def install(self) -> None:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        event.listen(Engine, "after_cursor_execute", self._after_execute)
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip()[:6].upper()
+        with self._lock:
+            self.queries += 1
+            if verb in ("INSERT", "UPDATE", "DELETE") and cursor.rowcount and cursor.rowcount > 0:
+                self.dml_rows += cursor.rowcount
+
+    def reset(self) -> None:
+        with self._lock:
+            self.queries = 0
+            self.dml_rows = 0
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+def run_scenario(client, counter: QueryCounter, sc: Scenario, requests: int, warmup: int) -> dict:
+    latencies, queries, rows = [], [], 0
+    for i in range(warmup + requests):
+        path, body = sc.request(i)
+        counter.reset()
+        started = time.perf_counter()
+        resp = client.request(sc.method, path, json=body)
+        elapsed = time.perf_counter() - started
+        if resp.status_code >= 400:
+            raise RuntimeError(f"{sc.name}: HTTP {resp.status_code} {resp.text[:300]}")
+        if i < warmup:
+            continue
+        latencies.append(elapsed)
+        queries.append(counter.queries)
+        rows += sc.rows(resp.json(), counter.dml_rows)
+
+    total = sum(latencies)
+    return {
+        "requests": requests,
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "queries_per_request": round(statistics.mean(queries), 2),
+        "max_queries": max(queries),
+        "rows_per_request": round(rows / requests, 2),
+        "rows_per_sec": round(rows / total, 1) if total else None,
+        "requests_per_sec": round(requests / total, 1) if total else None,
+    }
+
+
+def run_size(size: int, requests: int, warmup: int) -> dict:
+    """Jalan di proses worker: DATABASE_URL sudah di-set oleh proses induk."""
+    sys.path.insert(0, ROOT)
+    import db
+    import main
+    import manage
+    from fastapi.testclient import TestClient
+    from security import create_access_token
+
+    manage.migrate(configure_logger=False)
+    started = time.perf_counter()
+    fx = seed(db.get_engine(), size)
+    seed_seconds = time.perf_counter() - started
+
+    counter = QueryCounter()
+    counter.install()
+    results = {}
+    with TestClient(main.app) as client:
+        client.headers["Authorization"] = f"Bearer {create_access_token({'sub': BENCH_USER})}"
+        for sc in scenarios(fx):
+            results[sc.name] = run_scenario(client, counter, sc, requests, warmup)
+
+    return {
+        "size": size,
+        "backend": db.get_engine().dialect.name,
+        "seed_s": round(seed_seconds, 2),
+        "scenarios": results,
+    }
+
+
+# =====================================================
+# Proses induk
+# =====================================================
+def _check_local(url: str) -> None:
+    from sqlalchemy.engine import make_url
+
+    parsed = make_url(url)
+    if parsed.get_backend_name() != "sqlite" and parsed.host not in ("localhost", "127.0.0.1", "::1"):
+        raise SystemExit(f"Benchmark menulis data dummy: hanya untuk database lokal, bukan {parsed.host}")
+
+
+def run_worker(size: int, args, tmpdir: str) -> dict:
+    env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url or f"sqlite:///{os.path.join(tmpdir, f'bench-{size}.db')}",
+        DB_STARTUP_CHECK="off",
+        DB_AUTO_MIGRATE="0",
+    )
+    env.pop("DATABASE_READ_URL", None)
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", "--size", str(size),
+         "--requests", str(args.requests), "--warmup", str(args.warmup)],
+        cwd=ROOT, env=env, check=True, stdout=subprocess.PIPE, text=True,
+    ).stdout
+    # baris terakhir = hasil JSON (print lain dari app ada di atasnya)
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def _git_revision() -> str | None:
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                             check=True, capture_output=True, text=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                               check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{rev}-dirty" if dirty else rev
+
+
+def print_results(results: dict) -> None:
+    print(f"commit {results['commit']}  ({results['requests']} requests / skenario)")
+    for run in results["runs"]:
+        print(f"\n== size {run['size']} ({run['backend']}, seed {run['seed_s']} s)")
+        print(f"{'skenario':<30}{'p50 ms':>9}{'p99 ms':>9}{'q/req':>8}{'rows/s':>11}{'req/s':>8}")
+        for name, r in run["scenarios"].items():
+            print(f"{name:<30}{r['p50_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['queries_per_request']:>8.1f}"
+                  f"{r['rows_per_sec']:>11.0f}{r['requests_per_sec']:>8.1f}")
+
+
+def compare(base: dict, new: dict, threshold: float) -> bool:
+    """Print delta per skenario; True kalau ada regresi."""
+    regressed = False
+    base_runs = {run["size"]: run for run in base["runs"]}
+    print(f"base {base.get('commit')}  ->  baru {new.get('commit')}  (threshold {threshold:.0%})")
+    for run in new["runs"]:
+        old_run = base_runs.get(run["size"])
+        if old_run is None:
+            print(f"\n== size {run['size']}: tidak ada di base, dilewati")
+            continue
+        print(f"\n== size {run['size']}")
+        print(f"{'skenario':<30}{'p50 ms':>27}{'p99 ms':>29}{'q/req':>18}")
+        for name, r in run["scenarios"].items():
+            old = old_run["scenarios"].get(name)
+            if old is None:
+                print(f"{name:<30}  (baru)")
+                continue
+            flags = []
+            cells = []
+            for key in ("p50_ms", "p99_ms"):
+                delta = (r[key] - old[key]) / old[key] if old[key] else 0.0
+                cells.append(f"{old[key]:>9.2f} -> {r[key]:<9.2f}{delta:>+6.0%}")
+                if delta > threshold:
+                    flags.append(key)
+            if r["queries_per_request"] > old["queries_per_request"]:
+                flags.append("queries")
+            cells.append(f"{old['queries_per_request']:>6.1f} -> {r['queries_per_request']:<6.1f}")
+            regressed = regressed or bool(flags)
+            print(f"{name:<30}" + "  ".join(cells) + (f"  REGRESI: {', '.join(flags)}" if flags else ""))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark endpoint tulis & baca utama")
+    parser.add_argument("--sizes", default="1000,10000", help="Jumlah sales order yang di-seed, dipisah koma")
+    parser.add_argument("--requests", type=int, default=200, help="Request terukur per skenario")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--database-url", help="Postgres lokal yang kosong (default: SQLite di folder temp)")
+    parser.add_argument("--output", help="Simpan hasil JSON ke file ini")
+    parser.add_argument("--json", action="store_true", help="Print hasil sebagai JSON")
+    parser.add_argument("--compare", metavar="BASE_JSON", help="Bandingkan dengan hasil sebelumnya")
+    parser.add_argument("--input", metavar="NEW_JSON", help="Dengan --compare: pakai hasil ini, tidak menjalankan benchmark")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Batas kenaikan latency sebelum dianggap regresi")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_size(args.size, args.requests, args.warmup)))
+        return
+
+    if args.input:
+        with open(args.input) as f:
+            results = json.load(f)
+    else:
+        if args.database_url:
+            _check_local(args.database_url)
+        sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+        if args.database_url and len(sizes) > 1:
+            raise SystemExit("--database-url hanya untuk satu ukuran (database harus kosong tiap run)")
+        with tempfile.TemporaryDirectory(prefix="makadam-bench-") as tmpdir:
+            runs = [run_worker(size, args, tmpdir) for size in sizes]
+        results = {
+            "commit": _git_revision(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "runs": runs,
+        }
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        if compare(base, results, args.threshold):
+            sys.exit(1)
+        return
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+# benchmarks/startup.py
+"""
+Waktu startup app: `import main` dan cold start uvicorn sampai GET / = 200.
+
+    python benchmarks/startup.py [--runs 5] [--port 8765] [--json]
+
+Tiap run di proses baru (cold). Import main tidak boleh membuka koneksi
+database, jadi angka ini tidak tergantung latensi DB; cek koneksi jalan di
+lifespan (DB_STARTUP_CHECK, default background).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def time_import() -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def time_cold_start(port: int, timeout: float = 60.0) -> float:
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn keluar dengan kode {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError(f"GET / tidak 200 dalam {timeout:.0f}s")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "runs": len(samples),
+        "median_s": round(statistics.median(samples), 4),
+        "min_s": round(min(samples), 4),
+        "max_s": round(max(samples), 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark waktu startup app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", action="store_true", help="Output JSON")
+    args = parser.parse_args()
+
+    results = {
+        "import_main": summarize([time_import() for _ in range(args.runs)]),
+        "cold_start_first_200": summarize([time_cold_start(args.port) for _ in range(args.runs)]),
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, r in results.items():
+        print(f"{name:<22} median {r['median_s'] * 1000:8.1f} ms  (min {r['min_s'] * 1000:.1f}, max {r['max_s'] * 1000:.1f}, {r['runs']} runs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# customer_metrics.py
+"""
+Agregat per customer (first/last order, jumlah order, total belanja) di
+tabel customer_stats, supaya laporan RFM / revenue per channel tidak perlu
+meng-agregasi seluruh sales_orders tiap request.
+
+- record_sale            : upsert incremental, dipanggil dari create_sale
+- refresh_customer_stats : hitung ulang dari sales_orders (INSERT ... SELECT)
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+import models
+from db import dialect_insert
+
+COUNTED_SALE_STATUSES = ("PAID",)
+
+
+def record_sale(db: Session, customer_id: int, order_date: datetime, amount: Decimal) -> None:
+    """Tambahkan satu order ke agregat customer (satu statement upsert, ikut transaksi pemanggil)."""
+    stats = models.CustomerStats.__table__
+    stmt = dialect_insert(db, models.CustomerStats).values(
+        customer_id=customer_id,
+        first_order_date=order_date,
+        last_order_date=order_date,
+        order_count=1,
+        total_spend=amount,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[stats.c.customer_id],
+        set_={
+            "order_count": stats.c.order_count + 1,
+            "total_spend": stats.c.total_spend + stmt.excluded.total_spend,
+            "first_order_date": case(
+                (
+                    (stats.c.first_order_date == None)
+                    | (stmt.excluded.first_order_date < stats.c.first_order_date),
+                    stmt.excluded.first_order_date,
+                ),
+                else_=stats.c.first_order_date,
+            ),
+            "last_order_date": case(
+                (
+                    (stats.c.last_order_date == None)
+                    | (stmt.excluded.last_order_date > stats.c.last_order_date),
+                    stmt.excluded.last_order_date,
+                ),
+                else_=stats.c.last_order_date,
+            ),
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
+
+def refresh_customer_stats(db: Session, customer_ids=None) -> int:
+    """
+    Hitung ulang agregat dari sales_orders. customer_ids=None -> semua customer.
+    Hapus + INSERT ... SELECT dalam transaksi pemanggil (belum di-commit).
+    Return jumlah customer yang punya order.
+    """
+    sale = models.SalesOrder
+    stats = models.CustomerStats
+
+    wipe = delete(stats)
+    source = (
+        select(
+            sale.customer_id,
+            func.min(sale.order_date),
+            func.max(sale.order_date),
+            func.count(sale.id),
+            func.coalesce(func.sum(sale.total_amount), 0),
+        )
+        .where(sale.customer_id != None, sale.status.in_(COUNTED_SALE_STATUSES))
+        .group_by(sale.customer_id)
+    )
+    if customer_ids is not None:
+        customer_ids = list(customer_ids)
+        wipe = wipe.where(stats.customer_id.in_(customer_ids))
+        source = source.where(sale.customer_id.in_(customer_ids))
+
+    db.execute(wipe.execution_options(synchronize_session=False))
+    result = db.execute(
+        insert(stats).from_select(
+            ["customer_id", "first_order_date", "last_order_date", "order_count", "total_spend"],
+            source,
+        )
+    )
+    return result.rowcount or 0
@@ -1,44 +1,64 @@
 # db.py
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, declarative_base
-from urllib.parse import quote_plus, urlparse, urlunparse
+"""
+Engine & session database.
+
+Import modul ini tidak membuka koneksi apa pun: engine dibuat saat pertama
+dipakai (session pertama / get_engine()), dan cek koneksi dijalankan oleh
+lifespan app (lihat main.py). Schema dikelola lewat migrasi Alembic
+(`python manage.py migrate`), bukan create_all.
+
+Backend: postgres (Supabase / lokal, boleh tanpa password untuk localhost)
+atau SQLite untuk load test lokal tanpa network:
+
+    DATABASE_URL=sqlite:///makadam.db     file (WAL)
+    DATABASE_URL=sqlite://                in-memory (lihat _sqlite_memory_path)
+
+Opsional: DATABASE_READ_URL = read replica untuk laporan & list
+(get_read_db / get_async_read_db), lihat bagian "Read replica".
+"""
+import atexit
+import hashlib
+import hmac
+import math
 import os
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import quote_plus, urlparse, urlunparse
+
 from dotenv import load_dotenv
-import sys
+from fastapi import Request, Response
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+
+import db_pool
 
 # Load .env hanya untuk development
 load_dotenv()
 
-# Get DATABASE_URL
-raw_url = os.getenv("DATABASE_URL")
+Base = declarative_base()
+
 
-if not raw_url:
-    print("❌ ERROR: DATABASE_URL tidak ditemukan di environment variables!")
-    print("   Pastikan sudah set di Railway Dashboard → Variables")
-    sys.exit(1)
+class DatabaseConfigError(RuntimeError):
+    pass
 
-print(f"🔍 Parsing DATABASE_URL...")
 
-try:
+def _encode_password(raw_url: str) -> str:
+    """Encode password di URL (karakter khusus ! @ : tidak bikin error)."""
     parsed = urlparse(raw_url)
-    
-    # Extract password
+
     password = parsed.password
     if password is None:
-        print("❌ ERROR: DATABASE_URL tidak memiliki password!")
-        sys.exit(1)
-    
-    # Encode password (supaya karakter khusus ! @ : tidak bikin error)
-    encoded_password = quote_plus(password)
-    
-    # Rebuild URL dengan password yang sudah encoded
-    safe_netloc = f"{parsed.username}:{encoded_password}@{parsed.hostname}"
-    
-    # Handle port (bisa None)
+        return raw_url
+
+    safe_netloc = f"{parsed.username}:{quote_plus(password)}@{parsed.hostname}"
     if parsed.port:
         safe_netloc += f":{parsed.port}"
-    
-    safe_url = urlunparse((
+
+    return urlunparse((
         parsed.scheme,
         safe_netloc,
         parsed.path,
@@ -46,52 +66,466 @@ try:
         parsed.query,
         parsed.fragment
     ))
-    
-    print(f"✅ Database URL parsed successfully")
-    print(f"   Host: {parsed.hostname}")
-    print(f"   Port: {parsed.port or 'default'}")
-    print(f"   Database: {parsed.path.strip('/')}")
-
-except Exception as e:
-    print(f"❌ ERROR parsing DATABASE_URL: {e}")
-    sys.exit(1)
-
-# Create Engine
-try:
-    print(f"🔌 Connecting to database...")
-    
+
+
+LOCAL_HOSTS = {None, "", "localhost", "127.0.0.1", "::1"}
+
+# sqlite in-memory URL -> file sementara (satu per proses, per URL)
+_sqlite_memory_paths: dict[str, str] = {}
+
+
+def _remove_sqlite_files(path: str) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def _sqlite_memory_path(raw_url: str) -> str:
+    """
+    `sqlite://` / `sqlite:///:memory:` -> file database di tmpfs (/dev/shm),
+    dihapus saat proses selesai. :memory: asli hanya hidup di satu koneksi,
+    padahal engine sync, engine async & pool butuh database yang sama.
+    """
+    if raw_url not in _sqlite_memory_paths:
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        path = os.path.join(directory, f"makadam-{os.getpid()}-{uuid.uuid4().hex[:8]}.db")
+        atexit.register(_remove_sqlite_files, path)
+        _sqlite_memory_paths[raw_url] = path
+    return _sqlite_memory_paths[raw_url]
+
+
+def _normalize_url(raw_url: str, name: str, require_password: bool) -> str:
+    url = make_url(raw_url)
+    if url.get_backend_name() == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            url = url.set(database=_sqlite_memory_path(raw_url))
+            return url.render_as_string(hide_password=False)
+        return raw_url
+
+    if require_password and urlparse(raw_url).password is None and url.host not in LOCAL_HOSTS:
+        # postgres lokal (trust / peer auth) boleh tanpa password
+        raise DatabaseConfigError(f"{name} tidak memiliki password!")
+
+    return _encode_password(raw_url)
+
+
+def get_database_url() -> str:
+    """DATABASE_URL dengan password yang sudah di-encode."""
+    raw_url = os.getenv("DATABASE_URL")
+    if not raw_url:
+        raise DatabaseConfigError(
+            "DATABASE_URL tidak ditemukan di environment variables! "
+            "Pastikan sudah set di Railway Dashboard → Variables"
+        )
+    return _normalize_url(raw_url, "DATABASE_URL", require_password=True)
+
+
+def get_read_database_url() -> str | None:
+    """DATABASE_READ_URL (read replica), None kalau tidak di-set. Boleh tanpa password / SQLite."""
+    raw_url = os.getenv("DATABASE_READ_URL")
+    return _normalize_url(raw_url, "DATABASE_READ_URL", require_password=False) if raw_url else None
+
+
+def is_sqlite() -> bool:
+    return make_url(get_database_url()).get_backend_name() == "sqlite"
+
+
+# =====================================================
+# Engine (lazy)
+# =====================================================
+_engine: Engine | None = None
+_async_engine: AsyncEngine | None = None
+_pool_profile: db_pool.PoolProfile | None = None
+_engine_lock = threading.Lock()
+
+
+def get_pool_profile() -> db_pool.PoolProfile:
+    """Profil pool (DB_POOL_PROFILE, lihat db_pool.py), sama untuk engine sync & async."""
+    global _pool_profile
+    if _pool_profile is None:
+        _pool_profile = db_pool.resolve_profile(make_url(get_database_url()))
+    return _pool_profile
+
+
+# =====================================================
+# SQLite
+# =====================================================
+# Tidak ada SELECT ... FOR UPDATE / SKIP LOCKED di SQLite (SQLAlchemy
+# membuangnya diam-diam). Gantinya transaksi engine sync dibuka dengan
+# BEGIN IMMEDIATE: write lock diambil di awal, jadi alur baca-stok-lalu-tulis
+# tetap berurutan (antri sampai busy_timeout) dan tidak saling menimpa.
+# Session baca panjang (backup, get_read_db) pakai use_deferred_begin().
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("DB_SQLITE_BUSY_TIMEOUT_MS", "30000"))
+
+
+def _setup_sqlite(engine: Engine, manage_transactions: bool) -> None:
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")      # pembaca tidak terblokir penulis
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA foreign_keys=ON")       # sama seperti postgres
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+        if manage_transactions:
+            # BEGIN dikirim sendiri di event "begin" (bukan BEGIN implisit pysqlite)
+            dbapi_connection.isolation_level = None
+
+    if not manage_transactions:
+        return
+
+    @event.listens_for(engine, "begin")
+    def _begin(conn):
+        options = conn.get_execution_options()
+        conn.exec_driver_sql(f"PRAGMA busy_timeout={int(options.get('sqlite_busy_timeout_ms', SQLITE_BUSY_TIMEOUT_MS))}")
+        conn.exec_driver_sql(f"BEGIN {options.get('sqlite_begin', 'IMMEDIATE')}")
+
+
+def use_deferred_begin(db: Session) -> None:
+    """
+    SQLite: transaksi session ini BEGIN DEFERRED (snapshot baca, tanpa
+    write lock) untuk bacaan panjang. Dipanggil sebelum query pertama.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        db.connection(execution_options={"sqlite_begin": "DEFERRED"})
+
+
+# =====================================================
+# Engine builder
+# =====================================================
+def _create_engine(url: str, profile: db_pool.PoolProfile, label: str) -> Engine:
+    sqlite = make_url(url).get_backend_name() == "sqlite"
+    if sqlite:
+        connect_args = {"check_same_thread": False}
+    else:
+        # psycopg2 tidak memakai prepared statement server-side, jadi
+        # aman di pooler mode transaction tanpa setting tambahan
+        connect_args = {"connect_timeout": 10}
     engine = create_engine(
-        safe_url,
-        pool_pre_ping=True,        # menjaga koneksi tetap hidup
-        pool_size=5,
-        max_overflow=10,
+        url,
+        **db_pool.engine_kwargs(profile),
         echo=False,                 # Set True untuk debug SQL queries
-        connect_args={
-            "connect_timeout": 10,
-        }
+        connect_args=connect_args,
+    )
+    if sqlite:
+        _setup_sqlite(engine, manage_transactions=True)
+    db_pool.setup_pool(engine, profile)
+    url = engine.url
+    print(
+        f"🔌 {label}: {url.host or url.database} (port {url.port or 'default'}, "
+        f"db {url.database}, pool {profile.name})"
     )
-    
-    # Test connection dengan SQLAlchemy 2.0 syntax
-    with engine.connect() as conn:
-        result = conn.execute(text("SELECT 1"))
-        result.fetchone()
-        print(f"✅ Database connected successfully!")
-    
-except Exception as e:
-    print(f"❌ ERROR: Database connection failed!")
-    print(f"   Error: {e}")
-    print(f"   ")
-    print(f"   Troubleshooting:")
-    print(f"   1. Pastikan DATABASE_URL benar di Railway Variables")
-    print(f"   2. Cek Supabase pooler masih aktif")
-    print(f"   3. Cek firewall/network rules")
-    import traceback
-    traceback.print_exc()
-    sys.exit(1)
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    return engine
+
+
+def make_async_url(url: URL, prepared_statements: bool = False) -> tuple[URL, dict]:
+    """URL sync (psycopg2) -> URL async + connect_args yang setara."""
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite"), {}
+
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    connect_args = {"timeout": 10}
+    if not prepared_statements:
+        # pgbouncer mode transaction (pooler Supabase) tidak mendukung prepared
+        # statement lintas transaksi: matikan cache statement asyncpg & SQLAlchemy,
+        # dan beri nama statement unik supaya tidak bentrok antar koneksi server
+        query["prepared_statement_cache_size"] = "0"
+        connect_args.update({
+            "statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        })
+    if sslmode and sslmode != "disable":
+        # asyncpg menerima nilai sslmode libpq apa adanya (require / verify-full / ...)
+        connect_args["ssl"] = sslmode
+    return url.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+def _create_async_engine(sync_url: URL, profile: db_pool.PoolProfile) -> AsyncEngine:
+    async_url, connect_args = make_async_url(sync_url, profile.prepared_statements)
+    engine = create_async_engine(
+        async_url,
+        **db_pool.engine_kwargs(profile, is_async=True),
+        connect_args=connect_args,
+    )
+    if async_url.get_backend_name() == "sqlite":
+        # engine async hanya untuk endpoint baca: transaksi default (deferred)
+        _setup_sqlite(engine.sync_engine, manage_transactions=False)
+    db_pool.setup_pool(engine.sync_engine, profile)
+    return engine
+
+
+def get_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _create_engine(get_database_url(), get_pool_profile(), "Database engine")
+    return _engine
+
+
+def get_async_engine() -> AsyncEngine:
+    """Engine async (asyncpg) untuk endpoint baca, dari URL yang sama dengan engine sync."""
+    global _async_engine
+    if _async_engine is None:
+        sync_url = get_engine().url
+        with _engine_lock:
+            if _async_engine is None:
+                _async_engine = _create_async_engine(sync_url, get_pool_profile())
+    return _async_engine
+
+
+def __getattr__(name):
+    # `from db import engine` tetap jalan, engine dibuat saat itu
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def check_connection() -> None:
+    with get_engine().connect() as conn:
+        conn.execute(text("SELECT 1")).fetchone()
+
+
+async def check_connection_async() -> None:
+    async with get_async_engine().connect() as conn:
+        await conn.execute(text("SELECT 1"))
 
-Base = declarative_base()
+
+# =====================================================
+# Read replica
+# =====================================================
+# Tanpa DATABASE_READ_URL semua "read" session jatuh ke primary. Dengan
+# replica, request tetap dibaca dari primary kalau:
+# - caller yang sama baru saja menulis (DB_READ_AFTER_WRITE_SECONDS), supaya
+#   data yang baru disimpan langsung terlihat walau replica tertinggal; penandanya
+#   dibawa client (cookie / header, lihat mark_write) jadi aman untuk multi-worker
+# - lag replica > DB_READ_MAX_LAG_SECONDS, atau replica tidak bisa dihubungi
+READ_AFTER_WRITE_SECONDS = float(os.getenv("DB_READ_AFTER_WRITE_SECONDS", "5"))
+READ_MAX_LAG_SECONDS = float(os.getenv("DB_READ_MAX_LAG_SECONDS", "30"))
+REPLICA_CHECK_INTERVAL_SECONDS = 5
+
+_read_engine: Engine | None = None
+_async_read_engine: AsyncEngine | None = None
+_read_pool_profile: db_pool.PoolProfile | None = None
+
+# lag replica dalam detik (0 = tidak ada WAL yang belum di-replay / bukan standby)
+REPLICA_LAG_SQL = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def has_read_replica() -> bool:
+    return get_read_database_url() is not None
+
+
+def get_read_engine() -> Engine:
+    """Engine replica, atau engine primary kalau DATABASE_READ_URL tidak di-set."""
+    global _read_engine, _read_pool_profile
+    read_url = get_read_database_url()
+    if read_url is None:
+        return get_engine()
+    if _read_engine is None:
+        with _engine_lock:
+            if _read_engine is None:
+                _read_pool_profile = db_pool.resolve_profile(make_url(read_url))
+                _read_engine = _create_engine(read_url, _read_pool_profile, "Read replica")
+    return _read_engine
+
+
+def get_async_read_engine() -> AsyncEngine:
+    global _async_read_engine
+    if not has_read_replica():
+        return get_async_engine()
+    if _async_read_engine is None:
+        sync_url = get_read_engine().url
+        with _engine_lock:
+            if _async_read_engine is None:
+                _async_read_engine = _create_async_engine(sync_url, _read_pool_profile)
+    return _async_read_engine
+
+
+class _ReplicaHealth:
+    """Hasil cek lag replica, di-cache REPLICA_CHECK_INTERVAL_SECONDS."""
+
+    def __init__(self):
+        self.checked_at = float("-inf")
+        self.healthy = True
+        self.lag_seconds: float | None = None
+        self.error: str | None = None
+
+    def due(self) -> bool:
+        return time.monotonic() - self.checked_at >= REPLICA_CHECK_INTERVAL_SECONDS
+
+    def record(self, lag: float | None = None, error: Exception | None = None) -> bool:
+        self.checked_at = time.monotonic()
+        self.lag_seconds = float(lag) if lag is not None else None
+        self.error = f"{type(error).__name__}: {error}" if error else None
+        self.healthy = error is None and (self.lag_seconds or 0) <= READ_MAX_LAG_SECONDS
+        return self.healthy
+
+
+_replica_health = _ReplicaHealth()
+
+
+def replica_healthy() -> bool:
+    if not _replica_health.due():
+        return _replica_health.healthy
+    engine = get_read_engine()
+    if engine.dialect.name != "postgresql":
+        return _replica_health.record()     # mis. salinan SQLite untuk testing
+    try:
+        with engine.connect() as conn:
+            return _replica_health.record(conn.execute(REPLICA_LAG_SQL).scalar())
+    except Exception as e:
+        return _replica_health.record(error=e)
+
+
+async def replica_healthy_async() -> bool:
+    if not _replica_health.due():
+        return _replica_health.healthy
+    engine = get_async_read_engine()
+    if engine.dialect.name != "postgresql":
+        return _replica_health.record()
+    try:
+        async with engine.connect() as conn:
+            return _replica_health.record((await conn.execute(REPLICA_LAG_SQL)).scalar())
+    except Exception as e:
+        return _replica_health.record(error=e)
+
+
+# Penanda "baru menulis" disimpan di sisi client, bukan di memori proses, supaya
+# tetap berlaku walau request berikutnya dilayani worker uvicorn/gunicorn lain:
+# - cookie WRITE_MARKER_COOKIE (browser; CORS sudah allow_credentials)
+# - header respons WRITE_MARKER_HEADER, client non-browser mengirim balik nilainya
+#   di header request yang sama
+# Nilai = "<unix time sampai kapan>.<hmac>", ditandatangani SECRET_KEY supaya
+# client tidak bisa memaksa semua bacaannya ke primary.
+WRITE_MARKER_COOKIE = "db_wrote_until"
+WRITE_MARKER_HEADER = "X-DB-Wrote-Until"
+
+
+def _marker_signature(until: str) -> str:
+    from security import SECRET_KEY
+
+    return hmac.new(SECRET_KEY.encode(), f"{WRITE_MARKER_COOKIE}:{until}".encode(), hashlib.sha256).hexdigest()
+
+
+def mark_write(response: Response) -> None:
+    """Dipanggil middleware setelah request tulis yang berhasil (lihat main.py)."""
+    if not has_read_replica():
+        return
+    until = str(int(time.time() + READ_AFTER_WRITE_SECONDS) + 1)
+    marker = f"{until}.{_marker_signature(until)}"
+    response.set_cookie(
+        WRITE_MARKER_COOKIE, marker,
+        max_age=math.ceil(READ_AFTER_WRITE_SECONDS), httponly=True, samesite="lax",
+    )
+    response.headers[WRITE_MARKER_HEADER] = marker
+
+
+def wrote_recently(request: Request) -> bool:
+    now = time.time()
+    for marker in (request.headers.get(WRITE_MARKER_HEADER), request.cookies.get(WRITE_MARKER_COOKIE)):
+        until, _, signature = (marker or "").partition(".")
+        if not until.isdigit() or not hmac.compare_digest(signature, _marker_signature(until)):
+            continue
+        # batas atas: marker lama yang ditandatangani dengan setting lebih panjang tidak berlaku
+        if now < int(until) <= now + READ_AFTER_WRITE_SECONDS + 1:
+            return True
+    return False
+
+
+def read_route(request: Request | None) -> str:
+    """'replica' atau 'primary' untuk request baca ini."""
+    if not has_read_replica() or (request is not None and wrote_recently(request)):
+        return "primary"
+    return "replica" if replica_healthy() else "primary"
+
+
+async def read_route_async(request: Request | None) -> str:
+    if not has_read_replica() or (request is not None and wrote_recently(request)):
+        return "primary"
+    return "replica" if await replica_healthy_async() else "primary"
+
+
+# =====================================================
+# Stats / shutdown
+# =====================================================
+def pool_stats() -> dict:
+    """Statistik pool engine yang sudah dibuat (tidak membuat engine baru)."""
+    data = {
+        "sync": db_pool.pool_status(_engine, _pool_profile),
+        "async": db_pool.pool_status(_async_engine.sync_engine if _async_engine else None, _pool_profile),
+    }
+    if has_read_replica():
+        data.update({
+            "read_sync": db_pool.pool_status(_read_engine, _read_pool_profile),
+            "read_async": db_pool.pool_status(
+                _async_read_engine.sync_engine if _async_read_engine else None, _read_pool_profile
+            ),
+            "replica": {
+                "healthy": _replica_health.healthy,
+                "lag_seconds": _replica_health.lag_seconds,
+                "error": _replica_health.error,
+                "max_lag_seconds": READ_MAX_LAG_SECONDS,
+                "read_after_write_seconds": READ_AFTER_WRITE_SECONDS,
+            },
+        })
+    return data
+
+
+async def dispose_engines() -> None:
+    global _engine, _async_engine, _read_engine, _async_read_engine
+    for async_engine in (_async_engine, _async_read_engine):
+        if async_engine is not None:
+            await async_engine.dispose()
+    for engine in (_engine, _read_engine):
+        if engine is not None:
+            engine.dispose()
+    _engine = _async_engine = _read_engine = _async_read_engine = None
+    for factory in (SessionLocal, AsyncSessionLocal, ReadSessionLocal, AsyncReadSessionLocal):
+        factory.configure(bind=None)
+
+
+# =====================================================
+# Session
+# =====================================================
+class _LazySessionmaker(sessionmaker):
+    """sessionmaker yang baru membuat engine saat session pertama dibuat."""
+
+    def __init__(self, engine_factory=get_engine, **kw):
+        super().__init__(**kw)
+        self.engine_factory = engine_factory
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=self.engine_factory())
+        return super().__call__(**local_kw)
+
+
+class _LazyAsyncSessionmaker(async_sessionmaker):
+    def __init__(self, engine_factory=get_async_engine, **kw):
+        super().__init__(**kw)
+        self.engine_factory = engine_factory
+
+    def __call__(self, **local_kw):
+        if self.kw.get("bind") is None:
+            self.configure(bind=self.engine_factory())
+        return super().__call__(**local_kw)
+
+
+SessionLocal = _LazySessionmaker(autocommit=False, autoflush=False)
+AsyncSessionLocal = _LazyAsyncSessionmaker(expire_on_commit=False, autoflush=False)
+ReadSessionLocal = _LazySessionmaker(get_read_engine, autocommit=False, autoflush=False)
+AsyncReadSessionLocal = _LazyAsyncSessionmaker(get_async_read_engine, expire_on_commit=False, autoflush=False)
 
 
 # Dependency untuk FastAPI
@@ -100,4 +534,42 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Dependency async: untuk endpoint `async def` (baca)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Dependency baca (laporan / list / export): replica kalau ada & aman, selain itu primary
+def get_read_db(request: Request):
+    route = read_route(request)
+    request.state.db_route = route
+    db = ReadSessionLocal() if route == "replica" else SessionLocal()
+    use_deferred_begin(db)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(request: Request):
+    route = await read_route_async(request)
+    request.state.db_route = route
+    factory = AsyncReadSessionLocal if route == "replica" else AsyncSessionLocal
+    async with factory() as db:
+        yield db
+
+
+def dialect_insert(db, model):
+    """
+    insert() versi dialect (postgresql / sqlite) supaya bisa pakai
+    on_conflict_do_nothing / on_conflict_do_update.
+    """
+    if db.get_bind().dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as _insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as _insert
+    return _insert(model)
@@ -0,0 +1,225 @@
+# db_pool.py
+"""
+Profil connection pool + statistik pool.
+
+Profil dipilih lewat DB_POOL_PROFILE (default `auto`):
+
+- direct       koneksi langsung ke postgres (port 5432). QueuePool biasa,
+               prepared statement asyncpg boleh di-cache.
+- transaction  pooler mode transaction (pgbouncer / Supavisor port 6543).
+               Koneksi server bisa berganti tiap transaksi, jadi prepared
+               statement asyncpg dimatikan; pool lokal di-recycle lebih cepat.
+- serverless   NullPool: tiap session buka koneksi baru lalu ditutup
+               (proses berumur pendek / banyak instance di depan pooler).
+- auto         port 6543 -> transaction, selain itu direct.
+
+Alih-alih pool_pre_ping (SELECT 1 di setiap checkout), koneksi hanya di-ping
+kalau sudah idle di pool lebih lama dari `ping_idle_seconds`.
+"""
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+POOLER_PORTS = {6543}
+
+
+@dataclass(frozen=True)
+class PoolProfile:
+    name: str
+    null_pool: bool = False
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30          # detik menunggu koneksi kosong sebelum TimeoutError
+    pool_recycle: int = 1800          # koneksi lebih tua dari ini dibuang saat checkout
+    ping_idle_seconds: float | None = 60   # None = tidak pernah ping
+    prepared_statements: bool = True  # cache prepared statement asyncpg
+
+
+PROFILES = {
+    "direct": PoolProfile("direct"),
+    "transaction": PoolProfile(
+        "transaction",
+        pool_size=10,
+        max_overflow=10,
+        pool_timeout=10,
+        pool_recycle=300,
+        ping_idle_seconds=30,
+        prepared_statements=False,
+    ),
+    "serverless": PoolProfile(
+        "serverless",
+        null_pool=True,
+        ping_idle_seconds=None,       # koneksi selalu baru
+        prepared_statements=False,
+    ),
+}
+
+
+def resolve_profile(url: URL, name: str | None = None) -> PoolProfile:
+    """Profil dari DB_POOL_PROFILE (atau `name`), plus override DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT."""
+    name = (name or os.getenv("DB_POOL_PROFILE") or "auto").lower()
+    if name == "auto":
+        name = "transaction" if url.port in POOLER_PORTS else "direct"
+    if name not in PROFILES:
+        raise ValueError(f"DB_POOL_PROFILE tidak dikenal: {name} (pilihan: auto, {', '.join(PROFILES)})")
+
+    profile = PROFILES[name]
+    overrides = {}
+    for env, field, cast in (
+        ("DB_POOL_SIZE", "pool_size", int),
+        ("DB_MAX_OVERFLOW", "max_overflow", int),
+        ("DB_POOL_TIMEOUT", "pool_timeout", float),
+    ):
+        if os.getenv(env):
+            overrides[field] = cast(os.environ[env])
+    return replace(profile, **overrides)
+
+
+def engine_kwargs(profile: PoolProfile, is_async: bool = False) -> dict:
+    """kwargs create_engine / create_async_engine untuk profil ini."""
+    if profile.null_pool:
+        return {"poolclass": TimedNullPool}
+    return {
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_size": profile.pool_size,
+        "max_overflow": profile.max_overflow,
+        "pool_timeout": profile.pool_timeout,
+        "pool_recycle": profile.pool_recycle,
+    }
+
+
+# =====================================================
+# Statistik
+# =====================================================
+class PoolStats:
+    """Waktu tunggu checkout (termasuk buka koneksi baru) dan jumlah timeout."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._waits = deque(maxlen=window)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.pings = 0
+        self.ping_failures = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self._waits.append(seconds)
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def record_ping(self, ok: bool) -> None:
+        with self._lock:
+            self.pings += 1
+            if not ok:
+                self.ping_failures += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            data = {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "pings": self.pings,
+                "ping_failures": self.ping_failures,
+                "wait_ms_avg": round(self.total_wait / max(self.checkouts + self.timeouts, 1) * 1000, 3),
+                "wait_ms_max": round(self.max_wait * 1000, 3),
+            }
+        for label, q in (("wait_ms_p50", 0.5), ("wait_ms_p99", 0.99)):
+            data[label] = round(waits[min(int(len(waits) * q), len(waits) - 1)] * 1000, 3) if waits else None
+        return data
+
+
+class _TimedPoolMixin:
+    stats: PoolStats
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            conn = super().connect()
+        except exc.TimeoutError:
+            self.stats.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - started)
+        return conn
+
+    def recreate(self):
+        # dispose() / invalidate membuat pool baru: statistik ikut pindah
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class TimedNullPool(_TimedPoolMixin, NullPool):
+    pass
+
+
+def setup_pool(engine: Engine, profile: PoolProfile) -> None:
+    """Pasang PoolStats + ping saat checkout kalau koneksi sudah idle lama. `engine` = engine sync (AsyncEngine.sync_engine)."""
+    pool = engine.pool
+    if not hasattr(pool, "stats"):
+        pool.stats = PoolStats()
+    if profile.ping_idle_seconds is None:
+        return
+    idle_limit = profile.ping_idle_seconds
+
+    @event.listens_for(engine, "checkin")
+    def _mark_idle(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _ping_if_idle(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_limit:
+            return
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except engine.dialect.loaded_dbapi.Error as e:
+            engine.pool.stats.record_ping(ok=False)
+            # pool membuang koneksi ini dan mencoba koneksi lain
+            raise exc.DisconnectionError(f"ping gagal setelah idle: {e}") from e
+        engine.pool.stats.record_ping(ok=True)
+
+
+def pool_status(engine: Engine | None, profile: PoolProfile | None) -> dict | None:
+    """Kondisi pool saat ini (None kalau engine belum dibuat)."""
+    if engine is None:
+        return None
+    pool = engine.pool
+    data = {
+        "profile": profile.name if profile else None,
+        "pool_class": type(pool).__name__,
+    }
+    if isinstance(pool, QueuePool):
+        data.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": profile.max_overflow if profile else None,
+            "timeout_s": pool.timeout(),
+        })
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        data.update(stats.snapshot())
+    return data
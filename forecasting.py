@@ -0,0 +1,174 @@
+# forecasting.py
+"""
+Forecast demand per SKU dari histori penjualan (stock_movements OUT, ref_type SALE).
+
+Histori diambil satu query agregat lalu dibentuk jadi matriks padat
+(product x hari) di NumPy, dan semua SKU di-fit sekaligus:
+- ma       : moving average `window` hari terakhir
+- ses      : simple exponential smoothing (bobot alpha*(1-alpha)^k, satu perkalian matriks)
+- seasonal : SES di atas data yang sudah dibagi indeks hari-dalam-minggu
+
+Hasil di-cache per (hari, parameter, sidik jari histori). Histori berhenti di
+kemarin, jadi penjualan hari ini tidak mengubah hasil; sidik jari (jumlah baris,
+total qty, jumlah product_id movement SALE di jendela histori) menangkap
+movement yang di-backdate atau hasil restore.
+"""
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import models
+
+METHODS = ("ma", "ses", "seasonal")
+
+_lock = threading.Lock()
+_cache: dict[tuple, dict[int, np.ndarray]] = {}
+
+
+def _sales_window(start: date, days: int) -> tuple:
+    return (
+        models.StockMovement.type == "OUT",
+        models.StockMovement.ref_type == "SALE",
+        models.StockMovement.movement_date >= start,
+        models.StockMovement.movement_date < start + timedelta(days=days),
+    )
+
+
+def load_daily_sales(db: Session, product_ids: np.ndarray, start: date, days: int) -> np.ndarray:
+    """Matriks (len(product_ids), days) berisi total qty terjual per hari."""
+    matrix = np.zeros((len(product_ids), days), dtype=np.float64)
+    if not len(product_ids):
+        return matrix
+
+    day = func.date(models.StockMovement.movement_date)
+    q = (
+        db.query(models.StockMovement.product_id, day, func.sum(models.StockMovement.qty_change))
+        .filter(*_sales_window(start, days))
+        .group_by(models.StockMovement.product_id, day)
+    )
+    if len(product_ids) < 1000:
+        q = q.filter(models.StockMovement.product_id.in_(product_ids.tolist()))
+    rows = q.all()
+    if not rows:
+        return matrix
+
+    pids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    # sqlite mengembalikan string, postgres mengembalikan date
+    days_of = (r[1] if isinstance(r[1], date) else date.fromisoformat(str(r[1])[:10]) for r in rows)
+    offsets = np.fromiter(((d - start).days for d in days_of), dtype=np.int64, count=len(rows))
+    qty = np.fromiter((float(r[2] or 0) for r in rows), dtype=np.float64, count=len(rows))
+
+    # product_ids sudah terurut -> cari baris tiap product dengan searchsorted
+    pos = np.searchsorted(product_ids, pids)
+    pos_clipped = np.minimum(pos, len(product_ids) - 1)
+    valid = (product_ids[pos_clipped] == pids) & (offsets >= 0) & (offsets < days)
+    np.add.at(matrix, (pos_clipped[valid], offsets[valid]), qty[valid])
+    return matrix
+
+
+def _ses_level(x: np.ndarray, alpha: float) -> np.ndarray:
+    """Level akhir SES untuk tiap baris, tanpa loop: sum alpha*(1-alpha)^k * x[t-k] + (1-alpha)^n * x[0]."""
+    n = x.shape[1]
+    decay = (1.0 - alpha) ** np.arange(n - 1, -1, -1)
+    return x @ (alpha * decay) + (1.0 - alpha) ** n * x[:, 0]
+
+
+def fit_forecast(
+    history: np.ndarray,
+    start: date,
+    horizon: int,
+    method: str = "ses",
+    window: int = 7,
+    alpha: float = 0.3,
+) -> np.ndarray:
+    """Forecast harian (n_product, horizon) untuk semua baris history sekaligus."""
+    n, days = history.shape
+    if n == 0 or days == 0:
+        return np.zeros((n, horizon))
+
+    if method == "ma":
+        level = history[:, -min(window, days):].mean(axis=1)
+        return np.repeat(level[:, None], horizon, axis=1)
+
+    if method == "ses":
+        level = _ses_level(history, alpha)
+        return np.repeat(level[:, None], horizon, axis=1)
+
+    # seasonal: indeks hari-dalam-minggu per product
+    history_dow = (start.weekday() + np.arange(days)) % 7
+    overall = history.mean(axis=1, keepdims=True)
+    by_dow = np.stack(
+        [
+            history[:, history_dow == d].mean(axis=1) if np.any(history_dow == d) else overall[:, 0]
+            for d in range(7)
+        ],
+        axis=1,
+    )
+    season = np.divide(by_dow, overall, out=np.ones_like(by_dow), where=overall > 0)
+
+    deseasonalized = np.divide(
+        history, season[:, history_dow], out=np.zeros_like(history), where=season[:, history_dow] > 0
+    )
+    level = _ses_level(deseasonalized, alpha)
+
+    future_dow = ((start + timedelta(days=days)).weekday() + np.arange(horizon)) % 7
+    return level[:, None] * season[:, future_dow]
+
+
+def history_fingerprint(db: Session, start: date, days: int) -> tuple:
+    """Satu agregat di jendela histori; berubah kalau ada movement SALE di dalamnya yang ditambah / diubah / dihapus."""
+    count, qty, products = (
+        db.query(
+            func.count(models.StockMovement.id),
+            func.sum(models.StockMovement.qty_change),
+            func.sum(models.StockMovement.product_id),
+        )
+        .filter(*_sales_window(start, days))
+        .one()
+    )
+    return count, str(qty or 0), products or 0
+
+
+def forecast(
+    db: Session,
+    product_ids: list[int] | None = None,
+    method: str = "ses",
+    horizon: int = 14,
+    history_days: int = 90,
+    window: int = 7,
+    alpha: float = 0.3,
+) -> dict[int, np.ndarray]:
+    """
+    {product_id: array forecast harian (horizon,)}. product_ids=None -> semua
+    product aktif. Histori = history_days hari penuh terakhir (hari ini tidak ikut).
+    """
+    if method not in METHODS:
+        raise ValueError(f"method harus salah satu dari {', '.join(METHODS)}")
+
+    end = datetime.now(timezone.utc).date()
+    start = end - timedelta(days=history_days)
+    key = (end, method, horizon, history_days, window, alpha, history_fingerprint(db, start, history_days))
+
+    if product_ids is None:
+        product_ids = [
+            pid
+            for (pid,) in db.query(models.Product.id).filter(models.Product.is_active == True).all()
+        ]
+
+    with _lock:
+        # cache hari sebelumnya / histori yang sudah berubah tidak relevan lagi
+        for stale in [k for k in _cache if k[0] != end or (k[1:6] == key[1:6] and k != key)]:
+            del _cache[stale]
+        results = _cache.setdefault(key, {})
+        missing = np.unique(np.array([pid for pid in product_ids if pid not in results], dtype=np.int64))
+
+    if len(missing):
+        history = load_daily_sales(db, missing, start, history_days)
+        fitted = fit_forecast(history, start, horizon, method=method, window=window, alpha=alpha)
+        with _lock:
+            results.update(zip(missing.tolist(), fitted))
+
+    return {pid: results[pid] for pid in product_ids if pid in results}
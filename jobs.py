@@ -0,0 +1,453 @@
+# jobs.py
+"""
+Job background untuk pekerjaan admin / batch yang lama (restore, backup ke
+file, reorder, rebuild customer_stats, cari duplikat customer).
+
+- API cukup enqueue() -> baris di tabel jobs (QUEUED), balas job id
+- worker (`python manage.py worker`) claim job pakai SELECT ... FOR UPDATE
+  SKIP LOCKED, jadi beberapa worker bisa jalan bersamaan tanpa ambil job yang sama
+- handler melapor progress lewat JobContext; permintaan cancel dicek setiap
+  laporan progress, lalu transaksi job di-rollback
+- concurrency dibatasi per worker (thread pool sendiri, proses terpisah dari
+  API) dan per type (max_running), jadi pool koneksi POS tidak ikut terpakai
+- job RUNNING yang heartbeat-nya berhenti (worker mati) di-queue ulang
+- file input restore dihapus saat job selesai; file hasil backup dihapus
+  worker setelah JOB_FILE_TTL_HOURS (cleanup_job_files)
+- SQLite (load test lokal): tidak ada SKIP LOCKED / advisory lock; claim
+  berurutan lewat BEGIN IMMEDIATE (db.py). Selama satu job memegang write
+  lock (mis. restore), laporan progress & claim dilewati, bukan gagal
+"""
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import func, select, text, update
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+import models
+from db import SessionLocal
+
+JOB_FILES_DIR = os.getenv("JOB_FILES_DIR") or os.path.join(tempfile.gettempdir(), "makadam-jobs")
+# file hasil (backup) disimpan selama ini untuk di-download, lalu dihapus worker
+JOB_FILE_TTL_SECONDS = int(float(os.getenv("JOB_FILE_TTL_HOURS", "24")) * 3600)
+JOB_FILES_CLEANUP_SECONDS = 600
+HEARTBEAT_SECONDS = 15
+STALE_AFTER_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "300"))
+MAX_ATTEMPTS = 3
+PROGRESS_INTERVAL_SECONDS = 1.0
+SQLITE_PROGRESS_LOCK_TIMEOUT_MS = 200
+
+ACTIVE_STATUSES = ("QUEUED", "RUNNING")
+FINAL_STATUSES = ("SUCCEEDED", "FAILED", "CANCELLED")
+
+
+class JobError(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _sqlite_locked(e: OperationalError) -> bool:
+    return isinstance(e.orig, sqlite3.OperationalError) and "locked" in str(e.orig)
+
+
+# =====================================================
+# Registry job type
+# =====================================================
+@dataclass(frozen=True)
+class JobType:
+    name: str
+    handler: Callable[["JobContext", dict], dict | None]
+    max_running: int | None = None   # batas job RUNNING untuk type ini (semua worker)
+    retry: bool = True               # boleh di-queue ulang kalau worker mati di tengah jalan
+
+
+JOB_TYPES: dict[str, JobType] = {}
+
+
+def job_type(name: str, max_running: int | None = None, retry: bool = True):
+    def register(handler):
+        JOB_TYPES[name] = JobType(name, handler, max_running, retry)
+        return handler
+    return register
+
+
+def job_file_path(name: str) -> str:
+    os.makedirs(JOB_FILES_DIR, exist_ok=True)
+    return os.path.join(JOB_FILES_DIR, name)
+
+
+def _remove_files(paths) -> None:
+    for path in paths or ():
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def cleanup_job_files(db: Session, max_age: int = JOB_FILE_TTL_SECONDS) -> int:
+    """
+    Hapus file di JOB_FILES_DIR yang lebih tua dari max_age detik: hasil backup
+    yang masa simpannya habis, dan sisa spool / upload yang tertinggal (proses
+    mati sebelum enqueue / _finish). Input job QUEUED / RUNNING tidak disentuh.
+    Input restore sendiri sudah dihapus saat job selesai (_finish).
+    """
+    if not os.path.isdir(JOB_FILES_DIR):
+        return 0
+    in_use = {
+        os.path.abspath(path)
+        for (params,) in db.query(models.Job.params).filter(models.Job.status.in_(ACTIVE_STATUSES)).all()
+        for path in (params or {}).get("files") or ()
+    }
+    cutoff = time.time() - max_age
+    expired = []
+    with os.scandir(JOB_FILES_DIR) as entries:
+        for entry in entries:
+            path = os.path.abspath(entry.path)
+            if entry.is_file() and path not in in_use and entry.stat().st_mtime < cutoff:
+                expired.append(path)
+    _remove_files(expired)
+    return len(expired)
+
+
+# =====================================================
+# API: enqueue / cancel
+# =====================================================
+def enqueue(db: Session, name: str, params: dict | None = None, user_id: int | None = None) -> models.Job:
+    """Tambah job QUEUED (commit). params harus JSON-able; file input taruh di params["files"]."""
+    if name not in JOB_TYPES:
+        raise JobError(f"Job type tidak dikenal: {name}")
+    job = models.Job(type=name, status="QUEUED", params=jsonable_encoder(params or {}), created_by=user_id)
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def cancel(db: Session, job: models.Job) -> models.Job:
+    """QUEUED langsung CANCELLED; RUNNING ditandai, handler berhenti di laporan progress berikutnya."""
+    if job.status == "QUEUED":
+        result = db.execute(
+            update(models.Job)
+            .where(models.Job.id == job.id, models.Job.status == "QUEUED")
+            .values(status="CANCELLED", cancel_requested=True, finished_at=_now(), error="Dibatalkan")
+        )
+        db.commit()
+        if result.rowcount:
+            _remove_files((job.params or {}).get("files"))
+    elif job.status == "RUNNING":
+        db.execute(update(models.Job).where(models.Job.id == job.id).values(cancel_requested=True))
+        db.commit()
+    db.refresh(job)
+    return job
+
+
+# =====================================================
+# Worker side
+# =====================================================
+class JobContext:
+    """Dipakai handler untuk lapor progress. Tulis ke DB lewat session pendek sendiri."""
+
+    def __init__(self, job_id: int, params: dict):
+        self.job_id = job_id
+        self.params = params
+        self.current = 0
+        self.total: int | None = None
+        self._last_write = 0.0
+
+    def progress(self, current: int | None = None, total: int | None = None,
+                 message: str | None = None, advance: int = 0, force: bool = False):
+        if total is not None:
+            self.total = total
+        if current is not None:
+            self.current = current
+        self.current += advance
+
+        now = time.monotonic()
+        if not force and now - self._last_write < PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_write = now
+
+        values = {"progress_current": self.current, "progress_total": self.total, "heartbeat_at": _now()}
+        if message is not None:
+            values["progress_message"] = message[:255]
+        with SessionLocal() as db:
+            try:
+                db.connection(execution_options={"sqlite_busy_timeout_ms": SQLITE_PROGRESS_LOCK_TIMEOUT_MS})
+                db.execute(update(models.Job).where(models.Job.id == self.job_id).values(**values))
+                cancelled = db.scalar(select(models.Job.cancel_requested).where(models.Job.id == self.job_id))
+                db.commit()
+            except OperationalError as e:
+                if not _sqlite_locked(e):
+                    raise
+                return
+        if cancelled:
+            raise JobCancelled()
+
+    def check_cancelled(self):
+        self.progress(force=True)
+
+
+def _lock_job_type(db: Session, name: str):
+    """Serialisasi claim untuk type yang punya max_running (advisory lock level transaksi)."""
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"jobs:{name}"})
+
+
+def claim_next(db: Session, worker_id: str, types=None) -> int | None:
+    """Ambil satu job QUEUED tertua dan tandai RUNNING. None kalau tidak ada."""
+    allowed = set(types or JOB_TYPES) & set(JOB_TYPES)
+    while allowed:
+        job = db.execute(
+            select(models.Job)
+            .where(models.Job.status == "QUEUED", models.Job.type.in_(allowed))
+            .order_by(models.Job.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar_one_or_none()
+        if job is None:
+            db.rollback()
+            return None
+
+        cap = JOB_TYPES[job.type].max_running
+        if cap:
+            _lock_job_type(db, job.type)
+            running = db.scalar(
+                select(func.count(models.Job.id)).where(models.Job.type == job.type, models.Job.status == "RUNNING")
+            )
+            if running >= cap:
+                db.rollback()
+                allowed.discard(job.type)
+                continue
+
+        job.status = "RUNNING"
+        job.worker_id = worker_id
+        job.started_at = job.heartbeat_at = _now()
+        job.attempts = (job.attempts or 0) + 1
+        db.commit()
+        return job.id
+    return None
+
+
+def _finish(job_id: int, status: str, result=None, error: str | None = None, ctx: JobContext | None = None):
+    with SessionLocal() as db:
+        job = db.get(models.Job, job_id)
+        if ctx is not None:
+            job.progress_current = ctx.current
+            job.progress_total = ctx.total
+        job.status = status
+        job.result = result
+        job.error = error
+        job.finished_at = _now()
+        db.commit()
+        _remove_files((job.params or {}).get("files"))
+
+
+def execute_job(job_id: int) -> str:
+    """Jalankan satu job yang sudah di-claim, simpan hasil / error. Return status akhir."""
+    with SessionLocal() as db:
+        job = db.get(models.Job, job_id)
+        name, params = job.type, dict(job.params or {})
+
+    spec = JOB_TYPES.get(name)
+    ctx = JobContext(job_id, params)
+    try:
+        if spec is None:
+            raise JobError(f"Job type tidak dikenal: {name}")
+        ctx.check_cancelled()
+        result = spec.handler(ctx, params)
+    except JobCancelled:
+        _finish(job_id, "CANCELLED", error="Dibatalkan", ctx=ctx)
+        return "CANCELLED"
+    except Exception as e:
+        traceback.print_exc()
+        _finish(job_id, "FAILED", error=f"{type(e).__name__}: {e}", ctx=ctx)
+        return "FAILED"
+
+    _finish(job_id, "SUCCEEDED", result=jsonable_encoder(result), ctx=ctx)
+    return "SUCCEEDED"
+
+
+def heartbeat(db: Session, job_ids) -> None:
+    if job_ids:
+        db.execute(update(models.Job).where(models.Job.id.in_(list(job_ids))).values(heartbeat_at=_now()))
+        db.commit()
+
+
+def requeue_stale(db: Session, stale_after: int = STALE_AFTER_SECONDS) -> int:
+    """Job RUNNING tanpa heartbeat (worker mati) -> QUEUED lagi, atau FAILED kalau tidak boleh retry."""
+    cutoff = _now() - timedelta(seconds=stale_after)
+    stale = (
+        db.query(models.Job)
+        .filter(models.Job.status == "RUNNING", models.Job.heartbeat_at < cutoff)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for job in stale:
+        spec = JOB_TYPES.get(job.type)
+        if spec is not None and spec.retry and not job.cancel_requested and job.attempts < MAX_ATTEMPTS:
+            job.status = "QUEUED"
+            job.worker_id = None
+        else:
+            job.status = "CANCELLED" if job.cancel_requested else "FAILED"
+            job.error = "Worker berhenti di tengah job"
+            job.finished_at = _now()
+            _remove_files((job.params or {}).get("files"))
+    db.commit()
+    return len(stale)
+
+
+class Worker:
+    """
+    Loop worker: claim job selama slot masih ada, jalankan di thread pool
+    `concurrency`, heartbeat job yang sedang jalan. stop() -> berhenti claim,
+    tunggu job yang sedang jalan selesai.
+    """
+
+    def __init__(self, concurrency: int = 2, poll_interval: float = 2.0, types=None, worker_id: str | None = None):
+        unknown = set(types or ()) - set(JOB_TYPES)
+        if unknown:
+            raise JobError(f"Job type tidak dikenal: {', '.join(sorted(unknown))}")
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.types = list(types) if types else None
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, once: bool = False) -> int:
+        """once=True: berhenti setelah antrian kosong. Return jumlah job yang dijalankan."""
+        running: dict[int, Future] = {}
+        done = 0
+        last_maintenance = last_cleanup = 0.0
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="job") as executor:
+            while not self._stop.is_set():
+                for job_id in [j for j, f in running.items() if f.done()]:
+                    running.pop(job_id)
+                    done += 1
+
+                claimed = False
+                try:
+                    with SessionLocal() as db:
+                        if time.monotonic() - last_maintenance >= HEARTBEAT_SECONDS:
+                            heartbeat(db, running)
+                            requeue_stale(db)
+                            last_maintenance = time.monotonic()
+                        if time.monotonic() - last_cleanup >= JOB_FILES_CLEANUP_SECONDS:
+                            cleanup_job_files(db)
+                            last_cleanup = time.monotonic()
+                        while len(running) < self.concurrency:
+                            job_id = claim_next(db, self.worker_id, self.types)
+                            if job_id is None:
+                                break
+                            claimed = True
+                            running[job_id] = executor.submit(execute_job, job_id)
+                except OperationalError as e:
+                    if not _sqlite_locked(e):
+                        raise
+
+                if once and not running and not claimed:
+                    break
+                if not claimed:
+                    self._stop.wait(self.poll_interval)
+
+            for future in running.values():
+                future.result()
+        return done + len(running)
+
+
+# =====================================================
+# Job handlers
+# =====================================================
+@job_type("restore", max_running=1)
+def _restore_job(ctx: JobContext, params: dict) -> dict:
+    import backup
+
+    paths = params["files"]
+    # scan ulang untuk total baris (murah dibanding insert); restore sendiri scan lagi
+    total = sum(sum(backup.scan_file(path)[1].values()) for path in paths)
+    ctx.progress(0, total, "Mulai restore", force=True)
+
+    def on_batch(section: str, rows: int):
+        # per chunk insert; tulis ke DB (dan cek cancel) paling sering tiap PROGRESS_INTERVAL_SECONDS
+        ctx.progress(advance=rows, message=f"Restore {section}")
+
+    results = backup.run_restore_chain(paths, check_chain=params.get("chain", False), progress=on_batch)
+    ctx.progress(message="Restore selesai", force=True)
+    return {
+        "files": [
+            {"filename": name, "type": r["type"], "meta": r["meta"], "restored": r["restored"]}
+            for name, r in zip(params.get("filenames") or paths, results)
+        ],
+        "watermark": (results[-1]["meta"] or {}).get("watermark"),
+    }
+
+
+@job_type("backup")
+def _backup_job(ctx: JobContext, params: dict) -> dict:
+    import backup
+
+    compress = params.get("compress", True)
+    kind = "incremental" if params.get("since") else "full"
+    filename = f"backup-{kind}-job{ctx.job_id}-{_now():%Y%m%d-%H%M%S}.json" + (".gz" if compress else "")
+    path = job_file_path(filename)
+
+    written = 0
+    try:
+        with open(path, "wb") as f:
+            for chunk in backup.stream_backup(compress=compress, since=params.get("since")):
+                f.write(chunk)
+                written += len(chunk)
+                ctx.progress(written, message=f"{written / 1024 / 1024:.1f} MB ditulis")
+    except BaseException:
+        _remove_files([path])
+        raise
+
+    meta = backup.read_meta(path) or {}
+    return {"file": path, "filename": filename, "size": written, "watermark": meta.get("watermark")}
+
+
+@job_type("reorder", retry=False)
+def _reorder_job(ctx: JobContext, params: dict):
+    import planning
+
+    with SessionLocal() as db:
+        return planning.run_reorder(db, **params)
+
+
+@job_type("customer_stats_rebuild")
+def _customer_stats_job(ctx: JobContext, params: dict) -> dict:
+    import customer_metrics
+
+    with SessionLocal() as db:
+        total = customer_metrics.refresh_customer_stats(db)
+        ctx.check_cancelled()
+        db.commit()
+    return {"customers_with_orders": total}
+
+
+@job_type("customer_duplicates")
+def _customer_duplicates_job(ctx: JobContext, params: dict) -> dict:
+    from routers.customers import find_duplicate_candidates
+
+    with SessionLocal() as db:
+        candidates = find_duplicate_candidates(db, min_score=params.get("min_score", 0.5))
+    return {"total": len(candidates), "candidates": candidates[: params.get("limit", 1000)]}
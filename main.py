@@ -1,14 +1,74 @@
-from fastapi import FastAPI
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
-from db import Base, engine
-import models
-from routers import auth, products, sales, purchases, expenses, suppliers, recipes, reports, customers, admin_restore, stock_movements, purchase_plan, accounts
+import db
+from routers import auth, products, sales, purchases, expenses, suppliers, recipes, reports, customers, admin_restore, stock_movements, purchase_plan, accounts, stock_takes, jobs
+
+# Schema dibuat / diubah lewat migrasi: `python manage.py migrate` (lihat migrations/)
+# Cek koneksi saat startup: background (default, tidak menahan startup) | block | off
+DB_STARTUP_CHECK = os.getenv("DB_STARTUP_CHECK", "background")
+# Jalankan migrasi saat startup; default hanya untuk SQLite (load test lokal / in-memory)
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE")
+
+
+async def check_database(raise_on_error: bool = False):
+    try:
+        await db.check_connection_async()
+        print(f"✅ Database connected successfully!")
+    except Exception as e:
+        print(f"❌ ERROR: Database connection failed!")
+        print(f"   Error: {e}")
+        print(f"   Troubleshooting:")
+        print(f"   1. Pastikan DATABASE_URL benar di Railway Variables")
+        print(f"   2. Cek Supabase pooler masih aktif")
+        print(f"   3. Cek firewall/network rules")
+        if raise_on_error:
+            raise
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    auto_migrate = DB_AUTO_MIGRATE == "1" if DB_AUTO_MIGRATE is not None else db.is_sqlite()
+    if auto_migrate:
+        import manage
+
+        await asyncio.to_thread(manage.migrate, configure_logger=False)
+
+    check = None
+    if DB_STARTUP_CHECK == "block":
+        await check_database(raise_on_error=True)
+    elif DB_STARTUP_CHECK != "off":
+        # sekaligus memanaskan satu koneksi di pool async
+        check = asyncio.create_task(check_database())
+
+    yield
+
+    if check is not None and not check.done():
+        check.cancel()
+    await db.dispose_engines()
+
+
+app = FastAPI(title="POS & Finance API", lifespan=lifespan)
 
-# Create tables (development only)
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="POS & Finance API")
+@app.middleware("http")
+async def read_after_write_guard(request: Request, call_next):
+    """
+    Tulis yang berhasil -> baca caller ini dari primary sebentar (lihat db.mark_write);
+    penandanya ikut di cookie / header respons, jadi berlaku lintas worker.
+    Header X-DB-Route menunjukkan endpoint baca dilayani primary / replica.
+    """
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        db.mark_write(response)
+    route = getattr(request.state, "db_route", None)
+    if route:
+        response.headers["X-DB-Route"] = route
+    return response
 
 
 # # ✅ PENTING: Tambahkan ini SEBELUM app.include_router
@@ -34,6 +94,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-DB-Route", db.WRITE_MARKER_HEADER],
 )
 
 app.include_router(auth.router)
@@ -49,6 +110,8 @@ app.include_router(admin_restore.router)
 app.include_router(stock_movements.router)
 app.include_router(purchase_plan.router)
 app.include_router(accounts.router) 
+app.include_router(stock_takes.router)
+app.include_router(jobs.router)
 
 @app.get("/")
 def read_root():
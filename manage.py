@@ -0,0 +1,241 @@
+# manage.py
+"""
+Command line untuk pekerjaan terjadwal / admin.
+
+    python manage.py reorder [--lead-time 7] [--review 14] [--lookback 30] [--dry-run]
+    python manage.py customer-duplicates [--min-score 0.5] [--out duplicates.csv]
+    python manage.py rebuild-customer-stats
+    python manage.py backup --out backup.json.gz [--since WATERMARK]
+    python manage.py restore full.json.gz [incremental-1.json.gz ...]
+    python manage.py worker [--concurrency 2] [--type restore ...] [--once]
+    python manage.py migrate [--revision head] [--sql]
+"""
+import argparse
+import csv
+import os
+import signal
+import sys
+import time
+
+from db import SessionLocal
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_REVISION = "0001"
+
+
+def cmd_reorder(args):
+    import planning
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        run = planning.run_reorder(
+            db,
+            lead_time_days=args.lead_time,
+            review_days=args.review,
+            lookback_days=args.lookback,
+            service_z=args.service_z,
+            apply_min_stock=args.apply_min_stock,
+            dry_run=args.dry_run,
+        )
+    finally:
+        db.close()
+
+    print(
+        f"✅ Reorder: {run.evaluated_products} product dievaluasi, "
+        f"{len(run.suggestions)} perlu dibeli, "
+        f"{len(run.created_plan_ids)} draft plan dibuat "
+        f"({time.perf_counter() - started:.1f}s)"
+    )
+
+
+def cmd_customer_duplicates(args):
+    from routers.customers import find_duplicate_candidates
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        candidates = find_duplicate_candidates(db, min_score=args.min_score)
+    finally:
+        db.close()
+
+    out = open(args.out, "w", newline="") if args.out else sys.stdout
+    writer = csv.writer(out)
+    writer.writerow(["customer_id_a", "name_a", "customer_id_b", "name_b", "score", "reasons"])
+    for c in candidates:
+        writer.writerow([c["customer_id_a"], c["name_a"], c["customer_id_b"], c["name_b"], c["score"], "; ".join(c["reasons"])])
+    if args.out:
+        out.close()
+
+    print(f"✅ {len(candidates)} kandidat duplikat ({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+
+
+def cmd_rebuild_customer_stats(args):
+    import customer_metrics
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        total = customer_metrics.refresh_customer_stats(db)
+        db.commit()
+    finally:
+        db.close()
+
+    print(f"✅ customer_stats: {total} customer dengan order ({time.perf_counter() - started:.1f}s)")
+
+
+def cmd_backup(args):
+    import backup
+
+    if args.since:
+        try:
+            backup.decode_watermark(args.since)
+        except backup.BackupError as e:
+            print(f"❌ {e}", file=sys.stderr)
+            sys.exit(1)
+
+    started = time.perf_counter()
+    written = 0
+    with open(args.out, "wb") as f:
+        for chunk in backup.stream_backup(compress=not args.no_gzip, since=args.since):
+            f.write(chunk)
+            written += len(chunk)
+
+    meta = backup.read_meta(args.out) or {}
+    print(f"✅ Backup ditulis ke {args.out}: {written / 1024 / 1024:.1f} MB ({time.perf_counter() - started:.1f}s)")
+    print(f"   watermark (untuk --since berikutnya): {meta.get('watermark')}")
+
+
+def cmd_restore(args):
+    import backup
+
+    started = time.perf_counter()
+    try:
+        results = backup.run_restore_chain(args.files)
+    except backup.BackupError as e:
+        print(f"❌ Restore gagal: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    for path, result in zip(args.files, results):
+        restored = ", ".join(f"{name} {count}" for name, count in result["restored"].items())
+        print(f"✅ {path} ({result['type']}): {restored}")
+    print(f"   selesai dalam {time.perf_counter() - started:.1f}s")
+
+
+def cmd_worker(args):
+    import jobs
+
+    worker = jobs.Worker(concurrency=args.concurrency, poll_interval=args.poll, types=args.type)
+
+    def stop(signum, frame):
+        print("⏹️  Berhenti claim job baru, menunggu job yang sedang jalan...", file=sys.stderr)
+        worker.stop()
+        signal.signal(signum, signal.SIG_DFL)   # sinyal kedua = keluar paksa (job di-queue ulang nanti)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    print(f"🚀 Worker {worker.worker_id}: concurrency {worker.concurrency}, types {args.type or 'semua'}")
+    done = worker.run(once=args.once)
+    print(f"✅ Worker selesai, {done} job dijalankan")
+
+
+def alembic_config():
+    from alembic.config import Config
+
+    return Config(os.path.join(BASE_DIR, "alembic.ini"))
+
+
+def migrate(revision: str = "head", configure_logger: bool = True) -> str | None:
+    """
+    Upgrade schema ke `revision`. Database lama (tabel dibuat create_all,
+    belum ada alembic_version) di-stamp dulu ke baseline, jadi hanya
+    migrasi setelahnya yang dijalankan. Return revisi awal (None = kosong).
+    configure_logger=False: jangan ubah konfigurasi logging (dipanggil dari app).
+    """
+    from alembic import command
+    from alembic.migration import MigrationContext
+    from sqlalchemy import inspect
+
+    import db
+
+    with db.get_engine().connect() as conn:
+        current = MigrationContext.configure(conn).get_current_revision()
+        if current is None and inspect(conn).has_table("products"):
+            print(f"ℹ️  Schema lama tanpa alembic_version, stamp ke baseline {BASELINE_REVISION}")
+            stamp_config = alembic_config()
+            stamp_config.attributes["connection"] = conn
+            stamp_config.attributes["configure_logger"] = configure_logger
+            command.stamp(stamp_config, BASELINE_REVISION)
+            conn.commit()
+            current = BASELINE_REVISION
+
+    # koneksi baru: migrasi CONCURRENTLY butuh autocommit di luar transaksi stamp
+    config = alembic_config()
+    config.attributes["configure_logger"] = configure_logger
+    command.upgrade(config, revision)
+    return current
+
+
+def cmd_migrate(args):
+    from alembic import command
+
+    if args.sql:
+        # SQL offline untuk direview / dijalankan DBA, tanpa koneksi database
+        command.upgrade(alembic_config(), args.revision, sql=True)
+        return
+
+    started = time.perf_counter()
+    before = migrate(args.revision)
+    print(f"✅ Migrasi {before or '(kosong)'} -> {args.revision} ({time.perf_counter() - started:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="POS & Finance admin commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("reorder", help="Hitung reorder point & buat draft PurchasePlan")
+    p.add_argument("--lead-time", type=int, default=7)
+    p.add_argument("--review", type=int, default=14)
+    p.add_argument("--lookback", type=int, default=30)
+    p.add_argument("--service-z", type=float, default=1.65)
+    p.add_argument("--apply-min-stock", action="store_true")
+    p.add_argument("--dry-run", action="store_true")
+    p.set_defaults(func=cmd_reorder)
+
+    p = sub.add_parser("customer-duplicates", help="Cari kandidat customer dobel (CSV)")
+    p.add_argument("--min-score", type=float, default=0.5)
+    p.add_argument("--out", help="File CSV output (default stdout)")
+    p.set_defaults(func=cmd_customer_duplicates)
+
+    p = sub.add_parser("rebuild-customer-stats", help="Hitung ulang customer_stats dari sales_orders")
+    p.set_defaults(func=cmd_rebuild_customer_stats)
+
+    p = sub.add_parser("backup", help="Tulis backup full / incremental (.json.gz)")
+    p.add_argument("--out", required=True)
+    p.add_argument("--since", help="Watermark backup sebelumnya -> backup incremental")
+    p.add_argument("--no-gzip", action="store_true")
+    p.set_defaults(func=cmd_backup)
+
+    p = sub.add_parser("restore", help="Restore backup full + increment (.json / .json.gz), urut")
+    p.add_argument("files", nargs="+")
+    p.set_defaults(func=cmd_restore)
+
+    p = sub.add_parser("worker", help="Jalankan job background dari tabel jobs")
+    p.add_argument("--concurrency", type=int, default=2, help="Job yang boleh jalan bersamaan di worker ini")
+    p.add_argument("--poll", type=float, default=2.0, help="Jeda cek antrian (detik)")
+    p.add_argument("--type", action="append", help="Hanya job type ini (boleh berulang)")
+    p.add_argument("--once", action="store_true", help="Berhenti kalau antrian kosong")
+    p.set_defaults(func=cmd_worker)
+
+    p = sub.add_parser("migrate", help="Upgrade schema database (Alembic)")
+    p.add_argument("--revision", default="head")
+    p.add_argument("--sql", action="store_true", help="Cetak SQL saja, tanpa koneksi database")
+    p.set_defaults(func=cmd_migrate)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# migrations/env.py
+"""
+Environment Alembic. Engine diambil dari db.py (DATABASE_URL yang sama
+dengan app), metadata dari models.py untuk `alembic revision --autogenerate`.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+
+import db
+import models  # noqa: F401  (daftarkan semua tabel ke Base.metadata)
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = db.Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Tulis SQL ke stdout (`alembic upgrade head --sql`) tanpa koneksi database."""
+    context.configure(
+        url=db.get_database_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        # dipanggil dari manage.py migrate dengan koneksi yang sudah dibuka
+        _run(connection)
+        return
+    with db.get_engine().connect() as connection:
+        _run(connection)
+
+
+def _run(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,255 @@
+"""baseline schema
+
+Schema awal, persis yang dulu dibuat Base.metadata.create_all di main.py
+sebelum ada migrasi. Database lama yang sudah punya tabel-tabel ini cukup
+di-stamp ke revisi ini (`python manage.py migrate` melakukannya otomatis);
+tabel & index fitur setelahnya ada di 0003.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('accounts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('type', sa.String(), nullable=False),
+    sa.Column('number', sa.String(), nullable=True),
+    sa.Column('current_balance', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_accounts_id', 'accounts', ['id'], unique=False)
+
+    op.create_table('cash_ledger',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entry_date', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('type', sa.String(length=10), nullable=False),
+    sa.Column('source', sa.String(length=50), nullable=False),
+    sa.Column('ref_id', sa.Integer(), nullable=True),
+    sa.Column('amount', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('notes', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_cash_ledger_id', 'cash_ledger', ['id'], unique=False)
+
+    op.create_table('customers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=200), nullable=False),
+    sa.Column('phone', sa.String(length=50), nullable=True),
+    sa.Column('email', sa.String(length=100), nullable=True),
+    sa.Column('address', sa.Text(), nullable=True),
+    sa.Column('source_channel', sa.String(length=50), nullable=True),
+    sa.Column('notes', sa.Text(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_customers_id', 'customers', ['id'], unique=False)
+
+    op.create_table('products',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sku', sa.String(length=100), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('category', sa.String(length=100), nullable=True),
+    sa.Column('unit', sa.String(length=50), nullable=True),
+    sa.Column('product_type', sa.String(length=20), nullable=False),
+    sa.Column('base_cost', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('sell_price', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('stock_qty', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('min_stock', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_products_id', 'products', ['id'], unique=False)
+    op.create_index('ix_products_sku', 'products', ['sku'], unique=True)
+
+    op.create_table('suppliers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('contact', sa.String(length=255), nullable=True),
+    sa.Column('phone', sa.String(length=50), nullable=True),
+    sa.Column('address', sa.String(length=255), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_index('ix_suppliers_id', 'suppliers', ['id'], unique=False)
+
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('username', sa.String(length=50), nullable=False),
+    sa.Column('password_hash', sa.String(), nullable=False),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('is_admin', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+
+    op.create_table('expenses',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('expense_date', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('category', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.String(length=255), nullable=True),
+    sa.Column('amount', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('payment_method', sa.String(), nullable=True),
+    sa.Column('notes', sa.String(), nullable=True),
+    sa.Column('source_account_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['source_account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_expenses_id', 'expenses', ['id'], unique=False)
+
+    op.create_table('product_recipes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('component_product_id', sa.Integer(), nullable=False),
+    sa.Column('qty_per_unit', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['component_product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_product_recipes_id', 'product_recipes', ['id'], unique=False)
+
+    op.create_table('purchase_orders',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('supplier_id', sa.Integer(), nullable=True),
+    sa.Column('supplier_name', sa.String(length=255), nullable=True),
+    sa.Column('invoice_number', sa.String(length=100), nullable=True),
+    sa.Column('purchase_date', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('total_amount', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('payment_method', sa.String(), nullable=True),
+    sa.Column('notes', sa.String(), nullable=True),
+    sa.Column('source_account_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['source_account_id'], ['accounts.id'], ),
+    sa.ForeignKeyConstraint(['supplier_id'], ['suppliers.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_purchase_orders_id', 'purchase_orders', ['id'], unique=False)
+
+    op.create_table('purchase_plans',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('supplier_id', sa.Integer(), nullable=True),
+    sa.Column('supplier_name', sa.String(length=255), nullable=True),
+    sa.Column('target_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('notes', sa.String(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['supplier_id'], ['suppliers.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_purchase_plans_id', 'purchase_plans', ['id'], unique=False)
+
+    op.create_table('sales_orders',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('customer_name', sa.String(length=255), nullable=True),
+    sa.Column('order_date', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=True),
+    sa.Column('total_amount', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('payment_method', sa.String(), nullable=True),
+    sa.Column('notes', sa.String(), nullable=True),
+    sa.Column('source_account_id', sa.Integer(), nullable=True),
+    sa.Column('customer_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ),
+    sa.ForeignKeyConstraint(['source_account_id'], ['accounts.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sales_orders_id', 'sales_orders', ['id'], unique=False)
+
+    op.create_table('stock_movements',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('movement_date', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('type', sa.String(length=10), nullable=False),
+    sa.Column('ref_type', sa.String(length=50), nullable=True),
+    sa.Column('ref_id', sa.Integer(), nullable=True),
+    sa.Column('qty_change', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('stock_before', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('stock_after', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('notes', sa.String(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_stock_movements_id', 'stock_movements', ['id'], unique=False)
+
+    op.create_table('purchase_order_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('purchase_order_id', sa.Integer(), nullable=True),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('qty', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('unit_cost', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('discount', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('subtotal', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['purchase_order_id'], ['purchase_orders.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_purchase_order_items_id', 'purchase_order_items', ['id'], unique=False)
+
+    op.create_table('purchase_plan_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('plan_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('planned_qty', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('received_qty', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.ForeignKeyConstraint(['plan_id'], ['purchase_plans.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_purchase_plan_items_id', 'purchase_plan_items', ['id'], unique=False)
+
+    op.create_table('sales_order_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sales_order_id', sa.Integer(), nullable=True),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('qty', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('unit_price', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('discount', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('subtotal', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['sales_order_id'], ['sales_orders.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_sales_order_items_id', 'sales_order_items', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    for table in (
+        'sales_order_items',
+        'purchase_plan_items',
+        'purchase_order_items',
+        'stock_movements',
+        'sales_orders',
+        'purchase_plans',
+        'purchase_orders',
+        'product_recipes',
+        'expenses',
+        'users',
+        'suppliers',
+        'products',
+        'customers',
+        'cash_ledger',
+        'accounts',
+    ):
+        op.drop_table(table)
@@ -0,0 +1,59 @@
+"""performance indexes
+
+Index untuk foreign key yang di-join (item order, recipe, plan item) dan
+kolom tanggal yang dipakai filter laporan / urutan list.
+
+Di postgres index dibuat CONCURRENTLY (di luar transaksi migrasi) supaya
+tabel tidak terkunci untuk tulis selama index dibangun di database live.
+Kalau build CONCURRENTLY gagal di tengah, postgres meninggalkan index
+INVALID: DROP INDEX dulu sebelum migrate ulang (IF NOT EXISTS akan melewatinya).
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_sales_orders_order_date', 'sales_orders', ['order_date']),
+    ('ix_sales_orders_customer_date', 'sales_orders', ['customer_id', 'order_date']),
+    ('ix_sales_order_items_sales_order_id', 'sales_order_items', ['sales_order_id']),
+    ('ix_purchase_orders_purchase_date', 'purchase_orders', ['purchase_date']),
+    ('ix_purchase_order_items_purchase_order_id', 'purchase_order_items', ['purchase_order_id']),
+    ('ix_purchase_order_items_product_order', 'purchase_order_items', ['product_id', 'purchase_order_id']),
+    ('ix_stock_movements_product_date', 'stock_movements', ['product_id', 'movement_date']),
+    ('ix_stock_movements_movement_date', 'stock_movements', ['movement_date']),
+    ('ix_cash_ledger_entry_date', 'cash_ledger', ['entry_date']),
+    ('ix_expenses_expense_date', 'expenses', ['expense_date']),
+    ('ix_product_recipes_product_id', 'product_recipes', ['product_id']),
+    ('ix_product_recipes_component_product_id', 'product_recipes', ['component_product_id']),
+    ('ix_purchase_plan_items_product_id', 'purchase_plan_items', ['product_id']),
+]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(
+                    name, table, columns,
+                    postgresql_concurrently=True, if_not_exists=True,
+                )
+        return
+
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,189 @@
+"""feature tables and indexes
+
+Tabel & index yang ditambahkan fitur setelah baseline:
+- stock_takes / stock_take_lines   (stock opname)
+- production_orders / _items       (produksi & build-batch)
+- recipe_costs                     (cache biaya recipe)
+- customer_stats                   (agregat RFM customer)
+- jobs                             (antrian job background)
+- index list / laporan: customers (name, id) + trigram & digit HP di
+  postgres, purchase_plans (status, id), purchase_plan_items.plan_id,
+  stock_movements (type, movement_date)
+
+Semua pakai IF NOT EXISTS: database yang sempat dibuat create_all versi
+aplikasi sebelum migrasi (tabel sebagian sudah ada) tetap bisa di-stamp ke
+0001 lalu di-upgrade. Index di tabel lama dibuat CONCURRENTLY di postgres,
+sama seperti 0002.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_customers_name_id', 'customers', ['name', 'id']),
+    ('ix_purchase_plans_status_id', 'purchase_plans', ['status', 'id']),
+    ('ix_purchase_plan_items_plan_id', 'purchase_plan_items', ['plan_id']),
+    ('ix_stock_movements_type_date', 'stock_movements', ['type', 'movement_date']),
+]
+
+# pencarian customer: ILIKE pakai trigram, prefix nomor HP (hanya digit)
+POSTGRES_INDEXES = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_customers_name_trgm ON customers USING gin (name gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_customers_email_trgm ON customers USING gin (email gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_customers_phone_digits ON customers "
+    "(regexp_replace(phone, '[^0-9]', '', 'g') text_pattern_ops)",
+]
+
+
+def _create_tables() -> None:
+    op.create_table('stock_takes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('notes', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('posted_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True,
+    )
+    op.create_index('ix_stock_takes_id', 'stock_takes', ['id'], unique=False, if_not_exists=True)
+
+    op.create_table('stock_take_lines',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('stock_take_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('counted_qty', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('system_qty', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.Column('variance', sa.Numeric(precision=18, scale=2), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['stock_take_id'], ['stock_takes.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('stock_take_id', 'product_id', name='uq_stock_take_lines_take_product'),
+    if_not_exists=True,
+    )
+    op.create_index('ix_stock_take_lines_id', 'stock_take_lines', ['id'], unique=False, if_not_exists=True)
+    op.create_index(
+        'ix_stock_take_lines_stock_take_id', 'stock_take_lines', ['stock_take_id'], unique=False, if_not_exists=True,
+    )
+
+    op.create_table('production_orders',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('notes', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True,
+    )
+    op.create_index('ix_production_orders_id', 'production_orders', ['id'], unique=False, if_not_exists=True)
+
+    op.create_table('production_order_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('production_order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('qty', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['production_order_id'], ['production_orders.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True,
+    )
+    op.create_index(
+        'ix_production_order_items_id', 'production_order_items', ['id'], unique=False, if_not_exists=True,
+    )
+    op.create_index(
+        'ix_production_order_items_production_order_id', 'production_order_items', ['production_order_id'],
+        unique=False, if_not_exists=True,
+    )
+
+    op.create_table('recipe_costs',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('unit_cost', sa.Numeric(precision=18, scale=4), nullable=False),
+    sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('product_id'),
+    if_not_exists=True,
+    )
+
+    op.create_table('customer_stats',
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('first_order_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_order_date', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('total_spend', sa.Numeric(precision=18, scale=2), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('customer_id'),
+    if_not_exists=True,
+    )
+
+    op.create_table('jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('type', sa.String(length=50), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('params', sa.JSON(), nullable=True),
+    sa.Column('result', sa.JSON(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('progress_current', sa.Integer(), nullable=False),
+    sa.Column('progress_total', sa.Integer(), nullable=True),
+    sa.Column('progress_message', sa.String(length=255), nullable=True),
+    sa.Column('cancel_requested', sa.Boolean(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('worker_id', sa.String(length=100), nullable=True),
+    sa.Column('created_by', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    if_not_exists=True,
+    )
+    op.create_index('ix_jobs_id', 'jobs', ['id'], unique=False, if_not_exists=True)
+    op.create_index('ix_jobs_status_id', 'jobs', ['status', 'id'], unique=False, if_not_exists=True)
+
+
+def upgrade() -> None:
+    _create_tables()
+
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        with op.get_context().autocommit_block():
+            for name, table, columns in INDEXES:
+                op.create_index(
+                    name, table, columns,
+                    postgresql_concurrently=True, if_not_exists=True,
+                )
+            for statement in POSTGRES_INDEXES:
+                op.execute(statement)
+        return
+
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        for name in ('ix_customers_phone_digits', 'ix_customers_email_trgm', 'ix_customers_name_trgm'):
+            op.drop_index(name, table_name='customers', if_exists=True)
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
+    for table in (
+        'jobs',
+        'customer_stats',
+        'recipe_costs',
+        'production_order_items',
+        'production_orders',
+        'stock_take_lines',
+        'stock_takes',
+    ):
+        op.drop_table(table, if_exists=True)
@@ -7,14 +7,30 @@ from sqlalchemy import (
     Numeric,
     DateTime,
     ForeignKey,
-    Text
+    Text,
+    UniqueConstraint,
+    Index,
+    JSON,
 )
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, literal_column
 
 from db import Base
 from decimal import Decimal
 
+
+def phone_digits(phone_column):
+    """
+    regexp_replace(phone, '[^0-9]', '', 'g') dengan argumen literal (bukan bind
+    param) supaya query persis sama dengan expression index ix_customers_phone_digits.
+    """
+    return func.regexp_replace(
+        phone_column,
+        literal_column("'[^0-9]'"),
+        literal_column("''"),
+        literal_column("'g'"),
+    )
+
 class User(Base):
     __tablename__ = "users"
 
@@ -88,6 +104,11 @@ class Product(Base):
 
 class SalesOrder(Base):
     __tablename__ = "sales_orders"
+    __table_args__ = (
+        # laporan per periode & riwayat order per customer
+        Index("ix_sales_orders_order_date", "order_date"),
+        Index("ix_sales_orders_customer_date", "customer_id", "order_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     customer_name = Column(String(255), nullable=True)
@@ -111,7 +132,7 @@ class SalesOrderItem(Base):
     __tablename__ = "sales_order_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    sales_order_id = Column(Integer, ForeignKey("sales_orders.id"))
+    sales_order_id = Column(Integer, ForeignKey("sales_orders.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     qty = Column(Numeric(18, 2), nullable=False)
     unit_price = Column(Numeric(18, 2), nullable=False)
@@ -124,6 +145,13 @@ class SalesOrderItem(Base):
 
 class StockMovement(Base):
     __tablename__ = "stock_movements"
+    __table_args__ = (
+        # dipakai agregasi pemakaian harian (reorder / forecast)
+        Index("ix_stock_movements_type_date", "type", "movement_date"),
+        # kartu stok per produk & list movement terbaru
+        Index("ix_stock_movements_product_date", "product_id", "movement_date"),
+        Index("ix_stock_movements_movement_date", "movement_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
@@ -143,7 +171,7 @@ class CashLedger(Base):
     __tablename__ = "cash_ledger"
 
     id = Column(Integer, primary_key=True, index=True)
-    entry_date = Column(DateTime(timezone=True), server_default=func.now())
+    entry_date = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     type = Column(String(10), nullable=False)        # IN, OUT
     source = Column(String(50), nullable=False)      # SALE, PURCHASE, EXPENSE
     ref_id = Column(Integer)
@@ -174,6 +202,26 @@ class Customer(Base):
         onupdate=func.now(),
     )
 
+    __table_args__ = (
+        # keyset pagination (urut nama)
+        Index("ix_customers_name_id", "name", "id"),
+        # ILIKE '%q%' pakai trigram (butuh extension pg_trgm)
+        Index(
+            "ix_customers_name_trgm", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_customers_email_trgm", "email",
+            postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+        # prefix search nomor HP (hanya digit)
+        Index(
+            "ix_customers_phone_digits",
+            phone_digits(phone).label("phone_digits"),
+            postgresql_ops={"phone_digits": "text_pattern_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
 
 class Supplier(Base):
     __tablename__ = "suppliers"
@@ -197,7 +245,7 @@ class PurchaseOrder(Base):
     supplier_id = Column(Integer, ForeignKey("suppliers.id"), nullable=True)
     supplier_name = Column(String(255))  # boleh tetap diisi untuk display
     invoice_number = Column(String(100))
-    purchase_date = Column(DateTime(timezone=True), server_default=func.now())
+    purchase_date = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     total_amount = Column(Numeric(18, 2), default=0)
     payment_method = Column(String(50), default="CASH")
     notes = Column(String)
@@ -216,9 +264,13 @@ class PurchaseOrder(Base):
 
 class PurchaseOrderItem(Base):
     __tablename__ = "purchase_order_items"
+    __table_args__ = (
+        # supplier terakhir per produk (planning.last_supplier_by_product)
+        Index("ix_purchase_order_items_product_order", "product_id", "purchase_order_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    purchase_order_id = Column(Integer, ForeignKey("purchase_orders.id"))
+    purchase_order_id = Column(Integer, ForeignKey("purchase_orders.id"), index=True)
     product_id = Column(Integer, ForeignKey("products.id"))
     qty = Column(Numeric(18, 2), nullable=False)
     unit_cost = Column(Numeric(18, 2), nullable=False)
@@ -233,7 +285,7 @@ class Expense(Base):
     __tablename__ = "expenses"
 
     id = Column(Integer, primary_key=True, index=True)
-    expense_date = Column(DateTime(timezone=True), server_default=func.now())
+    expense_date = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     category = Column(String(100), nullable=False)   # misal: ONGKIR, LISTRIK, OPERASIONAL
     description = Column(String(255))
     amount = Column(Numeric(18, 2), nullable=False)
@@ -249,8 +301,8 @@ class ProductRecipe(Base):
     __tablename__ = "product_recipes"
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
-    component_product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    component_product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
     qty_per_unit = Column(Numeric(18, 2), nullable=False)  # berapa banyak RAW per 1 unit INTERNAL
 
     product = relationship(
@@ -268,13 +320,16 @@ class ProductRecipe(Base):
 
 class PurchasePlan(Base):
     __tablename__ = "purchase_plans"
+    __table_args__ = (
+        Index("ix_purchase_plans_status_id", "status", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     supplier_id = Column(Integer, ForeignKey("suppliers.id"), nullable=True)
     supplier_name = Column(String(255), nullable=True)
     target_date = Column(DateTime(timezone=True), nullable=True)
     notes = Column(String, nullable=True)
-    status = Column(String(20), default="OPEN")  # OPEN, PARTIAL, COMPLETED, CANCELLED
+    status = Column(String(20), default="OPEN")  # DRAFT, OPEN, PARTIAL, COMPLETED, CANCELLED
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True),
@@ -289,8 +344,8 @@ class PurchasePlanItem(Base):
     __tablename__ = "purchase_plan_items"
 
     id = Column(Integer, primary_key=True, index=True)
-    plan_id = Column(Integer, ForeignKey("purchase_plans.id"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    plan_id = Column(Integer, ForeignKey("purchase_plans.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
 
     planned_qty = Column(Numeric(18, 2), nullable=False)  # contoh 50
     received_qty = Column(Numeric(18, 2), default=0)      # accumulator dari semua purchase
@@ -308,4 +363,105 @@ class PurchasePlanItem(Base):
 #     bank_name = Column(String, nullable=True)         # contoh: "BCA"
 #     account_number = Column(String, nullable=True)    # contoh: "2330171191"
 #     current_balance = Column(Numeric, default=0)
-#     is_active = Column(Boolean, default=True)
\ No newline at end of file
+#     is_active = Column(Boolean, default=True)
+
+class StockTake(Base):
+    __tablename__ = "stock_takes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), nullable=False, default="DRAFT")  # DRAFT, POSTED, CANCELLED
+    notes = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    posted_at = Column(DateTime(timezone=True), nullable=True)
+
+    lines = relationship("StockTakeLine", back_populates="stock_take", cascade="all, delete-orphan")
+
+
+class StockTakeLine(Base):
+    __tablename__ = "stock_take_lines"
+    __table_args__ = (
+        UniqueConstraint("stock_take_id", "product_id", name="uq_stock_take_lines_take_product"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    stock_take_id = Column(Integer, ForeignKey("stock_takes.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    counted_qty = Column(Numeric(18, 2), nullable=False)
+    system_qty = Column(Numeric(18, 2), nullable=True)   # diisi saat posting (snapshot stock_qty)
+    variance = Column(Numeric(18, 2), nullable=True)     # counted_qty - system_qty, diisi saat posting
+
+    stock_take = relationship("StockTake", back_populates="lines")
+    product = relationship("Product")
+
+
+class ProductionOrder(Base):
+    __tablename__ = "production_orders"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), nullable=False, default="COMPLETED")
+    notes = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    items = relationship("ProductionOrderItem", back_populates="production_order", cascade="all, delete-orphan")
+
+
+class ProductionOrderItem(Base):
+    __tablename__ = "production_order_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    production_order_id = Column(Integer, ForeignKey("production_orders.id"), nullable=False, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    qty = Column(Numeric(18, 2), nullable=False)
+
+    production_order = relationship("ProductionOrder", back_populates="items")
+    product = relationship("Product")
+
+
+class RecipeCost(Base):
+    """Cache biaya produksi per unit (rollup BOM). Dihapus saat base_cost komponen / recipe berubah."""
+    __tablename__ = "recipe_costs"
+
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    unit_cost = Column(Numeric(18, 4), nullable=False)
+    computed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class CustomerStats(Base):
+    """Agregat penjualan per customer (RFM / lifetime value). Di-update tiap create_sale, bisa di-rebuild."""
+    __tablename__ = "customer_stats"
+
+    customer_id = Column(Integer, ForeignKey("customers.id", ondelete="CASCADE"), primary_key=True)
+    first_order_date = Column(DateTime(timezone=True), nullable=True)
+    last_order_date = Column(DateTime(timezone=True), nullable=True)
+    order_count = Column(Integer, nullable=False, default=0)
+    total_spend = Column(Numeric(18, 2), nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class Job(Base):
+    """Antrian job background (restore, reorder, rebuild, ...). Diambil worker pakai FOR UPDATE SKIP LOCKED."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    type = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False, default="QUEUED")   # QUEUED / RUNNING / SUCCEEDED / FAILED / CANCELLED
+    params = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+
+    progress_current = Column(Integer, nullable=False, default=0)
+    progress_total = Column(Integer, nullable=True)
+    progress_message = Column(String(255), nullable=True)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+    attempts = Column(Integer, nullable=False, default=0)
+
+    worker_id = Column(String(100), nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_id", "status", "id"),
+    )
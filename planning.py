@@ -0,0 +1,393 @@
+# planning.py
+"""
+Helper perencanaan pembelian (MRP, reorder): query batch + hitungan murni.
+Semua fungsi membaca data sekaligus untuk seluruh katalog / set product,
+bukan satu query per product. Netting MRP dihitung per level BOM di NumPy.
+"""
+import math
+import os
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal, ROUND_CEILING, ROUND_HALF_UP
+
+import numpy as np
+
+from sqlalchemy import and_, case, func, insert, or_, update
+from sqlalchemy.orm import Session
+
+import forecasting
+import models
+
+# Sisa qty plan dengan status ini dianggap "akan datang", sama untuk MRP dan
+# reorder. DRAFT ikut dihitung supaya run reorder berikutnya tidak membuat
+# draft dobel, tapi hanya selama DRAFT_EXPIRY_DAYS: draft yang tidak pernah
+# dikonfirmasi / dibatalkan tidak boleh menahan reorder selamanya.
+OPEN_PLAN_STATUSES = ("OPEN", "PARTIAL")
+DRAFT_EXPIRY_DAYS = int(os.getenv("PURCHASE_PLAN_DRAFT_EXPIRY_DAYS", "7"))
+QTY_PLACES = Decimal("0.01")
+
+
+def load_recipes(db: Session) -> dict[int, list[tuple[int, Decimal]]]:
+    """Semua BOM dalam satu query: {product_id: [(component_id, qty_per_unit), ...]}"""
+    recipes: dict[int, list[tuple[int, Decimal]]] = defaultdict(list)
+    for product_id, component_id, qty_per_unit in db.query(
+        models.ProductRecipe.product_id,
+        models.ProductRecipe.component_product_id,
+        models.ProductRecipe.qty_per_unit,
+    ).all():
+        recipes[product_id].append((component_id, Decimal(str(qty_per_unit))))
+    return recipes
+
+
+def _draft_cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=DRAFT_EXPIRY_DAYS)
+
+
+def on_order_filter():
+    """Plan OPEN / PARTIAL, plus DRAFT yang belum kedaluwarsa."""
+    plan = models.PurchasePlan
+    return or_(
+        plan.status.in_(OPEN_PLAN_STATUSES),
+        and_(plan.status == "DRAFT", plan.created_at >= _draft_cutoff()),
+    )
+
+
+def expire_stale_drafts(db: Session) -> int:
+    """Batalkan DRAFT yang lebih tua dari DRAFT_EXPIRY_DAYS. Return jumlah plan."""
+    plan = models.PurchasePlan
+    result = db.execute(
+        update(plan)
+        .where(plan.status == "DRAFT", plan.created_at < _draft_cutoff())
+        .values(status="CANCELLED")
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount or 0
+
+
+def open_plan_quantities(db: Session, product_ids=None) -> dict[int, Decimal]:
+    """
+    Sisa qty yang masih akan datang dari PurchasePlan terbuka
+    (planned_qty - received_qty), dijumlah per product.
+    """
+    item = models.PurchasePlanItem
+    remaining = item.planned_qty - func.coalesce(item.received_qty, 0)
+
+    q = (
+        db.query(
+            item.product_id,
+            func.sum(case((remaining > 0, remaining), else_=0)),
+        )
+        .join(models.PurchasePlan, models.PurchasePlan.id == item.plan_id)
+        .filter(on_order_filter())
+    )
+    if product_ids is not None:
+        q = q.filter(item.product_id.in_(list(product_ids)))
+
+    return {
+        product_id: Decimal(str(qty or 0))
+        for product_id, qty in q.group_by(item.product_id).all()
+    }
+
+
+def last_supplier_by_product(db: Session, product_ids=None) -> dict[int, tuple[int | None, str | None]]:
+    """
+    Supplier terakhir per product, diambil dari pembelian paling baru.
+    {product_id: (supplier_id, supplier_name)}
+    """
+    poi = models.PurchaseOrderItem
+    latest = db.query(
+        poi.product_id.label("product_id"),
+        func.max(poi.purchase_order_id).label("purchase_order_id"),
+    )
+    if product_ids is not None:
+        latest = latest.filter(poi.product_id.in_(list(product_ids)))
+    latest = latest.group_by(poi.product_id).subquery()
+
+    rows = (
+        db.query(
+            latest.c.product_id,
+            models.PurchaseOrder.supplier_id,
+            func.coalesce(models.Supplier.name, models.PurchaseOrder.supplier_name),
+        )
+        .join(models.PurchaseOrder, models.PurchaseOrder.id == latest.c.purchase_order_id)
+        .outerjoin(models.Supplier, models.Supplier.id == models.PurchaseOrder.supplier_id)
+        .all()
+    )
+    return {product_id: (supplier_id, supplier_name) for product_id, supplier_id, supplier_name in rows}
+
+
+def bom_order(roots, recipes: dict[int, list[tuple[int, Decimal]]]) -> list[int]:
+    """
+    Urutan topologis (parent sebelum komponennya) untuk semua product yang
+    terjangkau dari roots. Raise ValueError kalau ada recipe melingkar.
+    """
+    state: dict[int, int] = {}   # 1 = sedang dikunjungi, 2 = selesai
+    postorder: list[int] = []
+
+    for root in roots:
+        if root in state:
+            continue
+        stack = [(root, iter(recipes.get(root, ())))]
+        state[root] = 1
+        while stack:
+            node, children = stack[-1]
+            for component_id, _ in children:
+                if state.get(component_id) == 1:
+                    raise ValueError(f"Recipe melingkar di product id {component_id}")
+                if component_id not in state:
+                    state[component_id] = 1
+                    stack.append((component_id, iter(recipes.get(component_id, ()))))
+                    break
+            else:
+                stack.pop()
+                state[node] = 2
+                postorder.append(node)
+
+    postorder.reverse()
+    return postorder
+
+
+def explode_requirements(
+    demand: dict[int, Decimal],
+    recipes: dict[int, list[tuple[int, Decimal]]],
+    available: dict[int, Decimal],
+) -> tuple[dict[int, Decimal], dict[int, Decimal]]:
+    """
+    MRP netting bertingkat, vektor per level BOM (low-level code: level
+    terdalam tempat product muncul). Semua parent di level L selesai sebelum
+    komponennya di level > L di-net, jadi kebutuhan dari beberapa parent
+    sudah terkumpul:
+      net = max(gross - available, 0), lalu net * qty_per_unit diturunkan ke komponen.
+    Return (gross, net) per product, dibulatkan ke QTY_PLACES.
+    """
+    order = bom_order(list(demand), recipes)
+    if not order:
+        return {}, {}
+    index = {pid: i for i, pid in enumerate(order)}
+
+    parents, children, per_unit = [], [], []
+    level = np.zeros(len(order), dtype=np.int64)
+    for pid in order:   # urut topologis: level parent sudah final
+        for component_id, qty_per_unit in recipes.get(pid, ()):
+            parents.append(index[pid])
+            children.append(index[component_id])
+            per_unit.append(float(qty_per_unit))
+            level[index[component_id]] = max(level[index[component_id]], level[index[pid]] + 1)
+    parents = np.array(parents, dtype=np.int64)
+    children = np.array(children, dtype=np.int64)
+    per_unit = np.array(per_unit, dtype=np.float64)
+
+    gross = np.zeros(len(order))
+    for pid, qty in demand.items():
+        gross[index[pid]] += float(qty)
+    avail = np.array([float(available.get(pid, 0)) for pid in order])
+
+    net = np.zeros(len(order))
+    edge_level = level[parents]
+    for lvl in range(int(level.max()) + 1):
+        nodes = level == lvl
+        net[nodes] = np.maximum(gross[nodes] - avail[nodes], 0.0)
+        edges = edge_level == lvl
+        np.add.at(gross, children[edges], net[parents[edges]] * per_unit[edges])
+
+    return (
+        {pid: _to_qty(gross[i]) for pid, i in index.items()},
+        {pid: _to_qty(net[i]) for pid, i in index.items()},
+    )
+
+
+def forecast_demand(db: Session, **forecast_kwargs) -> dict[int, Decimal]:
+    """Total forecast penjualan per product selama horizon (hanya yang > 0), untuk demand MRP."""
+    totals = {}
+    for product_id, daily in forecasting.forecast(db, **forecast_kwargs).items():
+        qty = _to_qty(daily.sum())
+        if qty > 0:
+            totals[product_id] = qty
+    return totals
+
+
+# =====================================================
+# Reorder point engine
+# =====================================================
+@dataclass
+class ReorderSuggestion:
+    product_id: int
+    sku: str
+    product_name: str
+    avg_daily_usage: Decimal
+    reorder_point: Decimal
+    reorder_qty: Decimal
+    stock_qty: Decimal
+    on_order_qty: Decimal
+    supplier_id: int | None = None
+    supplier_name: str | None = None
+
+
+@dataclass
+class ReorderRun:
+    evaluated_products: int = 0
+    suggestions: list[ReorderSuggestion] = field(default_factory=list)
+    created_plan_ids: list[int] = field(default_factory=list)
+
+
+def daily_usage(db: Session, since: date, until: date) -> dict[int, dict[date, float]]:
+    """
+    Total qty keluar (OUT: sale, build, production) per product per hari
+    di [since, until), satu query agregat untuk seluruh katalog. until = hari
+    ini -> hanya hari penuh, sama seperti forecasting.py.
+    """
+    day = func.date(models.StockMovement.movement_date)
+    rows = (
+        db.query(models.StockMovement.product_id, day, func.sum(models.StockMovement.qty_change))
+        .filter(
+            models.StockMovement.type == "OUT",
+            models.StockMovement.movement_date >= since,
+            models.StockMovement.movement_date < until,
+        )
+        .group_by(models.StockMovement.product_id, day)
+        .all()
+    )
+
+    usage: dict[int, dict[date, float]] = defaultdict(dict)
+    for product_id, d, qty in rows:
+        # sqlite mengembalikan string, postgres mengembalikan date
+        d = d if isinstance(d, date) else date.fromisoformat(str(d)[:10])
+        usage[product_id][d] = float(qty or 0)
+    return usage
+
+
+def reorder_point(
+    daily: dict[date, float],
+    lookback_days: int,
+    lead_time_days: int,
+    review_days: int,
+    service_z: float,
+) -> tuple[float, float, float]:
+    """
+    (avg_daily, reorder_point, order_up_to). Hari tanpa penjualan dihitung 0.
+      safety stock = z * std_daily * sqrt(lead_time)
+      reorder point = avg_daily * lead_time + safety stock
+      order up to   = reorder point + avg_daily * review_days
+    """
+    values = list(daily.values())
+    avg = sum(values) / lookback_days
+    variance = max(sum(v * v for v in values) / lookback_days - avg * avg, 0.0)
+    safety = service_z * math.sqrt(variance) * math.sqrt(lead_time_days)
+    rop = avg * lead_time_days + safety
+    return avg, rop, rop + avg * review_days
+
+
+def _to_qty(value: float, rounding=ROUND_HALF_UP) -> Decimal:
+    return Decimal(str(float(value))).quantize(QTY_PLACES, rounding=rounding)
+
+
+def run_reorder(
+    db: Session,
+    lead_time_days: int = 7,
+    review_days: int = 14,
+    lookback_days: int = 30,
+    service_z: float = 1.65,
+    apply_min_stock: bool = False,
+    dry_run: bool = False,
+) -> ReorderRun:
+    """
+    Hitung reorder point & qty untuk semua product yang dibeli (bukan SERVICE,
+    tidak punya recipe) dari pemakaian di stock_movements, lalu buat
+    PurchasePlan DRAFT per supplier. Semua baca & tulis batch, cocok dijalankan
+    sebagai job terjadwal untuk seluruh katalog. DRAFT yang sudah kedaluwarsa
+    dibatalkan dulu (lihat DRAFT_EXPIRY_DAYS).
+    """
+    # lookback_days hari penuh terakhir; hari ini (belum selesai) tidak ikut
+    today = datetime.now(timezone.utc).date()
+    since = today - timedelta(days=lookback_days)
+
+    made_ids = {pid for (pid,) in db.query(models.ProductRecipe.product_id).distinct().all()}
+    products = [
+        p
+        for p in db.query(
+            models.Product.id,
+            models.Product.sku,
+            models.Product.name,
+            models.Product.stock_qty,
+        )
+        .filter(
+            models.Product.is_active == True,
+            models.Product.product_type != "SERVICE",
+        )
+        .all()
+        if p.id not in made_ids
+    ]
+
+    usage = daily_usage(db, since, today)
+    if not dry_run:
+        expire_stale_drafts(db)
+    on_order = open_plan_quantities(db)
+
+    run = ReorderRun(evaluated_products=len(products))
+    min_stock_updates = []
+    for p in products:
+        avg, rop, order_up_to = reorder_point(
+            usage.get(p.id, {}), lookback_days, lead_time_days, review_days, service_z
+        )
+        if apply_min_stock:
+            min_stock_updates.append({"id": p.id, "min_stock": _to_qty(rop)})
+
+        stock = Decimal(str(p.stock_qty or 0))
+        pending = on_order.get(p.id, Decimal("0"))
+        position = float(stock + pending)
+        if avg <= 0 or position > rop:
+            continue
+
+        run.suggestions.append(
+            ReorderSuggestion(
+                product_id=p.id,
+                sku=p.sku,
+                product_name=p.name,
+                avg_daily_usage=_to_qty(avg),
+                reorder_point=_to_qty(rop),
+                reorder_qty=_to_qty(order_up_to - position, ROUND_CEILING),
+                stock_qty=stock,
+                on_order_qty=pending,
+            )
+        )
+
+    if run.suggestions:
+        suppliers = last_supplier_by_product(db, [s.product_id for s in run.suggestions])
+        for s in run.suggestions:
+            s.supplier_id, s.supplier_name = suppliers.get(s.product_id, (None, None))
+
+    if dry_run:
+        return run
+
+    if min_stock_updates:
+        db.execute(update(models.Product), min_stock_updates)
+
+    # Satu PurchasePlan DRAFT per supplier
+    by_supplier: dict[int | None, list[ReorderSuggestion]] = defaultdict(list)
+    for s in run.suggestions:
+        by_supplier[s.supplier_id].append(s)
+
+    plans = [
+        models.PurchasePlan(
+            supplier_id=supplier_id,
+            supplier_name=items[0].supplier_name,
+            notes=f"Auto reorder {date.today().isoformat()} (lead time {lead_time_days} hari)",
+            status="DRAFT",
+        )
+        for supplier_id, items in by_supplier.items()
+    ]
+    db.add_all(plans)
+    db.flush()
+
+    plan_items = [
+        {"plan_id": plan.id, "product_id": s.product_id, "planned_qty": s.reorder_qty, "received_qty": Decimal("0")}
+        for plan, items in zip(plans, by_supplier.values())
+        for s in items
+    ]
+    if plan_items:
+        db.execute(insert(models.PurchasePlanItem), plan_items)
+
+    db.commit()
+    run.created_plan_ids = [plan.id for plan in plans]
+    return run
@@ -1,8 +1,10 @@
 # routers/accounts.py
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from db import get_db
+from db import get_db, get_async_read_db
 import models, schemas
 
 router = APIRouter(
@@ -11,17 +13,16 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=list[schemas.AccountOut])
-def list_accounts(db: Session = Depends(get_db)):
+async def list_accounts(db: AsyncSession = Depends(get_async_read_db)):
     """
     List semua rekening (accounts) yang aktif.
     """
-    accounts = (
-        db.query(models.Account)
-        .filter(models.Account.is_active == True)
+    result = await db.execute(
+        select(models.Account)
+        .where(models.Account.is_active == True)
         .order_by(models.Account.name.asc())
-        .all()
     )
-    return accounts
+    return result.scalars().all()
 
 
 @router.post("/", response_model=schemas.AccountOut, status_code=status.HTTP_201_CREATED)
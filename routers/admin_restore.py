@@ -1,13 +1,17 @@
 # routers/admin_restore.py
-from datetime import datetime
-from typing import Dict, List, Optional
-
-from fastapi import APIRouter, Depends, HTTPException, status
-from pydantic import BaseModel
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from db import get_db
-import models, schemas
+from db import get_db, pool_stats, read_route
+import models, schemas, customer_metrics, backup, jobs
 from routers.auth import get_current_user
 
 
@@ -17,131 +21,167 @@ router = APIRouter(
 )
 
 
-# ===============================
-#   BACKUP PAYLOAD SCHEMA
-# ===============================
-
-class BackupMeta(BaseModel):
-    generated_at: Optional[datetime] = None
-    app: Optional[str] = None
-    version: Optional[str] = None
-
-
-class BackupPayload(BaseModel):
-    meta: Optional[BackupMeta] = None
-
-    products: List[schemas.ProductOut] = []
-    customers: List[schemas.CustomerOut] = []
-    suppliers: List[schemas.SupplierOut] = []
-    expenses: List[schemas.ExpenseOut] = []
-
-    sales: List[dict] = []
-    purchases: List[dict] = []
-
-    # recipes = { product_id: [RecipeComponentOut], ... }
-    recipes: Dict[int, List[schemas.RecipeComponentOut]] = {}
+def _require_admin(current_user, action: str):
+    if not getattr(current_user, "is_admin", False):
+        raise HTTPException(
+            status_code=403,
+            detail=f"Hanya admin yang boleh melakukan {action}."
+        )
 
 
 # ===============================
-#   HELPERS RESTORE
+#   ENDPOINT BACKUP
 # ===============================
 
-def _wipe_table(db: Session, model):
-    db.query(model).delete()
+@router.get("/backup")
+def backup_data(
+    request: Request,
+    compress: bool = True,
+    since: Optional[str] = Query(None, description="meta.watermark dari backup sebelumnya -> backup incremental"),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Download backup sebagai stream .json.gz (format: lihat backup.py).
+    Tanpa `since` = backup full; dengan `since` hanya baris yang berubah.
+    Dibaca bertahap dari DB (read replica kalau ada), jadi aman untuk data besar.
+    """
+    _require_admin(current_user, "backup")
+
+    if since:
+        try:
+            backup.decode_watermark(since)
+        except backup.BackupError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    request.state.db_route = read_route(request)
+    kind = "incremental" if since else "full"
+    filename = f"backup-{kind}-{datetime.now(timezone.utc):%Y%m%d-%H%M%S}.json" + (".gz" if compress else "")
+    return StreamingResponse(
+        backup.stream_backup(compress=compress, since=since, read=request.state.db_route == "replica"),
+        media_type="application/gzip" if compress else "application/json",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
 
 
-def _restore_products(db: Session, products: List[schemas.ProductOut]):
-    _wipe_table(db, models.Product)
-    for p in products:
-        obj = models.Product(**p.model_dump())
-        db.add(obj)
+# ===============================
+#   ENDPOINT RESTORE
+# ===============================
 
+async def spool_request_body(request: Request, dir: Optional[str] = None) -> str:
+    """Simpan body request (json / json.gz) ke file temp tanpa menampung semuanya di memory."""
+    tmp = tempfile.NamedTemporaryFile(prefix="restore-", suffix=".upload", dir=dir, delete=False)
+    try:
+        async for chunk in request.stream():
+            tmp.write(chunk)
+    except BaseException:
+        tmp.close()
+        os.unlink(tmp.name)
+        raise
+    tmp.close()
+    return tmp.name
 
-def _restore_customers(db: Session, customers: List[schemas.CustomerOut]):
-    _wipe_table(db, models.Customer)
-    for c in customers:
-        obj = models.Customer(**c.model_dump())
-        db.add(obj)
 
+def save_upload(upload: UploadFile, dir: Optional[str] = None) -> str:
+    tmp = tempfile.NamedTemporaryFile(prefix="restore-", suffix=".upload", dir=dir, delete=False)
+    with tmp:
+        shutil.copyfileobj(upload.file, tmp, 1 << 20)
+    return tmp.name
 
-def _restore_suppliers(db: Session, suppliers: List[schemas.SupplierOut]):
-    _wipe_table(db, models.Supplier)
-    for s in suppliers:
-        obj = models.Supplier(**s.model_dump())
-        db.add(obj)
 
+def _enqueue_restore(db: Session, params: dict, current_user) -> models.Job:
+    return jobs.enqueue(db, "restore", params, user_id=current_user.id)
 
-def _restore_expenses(db: Session, expenses: List[schemas.ExpenseOut]):
-    _wipe_table(db, models.Expense)
-    for e in expenses:
-        obj = models.Expense(**e.model_dump())
-        db.add(obj)
 
+async def enqueue_restore_body(request: Request, db: Session, current_user) -> models.Job:
+    """Spool body ke JOB_FILES_DIR lalu enqueue job restore."""
+    os.makedirs(jobs.JOB_FILES_DIR, exist_ok=True)
+    path = await spool_request_body(request, dir=jobs.JOB_FILES_DIR)
+    try:
+        return await run_in_threadpool(_enqueue_restore, db, {"files": [path]}, current_user)
+    except BaseException:
+        os.unlink(path)
+        raise
 
-def _restore_recipes(db: Session, recipes_by_product: Dict[int, List[schemas.RecipeComponentOut]]):
-    _wipe_table(db, models.ProductRecipe)
 
-    for product_id, components in recipes_by_product.items():
-        for rc in components:
-            data = rc.model_dump()
-            obj = models.ProductRecipe(
-                id=data.get("id"),
-                product_id=data["product_id"],
-                component_product_id=data["component_product_id"],
-                qty_per_unit=data["qty_per_unit"],
-            )
-            db.add(obj)
+async def enqueue_restore_uploads(files: List[UploadFile], db: Session, current_user) -> models.Job:
+    """Simpan semua upload ke JOB_FILES_DIR lalu enqueue satu job restore chain."""
+    os.makedirs(jobs.JOB_FILES_DIR, exist_ok=True)
+    paths = []
+    try:
+        for upload in files:
+            paths.append(await run_in_threadpool(save_upload, upload, jobs.JOB_FILES_DIR))
+        params = {"files": paths, "filenames": [upload.filename for upload in files], "chain": True}
+        return await run_in_threadpool(_enqueue_restore, db, params, current_user)
+    except BaseException:
+        for path in paths:
+            os.unlink(path)
+        raise
+
+
+@router.post("/restore", response_model=schemas.JobOut, status_code=status.HTTP_202_ACCEPTED)
+async def restore_data(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Restore dari file backup. Body = isi file backup apa adanya, JSON atau
+    gzip (Content-Type application/json / application/gzip). Backup full:
+    section yang ada di file menggantikan isi tabelnya. Backup incremental:
+    baris di-upsert. Semua dalam satu transaksi.
+
+    Restore dijalankan worker (`python manage.py worker`), bukan di request:
+    response 202 berisi job, polling GET /jobs/{id} untuk progress & hasil.
+    Sama dengan POST /jobs/restore.
+    """
+    _require_admin(current_user, "restore")
+    return await enqueue_restore_body(request, db, current_user)
+
+
+@router.post("/restore/chain", response_model=schemas.JobOut, status_code=status.HTTP_202_ACCEPTED)
+async def restore_chain(
+    files: List[UploadFile] = File(..., description="Backup full lalu increment-increment-nya, urut"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Restore backup full + rangkaian backup incremental dalam satu transaksi.
+    Rantai dicek dulu (meta.since tiap increment = meta.watermark file sebelumnya).
+    Dijalankan worker seperti POST /admin/restore (sama dengan POST /jobs/restore/chain).
+    """
+    _require_admin(current_user, "restore")
+    return await enqueue_restore_uploads(files, db, current_user)
 
 
 # ===============================
-#   ENDPOINT RESTORE
+#   CUSTOMER STATS
 # ===============================
 
-@router.post("/restore", status_code=status.HTTP_200_OK)
-def restore_data(
-    payload: BackupPayload,
+@router.post("/customer-stats/rebuild", status_code=status.HTTP_200_OK)
+def rebuild_customer_stats(
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    if not getattr(current_user, "is_admin", False):
-        raise HTTPException(
-            status_code=403,
-            detail="Hanya admin yang boleh melakukan restore."
-        )
+    """Hitung ulang customer_stats dari seluruh sales_orders (set-based)."""
+    _require_admin(current_user, "rebuild customer stats")
 
-    try:
-        with db.begin():
-            # MASTER
-            if payload.products:
-                _restore_products(db, payload.products)
+    customers_with_orders = customer_metrics.refresh_customer_stats(db)
+    db.commit()
+    return {"status": "ok", "customers_with_orders": customers_with_orders}
 
-            if payload.customers:
-                _restore_customers(db, payload.customers)
 
-            if payload.suppliers:
-                _restore_suppliers(db, payload.suppliers)
-
-            if payload.expenses:
-                _restore_expenses(db, payload.expenses)
-
-            # RECIPES (BOM)
-            if payload.recipes:
-                _restore_recipes(db, payload.recipes)
-
-            # TRANSACTIONS (optional, belum diimplementasi)
-            # TODO: restore sales & purchases kalau diperlukan
-            # if payload.sales: ...
-            # if payload.purchases: ...
-
-        return {
-            "status": "ok",
-            "message": "Restore berhasil diproses.",
-            "meta": payload.meta.model_dump() if payload.meta else None,
-        }
+# ===============================
+#   POOL STATS
+# ===============================
 
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=500,
-            detail=f"Restore gagal: {e}"
-        )
+@router.get("/pool-stats")
+def get_pool_stats(
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Statistik connection pool (sync & async): profil, koneksi checked-out /
+    overflow, waktu tunggu checkout (avg / p50 / p99 / max) dan timeout.
+    Engine yang belum pernah dipakai = null.
+    """
+    _require_admin(current_user, "melihat pool stats")
+    return pool_stats()
@@ -1,13 +1,23 @@
 # routers/auth.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select, update
 
-from db import get_db
+from db import AsyncSessionLocal, SessionLocal
 import models, schemas
-from security import verify_password, get_password_hash, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from security import (
+    create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES,
+    verify_password_async, get_password_hash_async, HashPoolBusy, LoginThrottle,
+)
 
 
 from jose import JWTError, jwt
@@ -20,66 +30,150 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
 
+def _create_user(username: str, password_hash: str) -> models.User:
+    with SessionLocal() as db:
+        existing = db.query(models.User.id).filter(models.User.username == username).first()
+        if existing:
+            raise HTTPException(status_code=400, detail="Username already registered")
+
+        user = models.User(
+            username=username,
+            password_hash=password_hash,
+            is_admin=True
+        )
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+        return user
+
+
 @router.post("/register", response_model=schemas.UserOut)
-def register_user(payload: schemas.UserCreate, db: Session = Depends(get_db)):
-    existing = db.query(models.User).filter(models.User.username == payload.username).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Username already registered")
-
-    user = models.User(
-        username=payload.username,
-        password_hash=get_password_hash(payload.password),
-        is_admin=True
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+async def register_user(payload: schemas.UserCreate):
+    # hash dulu di pool hashing, baru buka session DB
+    try:
+        password_hash = await get_password_hash_async(payload.password)
+    except HashPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server sedang sibuk, coba lagi sebentar",
+            headers={"Retry-After": "1"},
+        )
+    return await run_in_threadpool(_create_user, payload.username, password_hash)
+
+
+# =====================================================
+# LOGIN
+# - session DB hanya dipakai sebentar untuk ambil user, sudah dilepas
+#   sebelum bcrypt jalan (bcrypt jalan di pool hashing sendiri)
+# - throttle percobaan gagal per username & per IP (429); login sukses
+#   mereset keduanya
+# - hash di-upgrade otomatis kalau BCRYPT_ROUNDS berubah
+# =====================================================
+LOGIN_FAILURE_WINDOW_SECONDS = int(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", 300))
+_user_throttle = LoginThrottle(int(os.getenv("LOGIN_MAX_FAILURES_PER_USER", 5)), LOGIN_FAILURE_WINDOW_SECONDS)
+_ip_throttle = LoginThrottle(int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", 20)), LOGIN_FAILURE_WINDOW_SECONDS)
+
+# Jumlah reverse proxy di depan app yang menambahkan X-Forwarded-For (Railway: 1).
+# Tanpa ini semua request terlihat dari IP proxy, jadi throttle per IP akan
+# mengunci login semua user sekaligus. 0 = pakai alamat koneksi langsung
+# (kalau app diakses tanpa proxy, header bisa dipalsukan client).
+TRUSTED_PROXY_HOPS = int(os.getenv("TRUSTED_PROXY_HOPS", 1))
+
+
+def client_ip(request: Request) -> str:
+    """IP client: entry ke-TRUSTED_PROXY_HOPS dari kanan X-Forwarded-For (yang ditulis proxy kita)."""
+    peer = request.client.host if request.client else "unknown"
+    if TRUSTED_PROXY_HOPS <= 0:
+        return peer
+    hops = [h.strip() for h in ",".join(request.headers.getlist("x-forwarded-for")).split(",") if h.strip()]
+    if not hops:
+        return peer
+    return hops[-min(TRUSTED_PROXY_HOPS, len(hops))]
+
+_dummy_hash: str | None = None
+
+
+def _load_login_user(username: str):
+    with SessionLocal() as db:
+        return (
+            db.query(models.User.id, models.User.password_hash, models.User.is_active)
+            .filter(models.User.username == username)
+            .first()
+        )
+
+
+def _save_rehash(user_id: int, new_hash: str):
+    with SessionLocal() as db:
+        db.execute(update(models.User).where(models.User.id == user_id).values(password_hash=new_hash))
+        db.commit()
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(
+async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
 ):
-    try:
-        user = (
-            db.query(models.User)
-            .filter(models.User.username == form_data.username)
-            .first()
+    global _dummy_hash
+
+    username = form_data.username
+    ip = client_ip(request)
+
+    retry_after = max(_user_throttle.retry_after(username), _ip_throttle.retry_after(ip))
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Terlalu banyak percobaan login, coba lagi nanti",
+            headers={"Retry-After": str(retry_after)},
         )
 
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect username or password",
-            )
+    invalid_credentials = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Incorrect username or password",
+    )
+
+    try:
+        user = await run_in_threadpool(_load_login_user, username)
+
+        # user tidak ada tetap jalankan bcrypt supaya waktu respon sama
+        if _dummy_hash is None:
+            _dummy_hash = await get_password_hash_async("not-a-real-password")
+        password_hash = user.password_hash if user else _dummy_hash
 
         # kalau hash di DB aneh (bukan bcrypt yang valid), ini bisa lempar error
         try:
-            is_valid = verify_password(form_data.password, user.password_hash)
+            is_valid, new_hash = await verify_password_async(form_data.password, password_hash)
+        except HashPoolBusy:
+            raise
         except Exception as e:
             # tulis ke logs Railway biar keliatan
             print("Error verifying password:", repr(e))
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect username or password",
-            )
+            is_valid, new_hash = False, None
+
+        if not user or not is_valid or user.is_active is False:
+            _user_throttle.record_failure(username)
+            _ip_throttle.record_failure(ip)
+            raise invalid_credentials
 
-        if not is_valid:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect username or password",
-            )
+        _user_throttle.reset(username)
+        _ip_throttle.reset(ip)
+
+        if new_hash:
+            await run_in_threadpool(_save_rehash, user.id, new_hash)
 
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user.username},
+            data={"sub": username},
             expires_delta=access_token_expires,
         )
 
         return {"access_token": access_token, "token_type": "bearer"}
 
+    except HashPoolBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server sedang sibuk, coba login lagi sebentar",
+            headers={"Retry-After": "1"},
+        )
     except HTTPException:
         # lempar ulang biar status code & pesan tetap
         raise
@@ -92,12 +186,139 @@ def login(
         )
 
 
+# =====================================================
+# Cache token -> principal
+# Request yang sudah login tidak perlu query ke tabel users per request.
+# - entry kadaluarsa setelah AUTH_CACHE_TTL_SECONDS (atau saat token expired)
+# - dibuang langsung kalau user di-update / dihapus lewat ORM di proses ini
+# - perubahan dari luar proses ini (worker lain, UPDATE Core / SQL manual di
+#   database) tidak memicu event ORM: tiap AUTH_CACHE_RECHECK_SECONDS satu
+#   query kecil mencocokkan user yang ada di cache dengan tabel users, jadi
+#   user yang dinonaktifkan paling lama selama itu masih lolos
+# =====================================================
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+AUTH_CACHE_RECHECK_SECONDS = float(os.getenv("AUTH_CACHE_RECHECK_SECONDS", 5))
+
+
+@dataclass(frozen=True)
+class AuthPrincipal:
+    id: int
+    username: str
+    is_active: bool
+    is_admin: bool
+
+
+_principal_cache: "OrderedDict[str, tuple[float, AuthPrincipal]]" = OrderedDict()
+_principal_lock = threading.Lock()
+_last_recheck = 0.0
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _cached_principal(key: str) -> AuthPrincipal | None:
+    with _principal_lock:
+        entry = _principal_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, principal = entry
+        if expires_at <= time.monotonic():
+            del _principal_cache[key]
+            return None
+        _principal_cache.move_to_end(key)
+        return principal
+
+
+def _cache_principal(key: str, principal: AuthPrincipal, token_exp: float | None):
+    if AUTH_CACHE_TTL_SECONDS <= 0:
+        return
+    ttl = float(AUTH_CACHE_TTL_SECONDS)
+    if token_exp is not None:
+        ttl = min(ttl, token_exp - time.time())
+    if ttl <= 0:
+        return
+    with _principal_lock:
+        _principal_cache[key] = (time.monotonic() + ttl, principal)
+        _principal_cache.move_to_end(key)
+        while len(_principal_cache) > AUTH_CACHE_MAX_ENTRIES:
+            _principal_cache.popitem(last=False)
+
+
+def invalidate_user_cache(user_id: int | None = None):
+    """
+    Buang principal user tertentu dari cache (None = kosongkan semua).
+    Hanya berlaku di proses ini; proses lain menyusul lewat _recheck_cached_users.
+    """
+    with _principal_lock:
+        if user_id is None:
+            _principal_cache.clear()
+            return
+        for key in [k for k, (_, p) in _principal_cache.items() if p.id == user_id]:
+            del _principal_cache[key]
+
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _user_changed(mapper, connection, target):
+    invalidate_user_cache(target.id)
+
+
+def _principal_of(user) -> AuthPrincipal:
+    return AuthPrincipal(
+        id=user.id,
+        username=user.username,
+        is_active=bool(user.is_active if user.is_active is not None else True),
+        is_admin=bool(user.is_admin),
+    )
+
+
+async def _recheck_cached_users():
+    """Paling sering tiap AUTH_CACHE_RECHECK_SECONDS: buang principal yang sudah beda dengan tabel users."""
+    global _last_recheck
+
+    now = time.monotonic()
+    if now - _last_recheck < AUTH_CACHE_RECHECK_SECONDS:
+        return
+    _last_recheck = now
+    with _principal_lock:
+        user_ids = {p.id for _, p in _principal_cache.values()}
+    if not user_ids:
+        return
+
+    try:
+        async with AsyncSessionLocal() as db:
+            rows = (
+                await db.execute(
+                    select(models.User.id, models.User.username, models.User.is_active, models.User.is_admin)
+                    .where(models.User.id.in_(user_ids))
+                )
+            ).all()
+    except Exception as e:
+        # tidak bisa dicek -> jangan percaya cache
+        print("Auth cache recheck failed:", repr(e))
+        invalidate_user_cache()
+        return
+
+    current = {row.id: _principal_of(row) for row in rows}
+    with _principal_lock:
+        for key in [k for k, (_, p) in _principal_cache.items() if current.get(p.id) != p]:
+            del _principal_cache[key]
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> AuthPrincipal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
     )
+
+    await _recheck_cached_users()
+    key = _token_key(token)
+    principal = _cached_principal(key)
+    if principal is not None:
+        return principal
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str | None = payload.get("sub")
@@ -107,7 +328,14 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.username == token_data.username).first()
-    if user is None:
+    # cache miss: session async pendek, tidak makan thread dan tidak dibuka kalau cache hit
+    async with AsyncSessionLocal() as db:
+        user = (
+            await db.execute(select(models.User).where(models.User.username == token_data.username))
+        ).scalars().first()
+    if user is None or user.is_active is False:
         raise credentials_exception
-    return user
\ No newline at end of file
+
+    principal = _principal_of(user)
+    _cache_principal(key, principal, payload.get("exp"))
+    return principal
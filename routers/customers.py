@@ -1,9 +1,15 @@
 # routers/customers.py
+import re
+from collections import Counter, defaultdict
+from itertools import combinations
+
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import func, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from db import get_db
-import models, schemas
+from db import get_db, get_async_db, get_async_read_db, get_read_db
+import models, schemas, customer_metrics, jobs
 from routers.auth import get_current_user
 
 router = APIRouter(
@@ -11,6 +17,51 @@ router = APIRouter(
     tags=["Customers"],
 )
 
+# minimal 3 digit; query yang isinya tanda baca saja (mis. "...") bukan nomor HP
+PHONE_QUERY_RE = re.compile(r"^(?=(?:\D*\d){3})\+?[\d\s\-().]+$")
+
+
+# =====================================================
+# Helper: normalisasi nomor HP
+# =====================================================
+def normalize_phone(phone: str | None) -> str | None:
+    """Ambil digit saja, awalan lokal 0 / 8 diseragamkan jadi 62."""
+    digits = re.sub(r"\D", "", phone or "")
+    if not digits:
+        return None
+    if digits.startswith("0"):
+        return "62" + digits[1:]
+    if digits.startswith("8"):
+        return "62" + digits
+    return digits
+
+
+def phone_prefixes(q: str) -> set[str]:
+    """
+    Prefix digit yang dicari di kolom phone. Data lama tersimpan campur
+    (0812..., +62812..., 812...), jadi semua bentuk ikut dicari.
+    """
+    digits = re.sub(r"\D", "", q)
+    if not digits:
+        return set()
+    normalized = normalize_phone(digits)
+    prefixes = {digits, normalized}
+    if normalized.startswith("62"):
+        prefixes.add("0" + normalized[2:])
+        prefixes.add(normalized[2:])
+    return {p for p in prefixes if p}
+
+
+def phone_digits_expr(db: Session | AsyncSession):
+    """Ekspresi SQL digit-only dari customers.phone (sama dengan index ix_customers_phone_digits)."""
+    if db.get_bind().dialect.name == "postgresql":
+        return models.phone_digits(models.Customer.phone)
+
+    expr = models.Customer.phone
+    for ch in (" ", "-", "+", "(", ")", "."):
+        expr = func.replace(expr, ch, "")
+    return expr
+
 
 @router.post("/", response_model=schemas.CustomerOut, status_code=status.HTTP_201_CREATED)
 def create_customer(
@@ -34,35 +85,236 @@ def create_customer(
 
 
 @router.get("/", response_model=list[schemas.CustomerOut])
-def list_customers(
+async def list_customers(
     q: str | None = Query(None, description="Search by name/phone/email"),
     only_active: bool = Query(True, description="Hanya tampilkan yang aktif"),
-    db: Session = Depends(get_db),
+    after_name: str | None = Query(None, description="Keyset cursor: nama customer terakhir di halaman sebelumnya"),
+    after_id: int | None = Query(None, description="Keyset cursor: id customer terakhir di halaman sebelumnya"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_read_db),
     user=Depends(get_current_user),
 ):
-    query = db.query(models.Customer)
+    """
+    Cari customer, urut nama. Halaman berikutnya: kirim after_name & after_id
+    dari baris terakhir. Query yang mirip nomor HP dicari sebagai prefix
+    nomor yang sudah dinormalisasi (0812... == +62812...).
+    """
+    query = select(models.Customer)
 
     if only_active:
-        query = query.filter(models.Customer.is_active == True)
+        query = query.where(models.Customer.is_active == True)
 
     if q:
+        q = q.strip()
         like = f"%{q}%"
-        query = query.filter(
-            (models.Customer.name.ilike(like))
-            | (models.Customer.phone.ilike(like))
-            | (models.Customer.email.ilike(like))
+        conditions = [
+            models.Customer.name.ilike(like),
+            models.Customer.email.ilike(like),
+        ]
+        if PHONE_QUERY_RE.match(q):
+            digits = phone_digits_expr(db)
+            conditions.extend(digits.like(f"{prefix}%") for prefix in phone_prefixes(q))
+        query = query.where(or_(*conditions))
+
+    if after_name is not None and after_id is not None:
+        query = query.where(
+            tuple_(models.Customer.name, models.Customer.id) > tuple_(after_name, after_id)
         )
 
-    return query.order_by(models.Customer.name.asc()).all()
+    result = await db.execute(
+        query.order_by(models.Customer.name.asc(), models.Customer.id.asc()).limit(limit)
+    )
+    return result.scalars().all()
 
 
-@router.get("/{customer_id}", response_model=schemas.CustomerOut)
-def get_customer(
+# =====================================================
+# DEDUP: cari kandidat customer dobel
+# =====================================================
+def _name_key(name: str | None) -> str:
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", (name or "").lower()).split())
+
+
+def _trigrams(key: str) -> frozenset[str]:
+    padded = f"  {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def find_duplicate_candidates(
+    db: Session,
+    min_score: float = 0.5,
+    max_block_size: int = 50,
+    rare_trigrams: int = 3,
+) -> list[dict]:
+    """
+    Cari pasangan customer yang kemungkinan orang yang sama, tanpa
+    membandingkan semua pasangan:
+    - blocking: nomor HP ternormalisasi, email, dan beberapa trigram nama
+      yang paling jarang (trigram umum seperti "bu" tidak dipakai)
+    - blok yang terlalu besar (> max_block_size) dilewati; pasangan yang hanya
+      ketemu lewat nama harus berbagi minimal 2 trigram langka
+    - tiap pasangan kandidat diberi skor: 0.5*kemiripan nama (jaccard trigram)
+      + 0.3 kalau HP sama + 0.2 kalau email sama
+    """
+    customers = {}
+    trigram_freq: Counter = Counter()
+    for cid, name, phone, email in (
+        db.query(models.Customer.id, models.Customer.name, models.Customer.phone, models.Customer.email)
+        .filter(models.Customer.is_active == True)
+        .yield_per(5000)
+    ):
+        grams = _trigrams(_name_key(name))
+        phone_key = normalize_phone(phone)
+        customers[cid] = (
+            name,
+            grams,
+            phone_key if phone_key and len(phone_key) >= 8 else None,
+            (email or "").strip().lower() or None,
+        )
+        trigram_freq.update(grams)
+
+    blocks: dict[tuple, list[int]] = defaultdict(list)
+    for cid, (_, grams, phone_key, email_key) in customers.items():
+        if phone_key:
+            blocks[("phone", phone_key)].append(cid)
+        if email_key:
+            blocks[("email", email_key)].append(cid)
+        for gram in sorted(grams, key=lambda g: (trigram_freq[g], g))[:rare_trigrams]:
+            blocks[("name", gram)].append(cid)
+
+    # pasangan dari HP/email langsung jadi kandidat; dari nama minimal berbagi 2 trigram langka
+    pairs: set[tuple[int, int]] = set()
+    name_pairs: Counter = Counter()
+    for (kind, _), members in blocks.items():
+        if not 1 < len(members) <= max_block_size:
+            continue
+        if kind == "name":
+            name_pairs.update(combinations(sorted(members), 2))
+        else:
+            pairs.update(combinations(sorted(members), 2))
+    pairs.update(pair for pair, shared in name_pairs.items() if shared >= min(2, rare_trigrams))
+
+    candidates = []
+    for a, b in pairs:
+        name_a, grams_a, phone_a, email_a = customers[a]
+        name_b, grams_b, phone_b, email_b = customers[b]
+
+        score = 0.0
+        reasons = []
+        if phone_a and phone_a == phone_b:
+            score += 0.3
+            reasons.append("same phone")
+        if email_a and email_a == email_b:
+            score += 0.2
+            reasons.append("same email")
+
+        # jaccard <= min(|A|,|B|) / max(|A|,|B|): lewati pasangan yang pasti di bawah min_score
+        size_a, size_b = len(grams_a), len(grams_b)
+        if not size_a or not size_b or score + 0.5 * min(size_a, size_b) / max(size_a, size_b) < min_score:
+            continue
+
+        shared = len(grams_a & grams_b)
+        name_sim = shared / (size_a + size_b - shared)
+        score += 0.5 * name_sim
+        reasons.insert(0, f"name {name_sim:.2f}")
+
+        if score >= min_score:
+            candidates.append(
+                {
+                    "customer_id_a": a,
+                    "name_a": name_a,
+                    "customer_id_b": b,
+                    "name_b": name_b,
+                    "score": round(score, 3),
+                    "reasons": reasons,
+                }
+            )
+
+    candidates.sort(key=lambda c: (-c["score"], c["customer_id_a"], c["customer_id_b"]))
+    return candidates
+
+
+@router.post("/duplicates", response_model=schemas.JobOut, status_code=status.HTTP_202_ACCEPTED)
+def enqueue_duplicate_candidates(
+    min_score: float = Query(0.5, ge=0, le=1),
+    limit: int = Query(200, ge=1, le=20000),
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Kandidat customer dobel (hasil auto-create dari create_sale), skor tertinggi dulu.
+    Scan seluruh tabel customer -> dijalankan worker sebagai job `customer_duplicates`;
+    poll GET /jobs/{id}, result = {total, candidates: [CustomerDuplicateOut]}.
+    Versi CLI: `python manage.py customer-duplicates`.
+    """
+    return jobs.enqueue(db, "customer_duplicates", {"min_score": min_score, "limit": limit}, user_id=user.id)
+
+
+@router.post("/{customer_id}/merge", response_model=schemas.CustomerMergeOut)
+def merge_customers(
     customer_id: int,
+    payload: schemas.CustomerMergeIn,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    customer = db.query(models.Customer).filter(models.Customer.id == customer_id).first()
+    """
+    Gabungkan source_ids ke customer_id: semua sales dipindah ke target
+    (satu UPDATE), data kontak yang kosong di target diisi dari source,
+    lalu source di-nonaktifkan dan customer_stats dihitung ulang.
+    """
+    source_ids = sorted(set(payload.source_ids) - {customer_id})
+    if not source_ids:
+        raise HTTPException(status_code=400, detail="source_ids cannot be empty")
+
+    rows = {
+        c.id: c
+        for c in db.query(models.Customer)
+        .filter(models.Customer.id.in_([customer_id, *source_ids]))
+        .order_by(models.Customer.id)
+        .with_for_update()
+        .all()
+    }
+    target = rows.get(customer_id)
+    if not target:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    missing = [sid for sid in source_ids if sid not in rows]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Customer id {missing[0]} not found")
+
+    result = db.execute(
+        update(models.SalesOrder)
+        .where(models.SalesOrder.customer_id.in_(source_ids))
+        .values(customer_id=target.id)
+        .execution_options(synchronize_session=False)
+    )
+
+    for sid in source_ids:
+        source = rows[sid]
+        for field in ("phone", "email", "address", "source_channel"):
+            if not getattr(target, field) and getattr(source, field):
+                setattr(target, field, getattr(source, field))
+        source.is_active = False
+        source.notes = f"{source.notes or ''}\nMerged into customer #{target.id}".strip()
+
+    # sales lama ikut pindah: sentuh updated_at target supaya backup incremental membawanya
+    target.updated_at = func.now()
+
+    customer_metrics.refresh_customer_stats(db, [target.id, *source_ids])
+    db.commit()
+
+    return schemas.CustomerMergeOut(
+        target_id=target.id,
+        merged_ids=source_ids,
+        sales_reassigned=result.rowcount or 0,
+    )
+
+
+@router.get("/{customer_id}", response_model=schemas.CustomerOut)
+async def get_customer(
+    customer_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user),
+):
+    customer = await db.get(models.Customer, customer_id)
     if not customer:
         raise HTTPException(status_code=404, detail="Customer not found")
     return customer
@@ -103,6 +355,7 @@ def delete_customer(
         customer.is_active = False
         db.commit()
     else:
+        db.query(models.CustomerStats).filter(models.CustomerStats.customer_id == customer.id).delete()
         db.delete(customer)
         db.commit()
     return
@@ -1,12 +1,14 @@
 # routers/expenses.py
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 from decimal import Decimal
 from typing import Optional
 from datetime import date
 
 import models, schemas
-from db import get_db
+from db import get_db, get_async_db, get_async_read_db
 from routers.auth import get_current_user
 
 router = APIRouter(prefix="/expenses", tags=["Expenses"])
@@ -94,8 +96,8 @@ def create_expense(
 # LIST EXPENSES
 # =====================================================
 @router.get("/", response_model=list[schemas.ExpenseOut])
-def list_expenses(
-    db: Session = Depends(get_db),
+async def list_expenses(
+    db: AsyncSession = Depends(get_async_read_db),
     user=Depends(get_current_user),
     skip: int = 0,
     limit: int = 100,
@@ -103,20 +105,19 @@ def list_expenses(
 ):
     # base query + load relasi akun
     q = (
-        db.query(models.Expense)
+        select(models.Expense)
         .options(joinedload(models.Expense.source_account))  # ⬅️ load account
     )
 
     if category:
-        q = q.filter(models.Expense.category.ilike(f"%{category}%"))
+        q = q.where(models.Expense.category.ilike(f"%{category}%"))
 
-    expenses = (
+    result = await db.execute(
         q.order_by(models.Expense.expense_date.desc())
         .offset(skip)
         .limit(limit)
-        .all()
     )
-    return expenses
+    return result.scalars().all()
 
 
 
@@ -124,15 +125,13 @@ def list_expenses(
 # GET SINGLE EXPENSE
 # =====================================================
 @router.get("/{expense_id}", response_model=schemas.ExpenseOut)
-def get_expense(
+async def get_expense(
     expense_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user=Depends(get_current_user),
 ):
-    expense = (
-        db.query(models.Expense)
-        .filter(models.Expense.id == expense_id)
-        .first()
+    expense = await db.get(
+        models.Expense, expense_id, options=[joinedload(models.Expense.source_account)]
     )
     if not expense:
         raise HTTPException(status_code=404, detail="Expense not found")
@@ -0,0 +1,170 @@
+# routers/jobs.py
+import os
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+import models, schemas, jobs, backup
+from db import get_db
+from routers.auth import get_current_user
+from routers.admin_restore import _require_admin, enqueue_restore_body, enqueue_restore_uploads
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+)
+
+
+# =====================================================
+# Helpers
+# =====================================================
+def _get_job(db: Session, job_id: int, current_user) -> models.Job:
+    job = db.get(models.Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not getattr(current_user, "is_admin", False) and job.created_by != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def _enqueue(db: Session, name: str, params: dict, current_user) -> models.Job:
+    return jobs.enqueue(db, name, params, user_id=current_user.id)
+
+
+# =====================================================
+# STATUS / CANCEL
+# =====================================================
+@router.get("/", response_model=list[schemas.JobOut])
+def list_jobs(
+    status_filter: Optional[str] = Query(None, alias="status"),
+    type_filter: Optional[str] = Query(None, alias="type"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Job terbaru dulu. Non-admin hanya melihat job miliknya."""
+    q = db.query(models.Job)
+    if not getattr(current_user, "is_admin", False):
+        q = q.filter(models.Job.created_by == current_user.id)
+    if status_filter:
+        q = q.filter(models.Job.status == status_filter)
+    if type_filter:
+        q = q.filter(models.Job.type == type_filter)
+    return q.order_by(models.Job.id.desc()).limit(limit).all()
+
+
+@router.get("/{job_id}", response_model=schemas.JobOut)
+def get_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Polling status + progress (progress_current / progress_total)."""
+    return _get_job(db, job_id, current_user)
+
+
+@router.post("/{job_id}/cancel", response_model=schemas.JobOut)
+def cancel_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Job QUEUED langsung dibatalkan; job RUNNING berhenti di laporan progress berikutnya (di-rollback)."""
+    job = _get_job(db, job_id, current_user)
+    if job.status in jobs.FINAL_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Job #{job.id} sudah {job.status}")
+    return jobs.cancel(db, job)
+
+
+@router.get("/{job_id}/download")
+def download_job_file(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """File hasil job (mis. backup). Disimpan selama JOB_FILE_TTL_HOURS setelah job selesai."""
+    job = _get_job(db, job_id, current_user)
+    path = (job.result or {}).get("file") if job.status == "SUCCEEDED" else None
+    if not path:
+        raise HTTPException(status_code=404, detail="Job tidak punya file hasil")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="File hasil job sudah dihapus (kadaluarsa), jalankan ulang job")
+    filename = job.result.get("filename") or os.path.basename(path)
+    media_type = "application/gzip" if filename.endswith(".gz") else "application/json"
+    return FileResponse(path, media_type=media_type, filename=filename)
+
+
+# =====================================================
+# ENQUEUE
+# =====================================================
+@router.post("/restore", response_model=schemas.JobOut, status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_restore(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Restore dari body (json / json.gz), dijalankan worker. Sama dengan POST /admin/restore."""
+    _require_admin(current_user, "restore")
+    return await enqueue_restore_body(request, db, current_user)
+
+
+@router.post("/restore/chain", response_model=schemas.JobOut, status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_restore_chain(
+    files: List[UploadFile] = File(..., description="Backup full lalu increment-increment-nya, urut"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Restore chain, dijalankan worker. Sama dengan POST /admin/restore/chain."""
+    _require_admin(current_user, "restore")
+    return await enqueue_restore_uploads(files, db, current_user)
+
+
+@router.post("/backup", response_model=schemas.JobOut, status_code=status.HTTP_202_ACCEPTED)
+def enqueue_backup(
+    compress: bool = True,
+    since: Optional[str] = Query(None, description="meta.watermark dari backup sebelumnya -> backup incremental"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Backup ke file di server; ambil lewat GET /jobs/{id}/download setelah SUCCEEDED."""
+    _require_admin(current_user, "backup")
+    if since:
+        try:
+            backup.decode_watermark(since)
+        except backup.BackupError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return _enqueue(db, "backup", {"compress": compress, "since": since}, current_user)
+
+
+@router.post("/reorder", response_model=schemas.JobOut, status_code=status.HTTP_202_ACCEPTED)
+def enqueue_reorder(
+    payload: schemas.ReorderRunIn,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Seperti POST /purchase-plans/reorder-run; result = ReorderRunOut."""
+    if payload.lookback_days <= 0 or payload.lead_time_days < 0 or payload.review_days < 0:
+        raise HTTPException(status_code=400, detail="lookback_days harus > 0, lead/review tidak boleh negatif")
+    return _enqueue(db, "reorder", payload.model_dump(), current_user)
+
+
+@router.post("/customer-stats/rebuild", response_model=schemas.JobOut, status_code=status.HTTP_202_ACCEPTED)
+def enqueue_customer_stats_rebuild(
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    _require_admin(current_user, "rebuild customer stats")
+    return _enqueue(db, "customer_stats_rebuild", {}, current_user)
+
+
+@router.post("/customer-duplicates", response_model=schemas.JobOut, status_code=status.HTTP_202_ACCEPTED)
+def enqueue_customer_duplicates(
+    min_score: float = Query(0.5, ge=0, le=1),
+    limit: int = Query(1000, ge=1, le=20000),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """Sama dengan POST /customers/duplicates; result = {total, candidates}."""
+    return _enqueue(db, "customer_duplicates", {"min_score": min_score, "limit": limit}, current_user)
@@ -1,54 +1,55 @@
 # routers/products.py
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from db import get_db
+from db import get_db, get_async_db, get_async_read_db
 import models, schemas
 from routers.auth import get_current_user
+from routers.recipes import invalidate_recipe_costs, refresh_recipe_costs
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
 
 # ✅ Route spesifik HARUS di atas sebelum route dengan parameter dinamis
 @router.get("/low-stock", response_model=List[schemas.ProductOut])
-def get_low_stock_products(
-    db: Session = Depends(get_db),
+async def get_low_stock_products(
+    db: AsyncSession = Depends(get_async_read_db),
     user=Depends(get_current_user),
 ):
     """
     Ambil list produk yang stoknya <= min_stock dan masih aktif.
     Cocok untuk notifikasi stok menipis di dashboard.
     """
-    rows = (
-        db.query(models.Product)
-        .filter(
+    result = await db.execute(
+        select(models.Product)
+        .where(
             models.Product.is_active == True,
             models.Product.min_stock.isnot(None),
             models.Product.stock_qty <= models.Product.min_stock,
         )
         .order_by(models.Product.stock_qty.asc())
-        .all()
     )
-    return rows
+    return result.scalars().all()
 
 
 @router.get("/", response_model=List[schemas.ProductOut])
-def list_products(
+async def list_products(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db), 
+    db: AsyncSession = Depends(get_async_read_db),
     user=Depends(get_current_user)
 ):
     """Get all products with pagination"""
-    products = (
-        db.query(models.Product)
+    result = await db.execute(
+        select(models.Product)
         .order_by(models.Product.name)
         .offset(skip)
         .limit(limit)
-        .all()
     )
-    return products
+    return result.scalars().all()
 
 
 @router.post("/", response_model=schemas.ProductOut, status_code=201)
@@ -71,13 +72,13 @@ def create_product(
 
 # ✅ Route dengan parameter dinamis HARUS di bawah setelah route spesifik
 @router.get("/{product_id}", response_model=schemas.ProductOut)
-def get_product(
-    product_id: int, 
-    db: Session = Depends(get_db), 
+async def get_product(
+    product_id: int,
+    db: AsyncSession = Depends(get_async_db),
     user=Depends(get_current_user)
 ):
     """Get product by ID"""
-    product = db.query(models.Product).filter(models.Product.id == product_id).first()
+    product = await db.get(models.Product, product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     return product
@@ -100,6 +101,9 @@ def update_product(
     for k, v in data.items():
         setattr(product, k, v)
 
+    if "base_cost" in data:
+        refresh_recipe_costs(db, [product.id])
+
     db.commit()
     db.refresh(product)
     return product
@@ -116,6 +120,7 @@ def delete_product(
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
+    invalidate_recipe_costs(db, [product.id])
     db.delete(product)
     db.commit()
     return None  # 204 No Content
\ No newline at end of file
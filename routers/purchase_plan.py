@@ -1,10 +1,16 @@
 # routers/purchase_plans.py
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from decimal import Decimal
 
-import models, schemas
-from db import get_db
+import models, schemas, planning
+from db import get_db, get_async_db, get_async_read_db
 from routers.auth import get_current_user
 
 router = APIRouter(prefix="/purchase-plans", tags=["Purchase Plans"])
@@ -47,26 +53,268 @@ def create_purchase_plan(
     return plan
 
 
-@router.get("/", response_model=list[schemas.PurchasePlanOut])
-def list_purchase_plans(
+MRP_SOURCES = ("planned", "forecast")
+
+
+@router.post("/mrp", response_model=schemas.MrpOut)
+def material_requirements(
+    payload: schemas.MrpIn,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    plans = (
-        db.query(models.PurchasePlan)
-        .order_by(models.PurchasePlan.created_at.desc())
+    """
+    MRP: demand product jadi di-explode lewat recipe (bertingkat), di-net
+    terhadap stock_qty dan sisa PurchasePlan yang akan datang (status sama
+    dengan reorder, lihat planning.on_order_filter), lalu kebutuhan bersih
+    bahan yang harus dibeli dikelompokkan per supplier terakhir.
+    Sumber demand: `planned` (baris demand eksplisit) atau `forecast`
+    (total forecast penjualan horizon_days ke depan untuk seluruh katalog,
+    ditambah baris demand kalau ada).
+    Jumlah query tetap, tidak tergantung ukuran katalog.
+    """
+    if payload.source not in MRP_SOURCES:
+        raise HTTPException(status_code=400, detail=f"source harus salah satu dari {', '.join(MRP_SOURCES)}")
+    if payload.source == "planned" and not payload.demand:
+        raise HTTPException(status_code=400, detail="Demand cannot be empty")
+
+    demand: dict[int, Decimal] = defaultdict(Decimal)
+    for item in payload.demand:
+        if item.qty < 0:
+            raise HTTPException(status_code=400, detail="Demand qty tidak boleh negatif")
+        demand[item.product_id] += item.qty
+
+    if payload.source == "forecast":
+        if not 1 <= payload.horizon_days <= 365 or not 7 <= payload.history_days <= 730:
+            raise HTTPException(status_code=400, detail="horizon_days harus 1-365, history_days 7-730")
+        try:
+            forecast = planning.forecast_demand(
+                db,
+                product_ids=payload.product_ids,
+                method=payload.method,
+                horizon=payload.horizon_days,
+                history_days=payload.history_days,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        for pid, qty in forecast.items():
+            demand[pid] += qty
+
+    recipes = planning.load_recipes(db)
+    try:
+        product_ids = planning.bom_order(list(demand), recipes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    products = {
+        p.id: p
+        for p in db.query(
+            models.Product.id,
+            models.Product.sku,
+            models.Product.name,
+            models.Product.unit,
+            models.Product.stock_qty,
+        )
+        .filter(models.Product.id.in_(product_ids))
         .all()
+    }
+    missing = [pid for pid in demand if pid not in products]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Product id {missing[0]} not found")
+
+    stock = {pid: max(Decimal(str(p.stock_qty or 0)), Decimal("0")) for pid, p in products.items()}
+    on_order = planning.open_plan_quantities(db, product_ids)
+    available = {pid: stock[pid] + on_order.get(pid, Decimal("0")) for pid in products}
+
+    gross, net = planning.explode_requirements(demand, recipes, available)
+
+    buy_ids = [pid for pid in product_ids if pid not in recipes and net.get(pid, 0) > 0]
+    suppliers = planning.last_supplier_by_product(db, buy_ids) if buy_ids else {}
+
+    lines = []
+    groups: dict[int | None, schemas.MrpSupplierGroup] = {}
+    for pid in product_ids:
+        if pid not in products:
+            continue
+        p = products[pid]
+        is_make = pid in recipes
+        supplier_id, supplier_name = (None, None) if is_make else suppliers.get(pid, (None, None))
+
+        line = schemas.MrpLine(
+            product_id=pid,
+            sku=p.sku,
+            product_name=p.name,
+            unit=p.unit,
+            make_or_buy="MAKE" if is_make else "BUY",
+            gross_requirement=gross.get(pid, Decimal("0")),
+            stock_qty=stock[pid],
+            on_order_qty=on_order.get(pid, Decimal("0")),
+            net_requirement=net.get(pid, Decimal("0")),
+            supplier_id=supplier_id,
+            supplier_name=supplier_name,
+        )
+        lines.append(line)
+
+        if not is_make and line.net_requirement > 0:
+            group = groups.setdefault(
+                supplier_id,
+                schemas.MrpSupplierGroup(supplier_id=supplier_id, supplier_name=supplier_name, items=[]),
+            )
+            group.items.append(line)
+
+    return schemas.MrpOut(lines=lines, suppliers=list(groups.values()))
+
+
+@router.post("/reorder-run", response_model=schemas.ReorderRunOut)
+def reorder_run(
+    payload: schemas.ReorderRunIn,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """
+    Hitung reorder point dari pemakaian di stock_movements dan buat
+    PurchasePlan DRAFT per supplier untuk product yang sudah di bawah
+    reorder point. Versi terjadwal: `python manage.py reorder`.
+    """
+    if payload.lookback_days <= 0 or payload.lead_time_days < 0 or payload.review_days < 0:
+        raise HTTPException(status_code=400, detail="lookback_days harus > 0, lead/review tidak boleh negatif")
+
+    return planning.run_reorder(db, **payload.model_dump())
+
+
+async def _plan_progress(db: AsyncSession, plan_ids: list[int]) -> dict[int, tuple]:
+    """
+    Agregat progress untuk plan di halaman ini saja (satu GROUP BY dengan
+    WHERE plan_id IN, bukan seluruh riwayat purchase_plan_items).
+    Return {plan_id: (total_planned, total_received, outstanding_value)}.
+    """
+    if not plan_ids:
+        return {}
+
+    item = models.PurchasePlanItem
+    received = func.coalesce(item.received_qty, 0)
+    received_capped = case((received > item.planned_qty, item.planned_qty), else_=received)
+    remaining = item.planned_qty - received
+
+    rows = await db.execute(
+        select(
+            item.plan_id,
+            func.sum(item.planned_qty),
+            func.sum(received_capped),
+            func.sum(
+                case((remaining > 0, remaining * func.coalesce(models.Product.base_cost, 0)), else_=0)
+            ),
+        )
+        .join(models.Product, models.Product.id == item.product_id)
+        .where(item.plan_id.in_(plan_ids))
+        .group_by(item.plan_id)
     )
-    return plans
+    return {plan_id: totals for plan_id, *totals in rows.all()}
 
 
-@router.get("/{plan_id}", response_model=schemas.PurchasePlanOut)
-def get_purchase_plan(
+async def _with_progress(db: AsyncSession, plans) -> list[models.PurchasePlan]:
+    progress = await _plan_progress(db, [plan.id for plan in plans])
+    for plan in plans:
+        total_planned, total_received, outstanding = progress.get(plan.id, (0, 0, 0))
+        total_planned = Decimal(str(total_planned or 0))
+        total_received = Decimal(str(total_received or 0))
+
+        # isi field progress agar terbaca di schema
+        plan.total_planned_qty = total_planned
+        plan.total_received_qty = total_received
+        plan.percent_received = (
+            (total_received / total_planned * 100).quantize(Decimal("0.01")) if total_planned > 0 else Decimal("0")
+        )
+        plan.outstanding_value = Decimal(str(outstanding or 0))
+    return list(plans)
+
+
+@router.get("/", response_model=list[schemas.PurchasePlanOut])
+async def list_purchase_plans(
+    status_filter: Optional[str] = Query(None, alias="status", description="DRAFT, OPEN, PARTIAL, COMPLETED, CANCELLED"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    before_id: Optional[int] = Query(None, description="Keyset cursor: id plan terakhir di halaman sebelumnya"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_async_read_db),
+    user=Depends(get_current_user),
+):
+    """
+    List plan terbaru dulu, pakai keyset pagination: kirim id plan terakhir
+    sebagai before_id untuk halaman berikutnya. Items di-load batch
+    (selectin), progress dihitung di SQL hanya untuk plan di halaman ini.
+    """
+    q = select(models.PurchasePlan).options(selectinload(models.PurchasePlan.items))
+
+    if status_filter:
+        q = q.where(models.PurchasePlan.status == status_filter)
+    if date_from:
+        q = q.where(models.PurchasePlan.created_at >= date_from)
+    if date_to:
+        q = q.where(models.PurchasePlan.created_at < date_to + timedelta(days=1))
+    if before_id:
+        q = q.where(models.PurchasePlan.id < before_id)
+
+    plans = (await db.execute(q.order_by(models.PurchasePlan.id.desc()).limit(limit))).scalars().all()
+    return await _with_progress(db, plans)
+
+
+def _lock_plan(db: Session, plan_id: int) -> models.PurchasePlan:
+    plan = (
+        db.query(models.PurchasePlan)
+        .filter(models.PurchasePlan.id == plan_id)
+        .with_for_update()
+        .first()
+    )
+    if not plan:
+        raise HTTPException(status_code=404, detail="Purchase plan not found")
+    return plan
+
+
+@router.post("/{plan_id}/confirm", response_model=schemas.PurchasePlanOut)
+def confirm_purchase_plan(
+    plan_id: int,
+    db: Session = Depends(get_db),
+    user=Depends(get_current_user),
+):
+    """DRAFT (mis. hasil reorder-run) -> OPEN."""
+    plan = _lock_plan(db, plan_id)
+    if plan.status != "DRAFT":
+        raise HTTPException(status_code=400, detail=f"Hanya plan DRAFT yang bisa dikonfirmasi (status: {plan.status})")
+    plan.status = "OPEN"
+    db.commit()
+    db.refresh(plan)
+    return plan
+
+
+@router.post("/{plan_id}/cancel", response_model=schemas.PurchasePlanOut)
+def cancel_purchase_plan(
     plan_id: int,
     db: Session = Depends(get_db),
     user=Depends(get_current_user),
 ):
-    plan = db.query(models.PurchasePlan).filter(models.PurchasePlan.id == plan_id).first()
+    """DRAFT / OPEN -> CANCELLED. Plan yang sudah ada penerimaan tidak bisa dibatalkan."""
+    plan = _lock_plan(db, plan_id)
+    if plan.status not in ("DRAFT", "OPEN"):
+        raise HTTPException(status_code=400, detail=f"Plan dengan status {plan.status} tidak bisa dibatalkan")
+    plan.status = "CANCELLED"
+    db.commit()
+    db.refresh(plan)
+    return plan
+
+
+@router.get("/{plan_id}", response_model=schemas.PurchasePlanOut)
+async def get_purchase_plan(
+    plan_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    user=Depends(get_current_user),
+):
+    plan = (
+        await db.execute(
+            select(models.PurchasePlan)
+            .options(selectinload(models.PurchasePlan.items))
+            .where(models.PurchasePlan.id == plan_id)
+        )
+    ).scalar_one_or_none()
     if not plan:
         raise HTTPException(status_code=404, detail="Purchase plan not found")
-    return plan
+    return (await _with_progress(db, [plan]))[0]
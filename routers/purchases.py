@@ -1,17 +1,120 @@
 # routers/purchases.py
+from collections import defaultdict
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import case, exists, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 from decimal import Decimal
 from typing import Optional
 from datetime import date
 
-import models, schemas
-from db import get_db
+import models, schemas, planning
+from db import get_db, get_async_db, get_async_read_db
 from routers.auth import get_current_user
 
 router = APIRouter(prefix="/purchases", tags=["Purchases"])
 
 
+# =========================================================
+# Helper: terima qty ke PurchasePlanItem + update status plan
+# =========================================================
+def _receive_plan_items(
+    db: Session,
+    received_by_plan_item: dict[int, Decimal],
+    plan_item_product: dict[int, models.Product],
+) -> None:
+    """
+    - lock semua plan item yang direferensikan dalam satu statement (urut id),
+      lalu plan-nya (urut id); hanya plan OPEN / PARTIAL yang boleh menerima
+      (DRAFT harus di-confirm dulu, CANCELLED / COMPLETED ditolak)
+    - produk baris purchase harus sama dengan produk plan item
+    - validasi tidak melebihi planned_qty, lalu update received_qty secara bulk
+    - turunkan status semua plan terkait dengan satu UPDATE agregat
+    """
+    item = models.PurchasePlanItem
+    plan = models.PurchasePlan
+    locked = {
+        row.id: row
+        for row in db.query(item.id, item.plan_id, item.product_id, item.planned_qty, item.received_qty)
+        .filter(item.id.in_(list(received_by_plan_item)))
+        .order_by(item.id)
+        .with_for_update()
+        .all()
+    }
+
+    missing = [plan_item_id for plan_item_id in received_by_plan_item if plan_item_id not in locked]
+    if missing:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Purchase plan item id {missing[0]} not found",
+        )
+
+    affected_plans = {locked[plan_item_id].plan_id for plan_item_id in received_by_plan_item}
+    plan_status = dict(
+        db.query(plan.id, plan.status)
+        .filter(plan.id.in_(affected_plans))
+        .order_by(plan.id)
+        .with_for_update()
+        .all()
+    )
+    for plan_id in sorted(affected_plans):
+        if plan_status.get(plan_id) not in planning.OPEN_PLAN_STATUSES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Purchase plan {plan_id} is {plan_status.get(plan_id)}, only OPEN / PARTIAL plans can receive",
+            )
+
+    updates = []
+    for plan_item_id, qty in received_by_plan_item.items():
+        plan_item = locked[plan_item_id]
+        product = plan_item_product[plan_item_id]
+        if plan_item.product_id != product.id:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    f"Purchase plan item id {plan_item_id} is for product id {plan_item.product_id}, "
+                    f"not {product.name}"
+                ),
+            )
+
+        current_received = Decimal(str(plan_item.received_qty or 0))
+        new_received = current_received + qty
+        planned = Decimal(str(plan_item.planned_qty))
+
+        if new_received > planned:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    f"Received qty for product {plan_item_product[plan_item_id].name} would exceed "
+                    f"planned qty ({planned}). "
+                    f"Current received: {plan_item.received_qty}, "
+                    f"new receive: {qty}"
+                ),
+            )
+        updates.append({"id": plan_item_id, "received_qty": new_received})
+
+    db.execute(update(item), updates)
+
+    # Status plan: COMPLETED kalau semua item terpenuhi, PARTIAL kalau ada yang
+    # sudah diterima, selain itu OPEN
+    received = func.coalesce(item.received_qty, 0)
+    has_unfulfilled = exists().where(item.plan_id == plan.id, received < item.planned_qty)
+    has_received = exists().where(item.plan_id == plan.id, received > 0)
+
+    db.execute(
+        update(plan)
+        .where(plan.id.in_(affected_plans), plan.status.in_(planning.OPEN_PLAN_STATUSES))
+        .values(
+            status=case(
+                (~has_unfulfilled, "COMPLETED"),
+                (has_received, "PARTIAL"),
+                else_="OPEN",
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
 # =========================================================
 # CREATE PURCHASE (WITH ACCOUNTING LOGIC)
 # =========================================================
@@ -39,6 +142,19 @@ def create_purchase(
         if not account:
             raise HTTPException(status_code=400, detail="Source account not found")
 
+    # ===========================
+    # LOAD + LOCK PRODUCTS (satu query, urut id)
+    # ===========================
+    product_ids = {item.product_id for item in payload.items}
+    products = {
+        p.id: p
+        for p in db.query(models.Product)
+        .filter(models.Product.id.in_(product_ids))
+        .order_by(models.Product.id)
+        .with_for_update()
+        .all()
+    }
+
     # ===========================
     # CALCULATE TOTAL
     # ===========================
@@ -46,11 +162,7 @@ def create_purchase(
     item_rows = []
 
     for item in payload.items:
-        product = (
-            db.query(models.Product)
-            .filter(models.Product.id == item.product_id)
-            .first()
-        )
+        product = products.get(item.product_id)
         if not product:
             raise HTTPException(
                 status_code=404,
@@ -107,7 +219,10 @@ def create_purchase(
     # ===========================
     # PROCESS ITEMS + STOCK UPDATE
     # ===========================
-    affected_plans: set[int] = set()
+    received_by_plan_item: dict[int, Decimal] = defaultdict(Decimal)
+    plan_item_product: dict[int, models.Product] = {}
+    order_items = []
+    movements = []
 
     for row in item_rows:
         product = row["product"]
@@ -115,86 +230,52 @@ def create_purchase(
         plan_item_id = row["plan_item_id"]
 
         # Detail purchase item
-        item = models.PurchaseOrderItem(
-            purchase_order_id=purchase.id,
-            product_id=product.id,
-            qty=qty,
-            unit_cost=row["unit_cost"],
-            discount=row["discount"],
-            subtotal=row["subtotal"],
+        order_items.append(
+            {
+                "purchase_order_id": purchase.id,
+                "product_id": product.id,
+                "qty": qty,
+                "unit_cost": row["unit_cost"],
+                "discount": row["discount"],
+                "subtotal": row["subtotal"],
+            }
         )
-        db.add(item)
 
         # Update stok produk (IN)
         stock_before = Decimal(str(product.stock_qty or 0))
         stock_after = stock_before + qty
         product.stock_qty = stock_after
 
-        db.add(
-            models.StockMovement(
-                product_id=product.id,
-                type="IN",
-                ref_type="PURCHASE",
-                ref_id=purchase.id,
-                qty_change=qty,
-                stock_before=stock_before,
-                stock_after=stock_after,
-                notes=f"Purchase #{purchase.id} {payload.invoice_number or ''}",
-            )
+        movements.append(
+            {
+                "product_id": product.id,
+                "type": "IN",
+                "ref_type": "PURCHASE",
+                "ref_id": purchase.id,
+                "qty_change": qty,
+                "stock_before": stock_before,
+                "stock_after": stock_after,
+                "notes": f"Purchase #{purchase.id} {payload.invoice_number or ''}",
+            }
         )
 
-        # Kalau item ini terhubung dengan PurchasePlanItem, update received_qty
         if plan_item_id:
-            plan_item = (
-                db.query(models.PurchasePlanItem)
-                .filter(models.PurchasePlanItem.id == plan_item_id)
-                .with_for_update()
-                .first()
-            )
-            if not plan_item:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Purchase plan item id {plan_item_id} not found",
-                )
-
-            current_received = Decimal(str(plan_item.received_qty or 0))
-            new_received = current_received + qty
-            planned = Decimal(str(plan_item.planned_qty))
-
-            if new_received > planned:
+            if plan_item_product.setdefault(plan_item_id, product).id != product.id:
                 raise HTTPException(
                     status_code=400,
-                    detail=(
-                        f"Received qty for product {product.name} would exceed "
-                        f"planned qty ({planned}). "
-                        f"Current received: {plan_item.received_qty}, "
-                        f"new receive: {qty}"
-                    ),
+                    detail=f"Purchase plan item id {plan_item_id} is used for more than one product",
                 )
+            received_by_plan_item[plan_item_id] += qty
 
-            plan_item.received_qty = new_received
-            affected_plans.add(plan_item.plan_id)
+    # insert batch (executemany), tidak perlu id balik
+    db.execute(insert(models.PurchaseOrderItem), order_items)
+    db.execute(insert(models.StockMovement), movements)
 
     # ===========================
-    # UPDATE STATUS PURCHASE PLANS
+    # RECEIVE AGAINST PURCHASE PLANS (set-based)
     # ===========================
-    for plan_id in affected_plans:
-        plan = (
-            db.query(models.PurchasePlan)
-            .filter(models.PurchasePlan.id == plan_id)
-            .with_for_update()
-            .first()
-        )
-        if not plan:
-            continue
-
-        all_items = plan.items
-        if all((item.received_qty or 0) >= item.planned_qty for item in all_items):
-            plan.status = "COMPLETED"
-        elif any((item.received_qty or 0) > 0 for item in all_items):
-            plan.status = "PARTIAL"
-        else:
-            plan.status = "OPEN"
+    if received_by_plan_item:
+        _receive_plan_items(db, received_by_plan_item, plan_item_product)
 
     # ===========================
     # UPDATE ACCOUNT BALANCE (OUT)
@@ -215,44 +296,54 @@ def create_purchase(
         )
         db.add(ledger)
 
+    # nama product disimpan sebelum commit (objek akan di-expire oleh commit)
+    product_names = {pid: p.name for pid, p in products.items()}
+
     db.commit()
     db.refresh(purchase)
 
     # isi product_name untuk schema PurchaseItemOut
     for item in purchase.items:
-        if item.product:
-            item.product_name = item.product.name
+        item.product_name = product_names.get(item.product_id)
 
     return purchase
 
 
+# Eager load untuk endpoint baca (async: tidak boleh ada lazy load saat serialisasi)
+PURCHASE_OUT_OPTIONS = (
+    selectinload(models.PurchaseOrder.items).joinedload(models.PurchaseOrderItem.product),
+    joinedload(models.PurchaseOrder.source_account),
+)
+
+
+def _fill_product_names(purchases):
+    for purchase in purchases:
+        for item in purchase.items:
+            if item.product:
+                item.product_name = item.product.name
+
+
 # =========================================================
 # SIMPLE LIST (backward compatible)
 # =========================================================
 @router.get("/", response_model=list[schemas.PurchaseOut])
-def list_purchases(
-    db: Session = Depends(get_db),
+async def list_purchases(
+    db: AsyncSession = Depends(get_async_read_db),
     current_user=Depends(get_current_user),
     skip: int = 0,
     limit: int = 100,
 ):
     purchases = (
-        db.query(models.PurchaseOrder)
-        .options(
-            joinedload(models.PurchaseOrder.items).joinedload(models.PurchaseOrderItem.product),
-            joinedload(models.PurchaseOrder.source_account),  # ⬅️ ini doang tambahan penting
+        await db.execute(
+            select(models.PurchaseOrder)
+            .options(*PURCHASE_OUT_OPTIONS)
+            .order_by(models.PurchaseOrder.purchase_date.desc())
+            .offset(skip)
+            .limit(limit)
         )
-        .order_by(models.PurchaseOrder.purchase_date.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-
-    for purchase in purchases:
-        for item in purchase.items:
-            if item.product:
-                item.product_name = item.product.name
+    ).scalars().all()
 
+    _fill_product_names(purchases)
     return purchases
 
 
@@ -260,8 +351,8 @@ def list_purchases(
 # RECEIPTS ENDPOINTS (dipakai UI tab Penerimaan)
 # =========================================================
 @router.get("/receipts", response_model=list[schemas.PurchaseOut])
-def get_purchase_receipts(
-    db: Session = Depends(get_db),
+async def get_purchase_receipts(
+    db: AsyncSession = Depends(get_async_read_db),
     current_user=Depends(get_current_user),
     skip: int = 0,
     limit: int = 100,
@@ -274,50 +365,43 @@ def get_purchase_receipts(
     List purchase receipts dengan filter supplier, invoice, dan periode tanggal.
     Dipakai UI baru (tab Penerimaan).
     """
-    query = db.query(models.PurchaseOrder)
+    query = select(models.PurchaseOrder).options(*PURCHASE_OUT_OPTIONS)
 
     if supplier_name:
-        query = query.filter(
+        query = query.where(
             models.PurchaseOrder.supplier_name.ilike(f"%{supplier_name}%")
         )
     if invoice_number:
-        query = query.filter(
+        query = query.where(
             models.PurchaseOrder.invoice_number.ilike(f"%{invoice_number}%")
         )
     if date_from:
-        query = query.filter(models.PurchaseOrder.purchase_date >= date_from)
+        query = query.where(models.PurchaseOrder.purchase_date >= date_from)
     if date_to:
-        query = query.filter(models.PurchaseOrder.purchase_date <= date_to)
+        query = query.where(models.PurchaseOrder.purchase_date <= date_to)
 
     purchases = (
-        query.order_by(models.PurchaseOrder.purchase_date.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-
-    for purchase in purchases:
-        for item in purchase.items:
-            if item.product:
-                item.product_name = item.product.name
+        await db.execute(
+            query.order_by(models.PurchaseOrder.purchase_date.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+    ).scalars().all()
 
+    _fill_product_names(purchases)
     return purchases
 
 
 @router.get("/receipts/{purchase_id}", response_model=schemas.PurchaseOut)
-def get_purchase_receipt_by_id(
+async def get_purchase_receipt_by_id(
     purchase_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
     """
     Get single purchase receipt by ID
     """
-    purchase = (
-        db.query(models.PurchaseOrder)
-        .filter(models.PurchaseOrder.id == purchase_id)
-        .first()
-    )
+    purchase = await db.get(models.PurchaseOrder, purchase_id, options=PURCHASE_OUT_OPTIONS)
 
     if not purchase:
         raise HTTPException(
@@ -325,8 +409,5 @@ def get_purchase_receipt_by_id(
             detail=f"Purchase order #{purchase_id} not found",
         )
 
-    for item in purchase.items:
-        if item.product:
-            item.product_name = item.product.name
-
+    _fill_product_names([purchase])
     return purchase
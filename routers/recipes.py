@@ -1,9 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from decimal import Decimal
+from collections import defaultdict
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import delete, or_, select
+from sqlalchemy.orm import Session, aliased, selectinload
+from decimal import Decimal, ROUND_FLOOR
 
 import models, schemas
-from db import get_db
+from db import get_db, get_read_db, dialect_insert
 from routers.auth import get_current_user
 
 router = APIRouter(
@@ -37,136 +41,637 @@ def add_recipe_component(
         qty_per_unit=payload.qty_per_unit,
     )
     db.add(rc)
+    refresh_recipe_costs(db, [payload.product_id])
     db.commit()
     db.refresh(rc)
     return rc
 
 
-@router.get("/{product_id}", response_model=list[schemas.RecipeComponentOut])
-def get_recipe(
-    product_id: int,
+# =====================================================
+# BUILDABLE QTY (semua product INTERNAL sekaligus)
+# =====================================================
+def _load_recipe_graph(db: Session):
+    """
+    Satu query: semua baris product_recipes + stok product jadi & komponennya.
+    Return (recipes, stock, products):
+    - recipes: {product_id: [(component_id, qty_per_unit), ...]}
+    - stock: {product_id: stock_qty} untuk semua product yang muncul di BOM
+    - products: {product_id: (sku, name, product_type)} untuk product jadi
+    """
+    parent = aliased(models.Product)
+    component = aliased(models.Product)
+
+    rows = (
+        db.query(
+            models.ProductRecipe.product_id,
+            models.ProductRecipe.component_product_id,
+            models.ProductRecipe.qty_per_unit,
+            parent.sku,
+            parent.name,
+            parent.product_type,
+            parent.stock_qty,
+            component.stock_qty.label("component_stock_qty"),
+        )
+        .join(parent, parent.id == models.ProductRecipe.product_id)
+        .join(component, component.id == models.ProductRecipe.component_product_id)
+        .all()
+    )
+
+    recipes: dict[int, list[tuple[int, Decimal]]] = defaultdict(list)
+    stock: dict[int, Decimal] = {}
+    products: dict[int, tuple[str, str, str]] = {}
+    for r in rows:
+        recipes[r.product_id].append((r.component_product_id, Decimal(str(r.qty_per_unit))))
+        stock[r.product_id] = Decimal(str(r.stock_qty or 0))
+        stock[r.component_product_id] = Decimal(str(r.component_stock_qty or 0))
+        products[r.product_id] = (r.sku, r.name, r.product_type)
+
+    return recipes, stock, products
+
+
+def _bom_order(recipes: dict[int, list[tuple[int, Decimal]]], root: int) -> list[int] | None:
+    """Urutan topologis BOM di bawah root (parent sebelum komponennya). None kalau recipe melingkar."""
+    order: list[int] = []
+    state: dict[int, bool] = {}   # False = sedang dikunjungi, True = selesai
+
+    def visit(product_id: int) -> bool:
+        if product_id in state:
+            return state[product_id]
+        state[product_id] = False
+        for component_id, qty_per_unit in recipes.get(product_id, ()):
+            if qty_per_unit > 0 and not visit(component_id):
+                return False
+        state[product_id] = True
+        order.append(product_id)
+        return True
+
+    if not visit(root):
+        return None
+    order.reverse()
+    return order
+
+
+def _explode(
+    recipes: dict[int, list[tuple[int, Decimal]]],
+    order: list[int],
+    qty: Decimal,
+    stock: dict[int, Decimal] | None = None,
+) -> dict[int, Decimal]:
+    """
+    Kebutuhan RAW (daun BOM) untuk build `qty` unit order[0]. Kebutuhan
+    sub-assembly dijumlah dulu dari semua parent, baru dikurangi stoknya
+    (kalau `stock` diberikan) sebelum diturunkan ke komponennya.
+    """
+    gross: dict[int, Decimal] = defaultdict(Decimal)
+    gross[order[0]] = qty
+    leaves: dict[int, Decimal] = {}
+    for product_id in order:
+        need = gross[product_id]
+        if not any(qty_per_unit > 0 for _, qty_per_unit in recipes.get(product_id, ())):
+            leaves[product_id] = need
+            continue
+        if product_id != order[0] and stock is not None:
+            need = max(need - max(stock.get(product_id, Decimal("0")), Decimal("0")), Decimal("0"))
+        if need:
+            for component_id, qty_per_unit in recipes[product_id]:
+                if qty_per_unit > 0:
+                    gross[component_id] += need * qty_per_unit
+    return leaves
+
+
+def _shortage(recipes, stock, order, qty: Decimal) -> int | None:
+    """Komponen RAW pertama yang stoknya kurang untuk build `qty` unit (None = cukup)."""
+    for component_id, need in _explode(recipes, order, qty, stock).items():
+        if need > max(stock.get(component_id, Decimal("0")), Decimal("0")):
+            return component_id
+    return None
+
+
+def _compute_buildable(
+    recipes: dict[int, list[tuple[int, Decimal]]],
+    stock: dict[int, Decimal],
+) -> dict[int, tuple[Decimal, int | None]]:
+    """
+    Hitung max qty yang bisa dibuild per product jadi: {product_id: (qty, limiting_component_id)}.
+
+    BOM tiap product di-explode sampai bahan RAW, jadi bahan yang dipakai
+    beberapa sub-assembly sekaligus dihitung sekali (total per unit). Tanpa
+    stok sub-assembly hasilnya min(stok_raw // total_raw_per_unit); stok
+    sub-assembly mengurangi kebutuhan RAW, jadi angka itu dinaikkan selama
+    explode bersih (setelah offset stok) masih tercukupi.
+    limiting_component_id = bahan RAW yang habis duluan.
+    """
+    result: dict[int, tuple[Decimal, int | None]] = {}
+    for product_id in recipes:
+        order = _bom_order(recipes, product_id)
+        per_unit = _explode(recipes, order, Decimal("1")) if order else {}
+        per_unit = {cid: qty for cid, qty in per_unit.items() if qty > 0}
+        if not per_unit:
+            # recipe melingkar / tanpa komponen -> jangan dihitung
+            result[product_id] = (Decimal("0"), None)
+            continue
+
+        # batas bawah: semua dari RAW, stok sub-assembly diabaikan
+        low = min(
+            (max(stock.get(cid, Decimal("0")), Decimal("0")) / qty).to_integral_value(rounding=ROUND_FLOOR)
+            for cid, qty in per_unit.items()
+        )
+        if any(pid in recipes for pid in order[1:]):
+            # ada sub-assembly: cari batas atas dengan menggandakan, lalu binary search
+            step = Decimal("1")
+            while _shortage(recipes, stock, order, low + step) is None:
+                low, step = low + step, step * 2
+            high = low + step          # high selalu tidak cukup
+            while high - low > 1:
+                mid = (low + high) // 2
+                if _shortage(recipes, stock, order, mid) is None:
+                    low = mid
+                else:
+                    high = mid
+        result[product_id] = (low, _shortage(recipes, stock, order, low + 1))
+    return result
+
+
+def _buildable_rows(db: Session, extra_stock: dict[int, Decimal] | None = None) -> list[schemas.BuildableOut]:
+    recipes, stock, products = _load_recipe_graph(db)
+    baseline = _compute_buildable(recipes, stock)
+
+    result = baseline
+    if extra_stock:
+        what_if_stock = dict(stock)
+        for product_id, qty in extra_stock.items():
+            what_if_stock[product_id] = what_if_stock.get(product_id, Decimal("0")) + qty
+        result = _compute_buildable(recipes, what_if_stock)
+
+    rows = []
+    for product_id, (sku, name, product_type) in products.items():
+        if product_type != "INTERNAL":
+            continue
+        qty, limiting = result[product_id]
+        rows.append(
+            schemas.BuildableOut(
+                product_id=product_id,
+                sku=sku,
+                product_name=name,
+                stock_qty=stock[product_id],
+                buildable_qty=qty,
+                limiting_component_id=limiting,
+                baseline_buildable_qty=baseline[product_id][0] if extra_stock else None,
+            )
+        )
+    rows.sort(key=lambda r: r.sku)
+    return rows
+
+
+@router.get("/buildable", response_model=list[schemas.BuildableOut])
+def get_buildable(
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Berapa unit tiap product INTERNAL yang bisa dibuild dari stok sekarang.
+    """
+    return _buildable_rows(db)
+
+
+@router.post("/buildable/what-if", response_model=list[schemas.BuildableOut])
+def get_buildable_what_if(
+    payload: schemas.BuildableWhatIfIn,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user),
 ):
+    """
+    Sama seperti /buildable tapi stok ditambah pembelian hipotetis dulu.
+    baseline_buildable_qty = angka tanpa pembelian tsb.
+    """
+    extra_stock: dict[int, Decimal] = defaultdict(Decimal)
+    for item in payload.purchases:
+        if item.qty < 0:
+            raise HTTPException(status_code=400, detail="qty pembelian tidak boleh negatif")
+        extra_stock[item.product_id] += item.qty
+    return _buildable_rows(db, extra_stock)
+
+
+# =====================================================
+# RECIPE COST ROLLUP (cache di tabel recipe_costs)
+# Cache diisi di jalur tulis (recipe ditambah, base_cost berubah) lewat
+# refresh_recipe_costs, dalam transaksi yang sama. Endpoint GET tidak pernah
+# menulis: yang belum ada di cache (mis. setelah restore / migrasi) dihitung
+# di memori saja. Product dengan recipe melingkar tidak punya biaya dan
+# tidak pernah di-cache.
+# =====================================================
+COST_PLACES = Decimal("0.0001")
+
+
+def _cost_ancestors(product_ids):
+    """CTE recursive: semua product yang (langsung / bertingkat) memakai product_ids sebagai komponen."""
+    recipe = models.ProductRecipe
+    ancestors = (
+        select(recipe.product_id)
+        .where(recipe.component_product_id.in_(product_ids))
+        .cte("cost_ancestors", recursive=True)
+    )
+    return ancestors.union(
+        select(recipe.product_id).join(ancestors, recipe.component_product_id == ancestors.c.product_id)
+    )
+
+
+def invalidate_recipe_costs(db: Session, product_ids) -> None:
+    """
+    Hapus cache biaya untuk product_ids dan semua product yang (langsung
+    maupun bertingkat) memakai product tsb sebagai komponen.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+
+    ancestors = _cost_ancestors(product_ids)
+    db.execute(
+        delete(models.RecipeCost)
+        .where(
+            or_(
+                models.RecipeCost.product_id.in_(product_ids),
+                models.RecipeCost.product_id.in_(select(ancestors.c.product_id)),
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def refresh_recipe_costs(db: Session, product_ids) -> None:
+    """
+    Invalidate lalu hitung ulang biaya product_ids + semua ancestor-nya, dalam
+    transaksi pemanggil (belum di-commit). Dipanggil saat base_cost berubah
+    atau baris recipe berubah.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    db.flush()  # session autoflush=False: baris recipe / base_cost baru harus terlihat query di bawah
+    invalidate_recipe_costs(db, product_ids)
+
+    ancestors = _cost_ancestors(product_ids)
+    targets = [
+        pid
+        for (pid,) in db.query(models.ProductRecipe.product_id)
+        .filter(
+            or_(
+                models.ProductRecipe.product_id.in_(product_ids),
+                models.ProductRecipe.product_id.in_(select(ancestors.c.product_id)),
+            )
+        )
+        .distinct()
+        .all()
+    ]
+    computed = _compute_missing_costs(db, targets)
+    if computed:
+        db.execute(
+            dialect_insert(db, models.RecipeCost).on_conflict_do_nothing(index_elements=["product_id"]),
+            [{"product_id": pid, "unit_cost": unit_cost} for pid, unit_cost in computed.items()],
+        )
+
+
+def _compute_recipe_costs(
+    recipes: dict[int, list[tuple[int, Decimal]]],
+    base_cost: dict[int, Decimal],
+    known: dict[int, Decimal],
+    targets,
+) -> dict[int, Decimal]:
+    """
+    Rollup biaya per unit untuk targets. known = nilai dari cache (dipakai ulang
+    untuk sub-assembly). Product di dalam siklus recipe, atau yang BOM-nya
+    mencapai siklus, tidak ada di hasil (biayanya tidak terdefinisi).
+    """
+    memo: dict[int, Decimal | None] = dict(known)
+    visiting: set[int] = set()
+
+    def cost(product_id: int) -> Decimal | None:
+        if product_id in memo:
+            return memo[product_id]
+        if product_id not in recipes:
+            return base_cost.get(product_id, Decimal("0"))
+        if product_id in visiting:
+            return None
+
+        visiting.add(product_id)
+        total = Decimal("0")
+        for component_id, qty_per_unit in recipes[product_id]:
+            component_cost = cost(component_id)
+            if component_cost is None:
+                total = None
+                break
+            total += qty_per_unit * component_cost
+        visiting.discard(product_id)
+
+        # None juga di-memo: semua product di jalur siklus ikut tidak terdefinisi
+        memo[product_id] = None if total is None else total.quantize(COST_PLACES)
+        return memo[product_id]
+
+    costs = {product_id: cost(product_id) for product_id in targets}
+    return {product_id: value for product_id, value in costs.items() if value is not None}
+
+
+def _compute_missing_costs(db: Session, targets) -> dict[int, Decimal]:
+    """Satu query untuk seluruh BOM, cache yang ada dipakai ulang untuk sub-assembly."""
+    if not targets:
+        return {}
+    component = aliased(models.Product)
     rows = (
-        db.query(models.ProductRecipe)
-        .filter(models.ProductRecipe.product_id == product_id)
+        db.query(
+            models.ProductRecipe.product_id,
+            models.ProductRecipe.component_product_id,
+            models.ProductRecipe.qty_per_unit,
+            component.base_cost,
+        )
+        .join(component, component.id == models.ProductRecipe.component_product_id)
         .all()
     )
-    return rows
+    recipes: dict[int, list[tuple[int, Decimal]]] = defaultdict(list)
+    base_cost: dict[int, Decimal] = {}
+    for r in rows:
+        recipes[r.product_id].append((r.component_product_id, Decimal(str(r.qty_per_unit))))
+        base_cost[r.component_product_id] = Decimal(str(r.base_cost or 0))
 
+    known = {
+        pid: Decimal(str(unit_cost))
+        for pid, unit_cost in db.query(models.RecipeCost.product_id, models.RecipeCost.unit_cost).all()
+    }
+    return _compute_recipe_costs(recipes, base_cost, known, targets)
 
 
-@router.post("/build", response_model=schemas.BuildFromRecipeOut, status_code=status.HTTP_201_CREATED)
-def build_from_recipe(
-    payload: schemas.BuildFromRecipeIn,
-    db: Session = Depends(get_db),
+def get_recipe_costs(db: Session, product_ids: Optional[List[int]] = None) -> list[models.RecipeCost]:
+    """
+    Biaya per unit hasil rollup BOM (read-only). Ambil dari cache; yang belum
+    ada dihitung di memori (computed_at kosong) tanpa disimpan.
+    product_ids=None -> semua product yang punya recipe. Product dengan recipe
+    melingkar dilewati.
+    """
+    q = db.query(models.RecipeCost)
+    if product_ids is not None:
+        q = q.filter(models.RecipeCost.product_id.in_(product_ids))
+    costs = {row.product_id: row for row in q.all()}
+
+    targets_q = db.query(models.ProductRecipe.product_id).distinct()
+    if product_ids is not None:
+        targets_q = targets_q.filter(models.ProductRecipe.product_id.in_(product_ids))
+    missing = [pid for (pid,) in targets_q.all() if pid not in costs]
+
+    for pid, unit_cost in _compute_missing_costs(db, missing).items():
+        costs[pid] = models.RecipeCost(product_id=pid, unit_cost=unit_cost)
+
+    return sorted(costs.values(), key=lambda row: row.product_id)
+
+
+@router.get("/costs", response_model=list[schemas.RecipeCostOut])
+def get_recipe_costs_bulk(
+    product_id: Optional[List[int]] = Query(None, description="Kosongkan untuk semua product yang punya recipe"),
+    db: Session = Depends(get_read_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    # 1. Ambil product INTERNAL yang mau diproduksi
-    product = db.query(models.Product).filter(models.Product.id == payload.product_id).first()
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
+    return get_recipe_costs(db, product_id)
 
-    if product.product_type != "INTERNAL":
-        raise HTTPException(status_code=400, detail="Build hanya untuk product_type INTERNAL")
 
-    if payload.qty_to_build <= 0:
-        raise HTTPException(status_code=400, detail="qty_to_build harus > 0")
+@router.get("/{product_id}/cost", response_model=schemas.RecipeCostOut)
+def get_recipe_cost(
+    product_id: int,
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    rows = get_recipe_costs(db, [product_id])
+    if rows:
+        return rows[0]
+    has_recipe = db.query(models.ProductRecipe.id).filter(models.ProductRecipe.product_id == product_id).first()
+    if has_recipe:
+        raise HTTPException(status_code=400, detail="Recipe/BOM produk ini melingkar, biaya tidak bisa dihitung")
+    raise HTTPException(status_code=404, detail="Produk ini belum punya recipe/BOM")
+
 
-    # 2. Ambil recipe (komponen RAW)
-    recipe_rows = (
+@router.get("/{product_id}", response_model=list[schemas.RecipeComponentOut])
+def get_recipe(
+    product_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    rows = (
         db.query(models.ProductRecipe)
-        .filter(models.ProductRecipe.product_id == product.id)
+        .filter(models.ProductRecipe.product_id == product_id)
         .all()
     )
+    return rows
+
+
+
+# =====================================================
+# PRODUCTION (build dari recipe, satu atau banyak product)
+# =====================================================
+def _execute_production(
+    db: Session,
+    lines: list[schemas.BuildFromRecipeIn],
+    notes: str | None = None,
+) -> tuple[models.ProductionOrder, list[schemas.BuildFromRecipeOut]]:
+    """
+    Build banyak product INTERNAL dalam satu transaksi:
+    1. ambil semua recipe sekaligus, jumlahkan kebutuhan tiap komponen
+    2. lock product jadi + semua komponen sekali, urut id
+    3. cek kecukupan stok semua komponen dalam satu pass, hasil line
+       sebelumnya dihitung sebagai stok untuk line sesudahnya
+    4. catat ProductionOrder + StockMovement yang ref ke order tsb
+    Tidak commit, caller yang commit.
+    """
+    if not lines:
+        raise HTTPException(status_code=400, detail="Items cannot be empty")
+    for line in lines:
+        if line.qty_to_build <= 0:
+            raise HTTPException(status_code=400, detail="qty_to_build harus > 0")
 
-    if not recipe_rows:
-        raise HTTPException(status_code=400, detail="Produk ini belum punya recipe/BOM")
+    product_ids = {line.product_id for line in lines}
 
-    # 3. Hitung kebutuhan masing-masing komponen
-    required_components = []  # list dict
-    for rc in recipe_rows:
-        component = db.query(models.Product).filter(models.Product.id == rc.component_product_id).first()
-        if not component:
-            raise HTTPException(status_code=404, detail=f"Component product id {rc.component_product_id} not found")
+    # 1. Recipe semua product sekaligus
+    recipes: dict[int, list[models.ProductRecipe]] = defaultdict(list)
+    for rc in (
+        db.query(models.ProductRecipe)
+        .filter(models.ProductRecipe.product_id.in_(product_ids))
+        .order_by(models.ProductRecipe.id)
+        .all()
+    ):
+        recipes[rc.product_id].append(rc)
 
-        needed_qty = (rc.qty_per_unit * payload.qty_to_build)
+    demand: dict[int, Decimal] = defaultdict(Decimal)
+    for line in lines:
+        for rc in recipes[line.product_id]:
+            demand[rc.component_product_id] += rc.qty_per_unit * line.qty_to_build
 
-        stock_before = component.stock_qty or Decimal("0")
+    # 2. Satu kali lock, urut id (hindari deadlock dengan sales / build lain)
+    locked = {
+        p.id: p
+        for p in db.query(models.Product)
+        .filter(models.Product.id.in_(product_ids | set(demand)))
+        .order_by(models.Product.id)
+        .with_for_update()
+        .all()
+    }
 
-        if stock_before < needed_qty:
+    for line in lines:
+        product = locked.get(line.product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail=f"Product id {line.product_id} not found")
+        if product.product_type != "INTERNAL":
+            raise HTTPException(status_code=400, detail="Build hanya untuk product_type INTERNAL")
+        if not recipes[line.product_id]:
             raise HTTPException(
                 status_code=400,
-                detail=f"Stok tidak cukup untuk komponen {component.name}: butuh {needed_qty}, stok {stock_before}",
+                detail=f"Produk {product.name} belum punya recipe/BOM",
             )
 
-        required_components.append({
-            "component": component,
-            "needed_qty": needed_qty,
-            "stock_before": stock_before,
-        })
-
-    # 4. Kalau semua cukup → eksekusi konsumsi komponen + tambah stok produk jadi
-    component_usages = []
-
-    for row in required_components:
-        component = row["component"]
-        needed_qty = row["needed_qty"]
-        stock_before = row["stock_before"]
-        stock_after = stock_before - needed_qty
-
-        # update stok komponen
-        component.stock_qty = stock_after
-
-        # catat stock movement OUT
-        mv = models.StockMovement(
-            product_id=component.id,
-            type="OUT",
-            ref_type="PRODUCTION",
-            ref_id=None,  # kalau nanti punya tabel ProductionOrder, bisa diisi
-            qty_change=needed_qty,
-            stock_before=stock_before,
-            stock_after=stock_after,
-            notes=f"Build {payload.qty_to_build} {product.name} (BOM)",
+    # 3. Cek stok semua komponen sekaligus. Line dijalankan sesuai urutan
+    # payload, jadi hasil line sebelumnya (sub-assembly) ikut dihitung
+    # tersedia untuk line sesudahnya.
+    for component_id in demand:
+        if component_id not in locked:
+            raise HTTPException(status_code=404, detail=f"Component product id {component_id} not found")
+    balance = {pid: p.stock_qty or Decimal("0") for pid, p in locked.items()}
+    shortfall: dict[int, Decimal] = {}
+    for line in lines:
+        for rc in recipes[line.product_id]:
+            component_id = rc.component_product_id
+            balance[component_id] -= rc.qty_per_unit * line.qty_to_build
+            if balance[component_id] < 0:
+                shortfall[component_id] = max(shortfall.get(component_id, Decimal("0")), -balance[component_id])
+        balance[line.product_id] += line.qty_to_build
+
+    shortages = [
+        f"{locked[component_id].name}: butuh {demand[component_id]}, "
+        f"stok {locked[component_id].stock_qty or Decimal('0')}, kurang {missing}"
+        for component_id, missing in shortfall.items()
+    ]
+    if shortages:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Stok tidak cukup untuk komponen {'; '.join(shortages)}",
         )
-        db.add(mv)
-
-        component_usages.append(
-            schemas.BuildFromRecipeComponentUsage(
-                product_id=component.id,
-                product_name=component.name,
-                qty_used=needed_qty,
-                stock_before=stock_before,
-                stock_after=stock_after,
+
+    # 4. Eksekusi
+    order = models.ProductionOrder(status="COMPLETED", notes=notes)
+    db.add(order)
+    db.flush()
+
+    results = []
+    for line in lines:
+        product = locked[line.product_id]
+        db.add(
+            models.ProductionOrderItem(
+                production_order_id=order.id,
+                product_id=product.id,
+                qty=line.qty_to_build,
             )
         )
 
-    # 5. Tambah stok produk jadi
-    prod_stock_before = product.stock_qty or Decimal("0")
-    prod_stock_after = prod_stock_before + payload.qty_to_build
-    product.stock_qty = prod_stock_after
-
-    mv_prod = models.StockMovement(
-        product_id=product.id,
-        type="IN",
-        ref_type="PRODUCTION",
-        ref_id=None,
-        qty_change=payload.qty_to_build,
-        stock_before=prod_stock_before,
-        stock_after=prod_stock_after,
-        notes="Build from recipe",
-    )
-    db.add(mv_prod)
+        component_usages = []
+        for rc in recipes[product.id]:
+            component = locked[rc.component_product_id]
+            needed_qty = rc.qty_per_unit * line.qty_to_build
+            stock_before = component.stock_qty or Decimal("0")
+            stock_after = stock_before - needed_qty
+            component.stock_qty = stock_after
 
+            db.add(
+                models.StockMovement(
+                    product_id=component.id,
+                    type="OUT",
+                    ref_type="PRODUCTION",
+                    ref_id=order.id,
+                    qty_change=needed_qty,
+                    stock_before=stock_before,
+                    stock_after=stock_after,
+                    notes=f"Build {line.qty_to_build} {product.name} (BOM)",
+                )
+            )
+            component_usages.append(
+                schemas.BuildFromRecipeComponentUsage(
+                    product_id=component.id,
+                    product_name=component.name,
+                    qty_used=needed_qty,
+                    stock_before=stock_before,
+                    stock_after=stock_after,
+                )
+            )
+
+        prod_stock_before = product.stock_qty or Decimal("0")
+        prod_stock_after = prod_stock_before + line.qty_to_build
+        product.stock_qty = prod_stock_after
+
+        db.add(
+            models.StockMovement(
+                product_id=product.id,
+                type="IN",
+                ref_type="PRODUCTION",
+                ref_id=order.id,
+                qty_change=line.qty_to_build,
+                stock_before=prod_stock_before,
+                stock_after=prod_stock_after,
+                notes=f"Build from recipe (production #{order.id})",
+            )
+        )
+
+        results.append(
+            schemas.BuildFromRecipeOut(
+                product_id=product.id,
+                product_name=product.name,
+                qty_built=line.qty_to_build,
+                stock_before=prod_stock_before,
+                stock_after=prod_stock_after,
+                components=component_usages,
+            )
+        )
+
+    return order, results
+
+
+@router.post("/build", response_model=schemas.BuildFromRecipeOut, status_code=status.HTTP_201_CREATED)
+def build_from_recipe(
+    payload: schemas.BuildFromRecipeIn,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    _, results = _execute_production(db, [payload])
+    db.commit()
+    return results[0]
+
+
+@router.post("/build-batch", response_model=schemas.BuildBatchOut, status_code=status.HTTP_201_CREATED)
+def build_batch(
+    payload: schemas.BuildBatchIn,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Build banyak product INTERNAL sekaligus dalam satu production order.
+    Semua atau tidak sama sekali: kalau satu komponen kurang, tidak ada yang dibuild,
+    dan error-nya menyebut semua komponen yang kurang.
+    Line dijalankan sesuai urutan items: sub-assembly yang dibuild di line awal
+    boleh dipakai line sesudahnya (taruh line sub-assembly lebih dulu).
+    """
+    order, results = _execute_production(db, payload.items, payload.notes)
     db.commit()
-    db.refresh(product)
-
-    return schemas.BuildFromRecipeOut(
-        product_id=product.id,
-        product_name=product.name,
-        qty_built=payload.qty_to_build,
-        stock_before=prod_stock_before,
-        stock_after=prod_stock_after,
-        components=component_usages,
+    return schemas.BuildBatchOut(
+        production_order_id=order.id,
+        status=order.status,
+        lines=results,
+    )
+
+
+@router.get("/production-orders/{order_id}", response_model=schemas.ProductionOrderOut)
+def get_production_order(
+    order_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    order = (
+        db.query(models.ProductionOrder)
+        .options(selectinload(models.ProductionOrder.items))
+        .filter(models.ProductionOrder.id == order_id)
+        .first()
     )
+    if not order:
+        raise HTTPException(status_code=404, detail="Production order not found")
+    return order
@@ -1,13 +1,16 @@
 # routers/reports.py
-from datetime import date
+from datetime import date, datetime, time, timedelta, timezone
 from decimal import Decimal
 
+from typing import List, Optional
+
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import and_, case, func, select
 
-from db import get_db
-import models
+from db import get_async_read_db, get_read_db
+import models, forecasting
 from routers.auth import get_current_user
 
 router = APIRouter(prefix="/reports", tags=["Reports"])
@@ -25,32 +28,29 @@ def _parse_date_param(param: str | None, name: str) -> date | None:
         )
 
 
-@router.get("/daily")
-def daily_report(
-    target_date: str = Query(..., description="Tanggal laporan, format YYYY-MM-DD"),
-    db: Session = Depends(get_db),
-    user=Depends(get_current_user),
-):
+def _date_range(column, start: date, end: date):
     """
-    Laporan keuangan harian dari CashLedger:
-    - total penjualan
-    - total pembelian
-    - total pengeluaran lain
-    - net income hari itu
+    start <= tanggal(column) <= end sebagai range timestamp, bukan
+    func.date(column), supaya index di kolom tanggal bisa dipakai.
     """
-    d = _parse_date_param(target_date, "target_date")
+    return and_(
+        column >= datetime.combine(start, time.min),
+        column < datetime.combine(end + timedelta(days=1), time.min),
+    )
+
 
-    # pakai func.date(entry_date) == d
+async def _ledger_summary(db: AsyncSession, date_filter) -> dict:
+    """Total CashLedger per (type, source) dalam satu query GROUP BY, lalu dirangkum."""
     ledger = models.CashLedger
-    day_filter = func.date(ledger.entry_date) == d
+    rows = await db.execute(
+        select(ledger.type, ledger.source, func.coalesce(func.sum(ledger.amount), 0))
+        .where(date_filter)
+        .group_by(ledger.type, ledger.source)
+    )
+    totals = {(_type, _source): Decimal(str(amount or 0)) for _type, _source, amount in rows}
 
-    def _sum_amount(_type: str | None = None, _source: str | None = None) -> Decimal:
-        q = db.query(func.coalesce(func.sum(ledger.amount), 0)).filter(day_filter)
-        if _type:
-            q = q.filter(ledger.type == _type)
-        if _source:
-            q = q.filter(ledger.source == _source)
-        return q.scalar() or Decimal("0")
+    def _sum_amount(_type: str, _source: str) -> Decimal:
+        return totals.get((_type, _source), Decimal("0"))
 
     total_sales = _sum_amount("IN", "SALE")
     total_purchase = _sum_amount("OUT", "PURCHASE")
@@ -60,24 +60,44 @@ def daily_report(
 
     net_income = total_sales + total_other_income - total_purchase - total_expense - total_other_out
 
+    return {
+        "total_sales": float(total_sales),
+        "total_purchase": float(total_purchase),
+        "total_expense": float(total_expense),
+        "total_other_income": float(total_other_income),
+        "total_other_out": float(total_other_out),
+        "net_income": float(net_income),
+    }
+
+
+@router.get("/daily")
+async def daily_report(
+    target_date: str = Query(..., description="Tanggal laporan, format YYYY-MM-DD"),
+    db: AsyncSession = Depends(get_async_read_db),
+    user=Depends(get_current_user),
+):
+    """
+    Laporan keuangan harian dari CashLedger:
+    - total penjualan
+    - total pembelian
+    - total pengeluaran lain
+    - net income hari itu
+    """
+    d = _parse_date_param(target_date, "target_date")
+
+    day_filter = _date_range(models.CashLedger.entry_date, d, d)
+
     return {
         "date": str(d),
-        "summary": {
-            "total_sales": float(total_sales),
-            "total_purchase": float(total_purchase),
-            "total_expense": float(total_expense),
-            "total_other_income": float(total_other_income),
-            "total_other_out": float(total_other_out),
-            "net_income": float(net_income),
-        },
+        "summary": await _ledger_summary(db, day_filter),
     }
 
 
 @router.get("/range")
-def range_report(
+async def range_report(
     start_date: str = Query(..., description="Start date YYYY-MM-DD"),
     end_date: str = Query(..., description="End date YYYY-MM-DD (inclusive)"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     user=Depends(get_current_user),
 ):
     """
@@ -90,66 +110,202 @@ def range_report(
     if start > end:
         raise HTTPException(status_code=400, detail="start_date must be <= end_date")
 
-    ledger = models.CashLedger
-    date_filter = func.date(ledger.entry_date).between(start, end)
-
-    def _sum_amount(_type: str | None = None, _source: str | None = None) -> Decimal:
-        q = db.query(func.coalesce(func.sum(ledger.amount), 0)).filter(date_filter)
-        if _type:
-            q = q.filter(ledger.type == _type)
-        if _source:
-            q = q.filter(ledger.source == _source)
-        return q.scalar() or Decimal("0")
-
-    total_sales = _sum_amount("IN", "SALE")
-    total_purchase = _sum_amount("OUT", "PURCHASE")
-    total_expense = _sum_amount("OUT", "EXPENSE")
-    total_other_income = _sum_amount("IN", "OTHER")
-    total_other_out = _sum_amount("OUT", "OTHER")
-
-    net_income = total_sales + total_other_income - total_purchase - total_expense - total_other_out
+    date_filter = _date_range(models.CashLedger.entry_date, start, end)
 
     return {
         "start_date": str(start),
         "end_date": str(end),
-        "summary": {
-            "total_sales": float(total_sales),
-            "total_purchase": float(total_purchase),
-            "total_expense": float(total_expense),
-            "total_other_income": float(total_other_income),
-            "total_other_out": float(total_other_out),
-            "net_income": float(net_income),
-        },
+        "summary": await _ledger_summary(db, date_filter),
     }
 
 @router.get("/customers-by-channel")
-def customers_by_channel(
-    db: Session = Depends(get_db),
+async def customers_by_channel(
+    db: AsyncSession = Depends(get_async_read_db),
     user=Depends(get_current_user),
 ):
     """
-    Summary jumlah customer per source_channel.
-    Bisa dipakai untuk lihat channel mana paling banyak bawa customer.
+    Summary customer per source_channel: jumlah customer, yang sudah belanja,
+    jumlah order dan revenue. Diambil dari customer_stats (bukan agregasi
+    sales_orders), jadi tetap cepat walau histori penjualan besar.
     """
-    rows = (
-        db.query(
+    stats = models.CustomerStats
+    rows = await db.execute(
+        select(
             models.Customer.source_channel,
             func.count(models.Customer.id).label("total_customers"),
+            func.count(stats.customer_id).label("buying_customers"),
+            func.coalesce(func.sum(stats.order_count), 0).label("total_orders"),
+            func.coalesce(func.sum(stats.total_spend), 0).label("total_revenue"),
         )
-        .filter(models.Customer.is_active == True)
+        .outerjoin(stats, stats.customer_id == models.Customer.id)
+        .where(models.Customer.is_active == True)
         .group_by(models.Customer.source_channel)
         .order_by(func.count(models.Customer.id).desc())
-        .all()
     )
 
     result = []
-    for source_channel, total in rows:
+    for source_channel, total, buying, orders, revenue in rows:
+        revenue = Decimal(str(revenue or 0))
         result.append(
             {
                 "source_channel": source_channel or "UNKNOWN",
                 "total_customers": int(total),
+                "buying_customers": int(buying),
+                "total_orders": int(orders),
+                "total_revenue": float(revenue),
+                "avg_revenue_per_buying_customer": float(revenue / buying) if buying else 0.0,
             }
         )
 
     return result
 
+
+RFM_SEGMENTS = ("CHAMPIONS", "LOYAL", "NEW", "AT_RISK", "LOST", "NEEDS_ATTENTION")
+
+
+@router.get("/customers/rfm")
+async def customers_rfm(
+    source_channel: Optional[str] = Query(None, description="Filter channel (UNKNOWN = kosong)"),
+    segment: Optional[str] = Query(None, description=" | ".join(RFM_SEGMENTS)),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_read_db),
+    user=Depends(get_current_user),
+):
+    """
+    Recency / frequency / monetary per customer dari customer_stats.
+    Skor 1-5 = kuintil (ntile) terhadap semua customer aktif yang pernah order,
+    5 = paling baru / paling sering / belanja paling besar.
+    """
+    if segment and segment not in RFM_SEGMENTS:
+        raise HTTPException(status_code=400, detail=f"segment harus salah satu dari {', '.join(RFM_SEGMENTS)}")
+
+    stats = models.CustomerStats
+    customer = models.Customer
+    scored = (
+        select(
+            stats.customer_id,
+            customer.name,
+            customer.source_channel,
+            stats.last_order_date,
+            stats.order_count,
+            stats.total_spend,
+            func.ntile(5).over(order_by=stats.last_order_date.asc()).label("r_score"),
+            func.ntile(5).over(order_by=(stats.order_count.asc(), stats.total_spend.asc())).label("f_score"),
+            func.ntile(5).over(order_by=stats.total_spend.asc()).label("m_score"),
+        )
+        .join(customer, customer.id == stats.customer_id)
+        .where(customer.is_active == True, stats.order_count > 0)
+        .subquery()
+    )
+
+    r, f = scored.c.r_score, scored.c.f_score
+    segment_expr = case(
+        ((r >= 4) & (f >= 4), "CHAMPIONS"),
+        ((r >= 3) & (f >= 3), "LOYAL"),
+        ((r >= 4) & (f <= 2), "NEW"),
+        ((r <= 2) & (f >= 3), "AT_RISK"),
+        (r <= 1, "LOST"),
+        else_="NEEDS_ATTENTION",
+    ).label("segment")
+
+    q = select(scored, segment_expr)
+    summary_q = select(segment_expr, func.count(), func.coalesce(func.sum(scored.c.total_spend), 0))
+    if source_channel:
+        channel_filter = (
+            scored.c.source_channel == None
+            if source_channel == "UNKNOWN"
+            else scored.c.source_channel == source_channel
+        )
+        q = q.where(channel_filter)
+        summary_q = summary_q.where(channel_filter)
+    if segment:
+        q = q.where(segment_expr == segment)
+        summary_q = summary_q.where(segment_expr == segment)
+
+    summary = {
+        seg: {"customers": int(count), "total_spend": float(spend or 0)}
+        for seg, count, spend in await db.execute(summary_q.group_by(segment_expr))
+    }
+
+    rows = (
+        await db.execute(
+            q.order_by(scored.c.total_spend.desc(), scored.c.customer_id)
+            .offset(skip)
+            .limit(limit)
+        )
+    ).all()
+
+    now = datetime.now(timezone.utc)
+    customers = []
+    for row in rows:
+        last = row.last_order_date
+        if last is not None and last.tzinfo is None:
+            last = last.replace(tzinfo=timezone.utc)
+        customers.append(
+            {
+                "customer_id": row.customer_id,
+                "name": row.name,
+                "source_channel": row.source_channel or "UNKNOWN",
+                "last_order_date": row.last_order_date,
+                "recency_days": (now - last).days if last else None,
+                "frequency": int(row.order_count),
+                "monetary": float(row.total_spend or 0),
+                "r_score": int(row.r_score),
+                "f_score": int(row.f_score),
+                "m_score": int(row.m_score),
+                "rfm": f"{row.r_score}{row.f_score}{row.m_score}",
+                "segment": row.segment,
+            }
+        )
+
+    return {
+        "total": sum(s["customers"] for s in summary.values()),
+        "segments": summary,
+        "customers": customers,
+    }
+
+
+@router.get("/forecast")
+def demand_forecast(
+    product_id: Optional[List[int]] = Query(None, description="Kosongkan untuk semua product aktif"),
+    method: str = Query("ses", description="ma | ses | seasonal"),
+    horizon: int = Query(14, ge=1, le=365, description="Jumlah hari ke depan"),
+    history_days: int = Query(90, ge=7, le=730),
+    window: int = Query(7, ge=1, description="Window moving average (method=ma)"),
+    alpha: float = Query(0.3, gt=0, le=1, description="Smoothing factor (ses / seasonal)"),
+    include_daily: bool = Query(True, description="Sertakan forecast per hari"),
+    db: Session = Depends(get_read_db),
+    user=Depends(get_current_user),
+):
+    """
+    Forecast demand per SKU dari histori penjualan (stock_movements SALE).
+    Semua SKU di-fit sekaligus (NumPy), hasil di-cache sampai ada penjualan baru.
+    """
+    try:
+        results = forecasting.forecast(
+            db,
+            product_ids=product_id,
+            method=method,
+            horizon=horizon,
+            history_days=history_days,
+            window=window,
+            alpha=alpha,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = []
+    for pid, daily in results.items():
+        row = {
+            "product_id": pid,
+            "method": method,
+            "horizon": horizon,
+            "total_qty": round(float(daily.sum()), 2),
+            "avg_daily_qty": round(float(daily.mean()), 2),
+        }
+        if include_daily:
+            row["daily"] = [round(float(v), 2) for v in daily]
+        rows.append(row)
+
+    return rows
@@ -3,10 +3,12 @@ from decimal import Decimal
 from typing import Optional, List
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 
-from db import get_db
-import models, schemas
+from db import get_db, get_async_db, get_async_read_db
+import models, schemas, customer_metrics
 from routers.auth import get_current_user
 
 router = APIRouter(prefix="/sales", tags=["Sales"])
@@ -57,9 +59,9 @@ def auto_build_from_recipe(db: Session, product: models.Product, qty_needed: Dec
             .with_for_update()
             .first()
         )
-        needed = float(rc.qty_per_unit) * float(build_qty)
+        needed = Decimal(str(rc.qty_per_unit)) * build_qty
 
-        before = comp.stock_qty
+        before = Decimal(str(comp.stock_qty or 0))
         after = before - needed
         comp.stock_qty = after
 
@@ -277,6 +279,12 @@ def create_sale(
             )
         )
 
+    # -----------------------------
+    # CUSTOMER STATS (RFM)
+    # -----------------------------
+    if customer_id:
+        customer_metrics.record_sale(db, customer_id, sale.order_date, total_amount)
+
     db.commit()
     db.refresh(sale)
     return sale
@@ -286,30 +294,32 @@ def create_sale(
 # GET LIST SALES
 # =====================================================
 @router.get("/", response_model=List[schemas.SalesOut])
-def list_sales(
+async def list_sales(
     skip: int = 0,
     limit: int = 100,
     customer_id: Optional[int] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     user=Depends(get_current_user),
 ):
+    # items lewat selectinload (query kedua, IN per halaman) supaya LIMIT tetap di tabel header
     q = (
-        db.query(models.SalesOrder)
+        select(models.SalesOrder)
         .options(
-            joinedload(models.SalesOrder.items).joinedload(models.SalesOrderItem.product),
+            selectinload(models.SalesOrder.items).joinedload(models.SalesOrderItem.product),
             joinedload(models.SalesOrder.source_account),
         )
     )
 
     if customer_id:
-        q = q.filter(models.SalesOrder.customer_id == customer_id)
+        q = q.where(models.SalesOrder.customer_id == customer_id)
 
     sales = (
-        q.order_by(models.SalesOrder.order_date.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+        await db.execute(
+            q.order_by(models.SalesOrder.order_date.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+    ).scalars().all()
 
     # isi product_name agar terbaca di schema
     for sale in sales:
@@ -324,20 +334,19 @@ def list_sales(
 # GET SINGLE SALE (FIXED - No duplicate)
 # =====================================================
 @router.get("/{sale_id}", response_model=schemas.SalesOut)
-def get_sale(
+async def get_sale(
     sale_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     user=Depends(get_current_user),
 ):
     """Get single sale by ID"""
-    sale = (
-        db.query(models.SalesOrder)
-        .options(
-            joinedload(models.SalesOrder.items).joinedload(models.SalesOrderItem.product),
+    sale = await db.get(
+        models.SalesOrder,
+        sale_id,
+        options=[
+            selectinload(models.SalesOrder.items).joinedload(models.SalesOrderItem.product),
             joinedload(models.SalesOrder.source_account),
-        )
-        .filter(models.SalesOrder.id == sale_id)
-        .first()
+        ],
     )
     if not sale:
         raise HTTPException(status_code=404, detail="Sale not found")
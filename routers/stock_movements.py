@@ -1,9 +1,11 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from typing import Optional
 
 import models, schemas
-from db import get_db
+from db import get_async_read_db
 from routers.auth import get_current_user
 
 router = APIRouter(
@@ -12,18 +14,23 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=list[schemas.StockMovementOut])
-def list_stock_movements(
+async def list_stock_movements(
     product_id: Optional[int] = None,
     limit: int = 200,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    q = db.query(models.StockMovement).order_by(models.StockMovement.movement_date.desc())
+    # product di-join sekalian: session async tidak bisa lazy load
+    q = (
+        select(models.StockMovement)
+        .options(joinedload(models.StockMovement.product))
+        .order_by(models.StockMovement.movement_date.desc())
+    )
 
     if product_id:
-        q = q.filter(models.StockMovement.product_id == product_id)
+        q = q.where(models.StockMovement.product_id == product_id)
 
-    rows = q.limit(limit).all()
+    rows = (await db.execute(q.limit(limit))).scalars().all()
 
     for row in rows:
         row.product_name = row.product.name if row.product else None
@@ -0,0 +1,354 @@
+# routers/stock_takes.py
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import case, delete, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+import models, schemas
+from db import get_db, get_read_db
+from routers.auth import get_current_user
+
+router = APIRouter(
+    prefix="/stock-takes",
+    tags=["stock-takes"],
+)
+
+
+# =====================================================
+# Helpers
+# =====================================================
+def _get_stock_take(db: Session, stock_take_id: int, lock: bool = False) -> models.StockTake:
+    q = db.query(models.StockTake).filter(models.StockTake.id == stock_take_id)
+    if lock:
+        q = q.with_for_update()
+    take = q.first()
+    if not take:
+        raise HTTPException(status_code=404, detail="Stock take not found")
+    return take
+
+
+def _require_draft(take: models.StockTake):
+    if take.status != "DRAFT":
+        raise HTTPException(
+            status_code=400,
+            detail=f"Stock take #{take.id} sudah {take.status}, tidak bisa diubah",
+        )
+
+
+def _count_lines(db: Session, stock_take_id: int) -> int:
+    return (
+        db.query(func.count(models.StockTakeLine.id))
+        .filter(models.StockTakeLine.stock_take_id == stock_take_id)
+        .scalar()
+        or 0
+    )
+
+
+# =====================================================
+# CREATE / LIST / GET SESSION
+# =====================================================
+@router.post("/", response_model=schemas.StockTakeOut, status_code=status.HTTP_201_CREATED)
+def create_stock_take(
+    payload: schemas.StockTakeCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    take = models.StockTake(status="DRAFT", notes=payload.notes)
+    db.add(take)
+    db.commit()
+    db.refresh(take)
+    return take
+
+
+@router.get("/", response_model=list[schemas.StockTakeOut])
+def list_stock_takes(
+    status_filter: Optional[str] = Query(None, alias="status"),
+    limit: int = 100,
+    db: Session = Depends(get_read_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    q = db.query(models.StockTake)
+    if status_filter:
+        q = q.filter(models.StockTake.status == status_filter)
+    return q.order_by(models.StockTake.id.desc()).limit(limit).all()
+
+
+@router.get("/{stock_take_id}", response_model=schemas.StockTakeOut)
+def get_stock_take(
+    stock_take_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    return _get_stock_take(db, stock_take_id)
+
+
+# =====================================================
+# UPLOAD COUNTED QTY (bulk)
+# =====================================================
+@router.post("/{stock_take_id}/counts", response_model=schemas.StockTakeCountsOut)
+def upload_counts(
+    stock_take_id: int,
+    payload: schemas.StockTakeCountsIn,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Upload hasil hitung fisik. Boleh ribuan baris sekaligus, identifikasi
+    pakai product_id atau sku. Product yang sudah pernah dihitung di sesi
+    ini akan ditimpa dengan hitungan terbaru.
+    """
+    take = _get_stock_take(db, stock_take_id, lock=True)
+    _require_draft(take)
+
+    if not payload.counts:
+        raise HTTPException(status_code=400, detail="Counts cannot be empty")
+
+    # Resolve SKU -> product_id dalam satu query
+    skus = {c.sku for c in payload.counts if c.product_id is None and c.sku}
+    sku_map = {}
+    if skus:
+        sku_map = dict(
+            db.query(models.Product.sku, models.Product.id)
+            .filter(models.Product.sku.in_(skus))
+            .all()
+        )
+
+    counted: dict[int, Decimal] = {}
+    unknown = []
+    for c in payload.counts:
+        if c.product_id is None and not c.sku:
+            raise HTTPException(status_code=400, detail="Setiap baris butuh product_id atau sku")
+        if c.counted_qty < 0:
+            raise HTTPException(status_code=400, detail="counted_qty tidak boleh negatif")
+
+        product_id = c.product_id if c.product_id is not None else sku_map.get(c.sku)
+        if product_id is None:
+            unknown.append(c.sku)
+            continue
+        counted[product_id] = c.counted_qty   # baris terakhir yang menang
+
+    # Validasi product_id yang dikirim langsung, juga satu query
+    existing_ids = {
+        pid
+        for (pid,) in db.query(models.Product.id)
+        .filter(models.Product.id.in_(list(counted)))
+        .all()
+    }
+    unknown.extend(str(pid) for pid in counted if pid not in existing_ids)
+    if unknown:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Product tidak ditemukan: {', '.join(map(str, unknown[:20]))}",
+        )
+
+    # Re-count: buang hitungan lama untuk product yang sama, lalu insert bulk
+    db.execute(
+        delete(models.StockTakeLine)
+        .where(
+            models.StockTakeLine.stock_take_id == take.id,
+            models.StockTakeLine.product_id.in_(list(counted)),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        insert(models.StockTakeLine),
+        [
+            {"stock_take_id": take.id, "product_id": pid, "counted_qty": qty}
+            for pid, qty in counted.items()
+        ],
+    )
+    db.commit()
+
+    return schemas.StockTakeCountsOut(
+        stock_take_id=take.id,
+        lines_received=len(counted),
+        total_lines=_count_lines(db, take.id),
+    )
+
+
+# =====================================================
+# VARIANCE (set-based, dihitung di SQL)
+# =====================================================
+@router.get("/{stock_take_id}/variance", response_model=schemas.StockTakeVarianceOut)
+def get_variance(
+    stock_take_id: int,
+    only_variance: bool = Query(True, description="Hanya baris yang selisih != 0"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Selisih hitung fisik vs stock_qty. Untuk sesi DRAFT dihitung live
+    terhadap stok sekarang, untuk sesi POSTED pakai snapshot saat posting.
+    """
+    take = _get_stock_take(db, stock_take_id)
+    line = models.StockTakeLine
+    product = models.Product
+
+    if take.status == "POSTED":
+        system_qty = func.coalesce(line.system_qty, 0)
+        variance = func.coalesce(line.variance, 0)
+    else:
+        system_qty = func.coalesce(product.stock_qty, 0)
+        variance = line.counted_qty - system_qty
+
+    base = (
+        db.query(line)
+        .join(product, product.id == line.product_id)
+        .filter(line.stock_take_id == take.id)
+    )
+
+    total_lines, lines_with_variance, net_variance = base.with_entities(
+        func.count(line.id),
+        func.coalesce(func.sum(case((variance != 0, 1), else_=0)), 0),
+        func.coalesce(func.sum(variance), 0),
+    ).one()
+
+    q = base.with_entities(
+        line.product_id,
+        product.sku,
+        product.name,
+        system_qty.label("system_qty"),
+        line.counted_qty,
+        variance.label("variance"),
+    )
+    if only_variance:
+        q = q.filter(variance != 0)
+
+    rows = q.order_by(product.sku).all()
+
+    return schemas.StockTakeVarianceOut(
+        stock_take_id=take.id,
+        status=take.status,
+        total_lines=int(total_lines),
+        lines_with_variance=int(lines_with_variance),
+        net_variance=Decimal(str(net_variance)),
+        lines=[
+            schemas.StockTakeVarianceLine(
+                product_id=r.product_id,
+                sku=r.sku,
+                product_name=r.name,
+                system_qty=r.system_qty,
+                counted_qty=r.counted_qty,
+                variance=r.variance,
+            )
+            for r in rows
+        ],
+    )
+
+
+# =====================================================
+# POST SESSION -> ADJUST movements + update stok (bulk)
+# =====================================================
+@router.post("/{stock_take_id}/post", response_model=schemas.StockTakePostOut)
+def post_stock_take(
+    stock_take_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    """
+    Posting hasil stock take:
+    - lock semua product yang dihitung sekaligus, urut id (hindari deadlock
+      dengan transaksi penjualan/pembelian yang jalan bersamaan)
+    - snapshot stock_qty ke baris stock take
+    - tulis StockMovement ADJUST untuk yang selisih, lalu set stock_qty = counted
+    Semua set-based, jumlah query tidak tergantung jumlah SKU.
+    """
+    take = _get_stock_take(db, stock_take_id, lock=True)
+    _require_draft(take)
+
+    line = models.StockTakeLine
+    product = models.Product
+    take_product_ids = select(line.product_id).where(line.stock_take_id == take.id)
+
+    total_lines = _count_lines(db, take.id)
+    if not total_lines:
+        raise HTTPException(status_code=400, detail="Stock take belum punya hitungan")
+
+    # 1. Satu kali lock, urut id
+    db.execute(
+        select(product.id)
+        .where(product.id.in_(take_product_ids))
+        .order_by(product.id)
+        .with_for_update()
+    ).all()
+
+    # 2. Snapshot stok sistem + selisih ke baris stock take
+    current_stock = (
+        select(func.coalesce(product.stock_qty, 0))
+        .where(product.id == line.product_id)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(line)
+        .where(line.stock_take_id == take.id)
+        .values(system_qty=current_stock, variance=line.counted_qty - current_stock)
+        .execution_options(synchronize_session=False)
+    )
+
+    # 3. StockMovement ADJUST untuk semua yang selisih
+    notes = f"Stock take #{take.id}"
+    db.execute(
+        insert(models.StockMovement).from_select(
+            ["product_id", "type", "ref_type", "ref_id", "qty_change", "stock_before", "stock_after", "notes"],
+            select(
+                line.product_id,
+                literal("ADJUST"),
+                literal("STOCK_TAKE"),
+                literal(take.id),
+                line.variance,
+                line.system_qty,
+                line.counted_qty,
+                literal(notes),
+            )
+            .where(line.stock_take_id == take.id, line.variance != 0)
+            .order_by(line.product_id),
+        )
+    )
+
+    # 4. Update stok product = counted_qty
+    counted_qty = (
+        select(line.counted_qty)
+        .where(line.stock_take_id == take.id, line.product_id == product.id)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        update(product)
+        .where(
+            product.id.in_(
+                select(line.product_id).where(line.stock_take_id == take.id, line.variance != 0)
+            )
+        )
+        .values(stock_qty=counted_qty)
+        .execution_options(synchronize_session=False)
+    )
+    adjusted = result.rowcount or 0
+
+    take.status = "POSTED"
+    take.posted_at = datetime.now(timezone.utc)
+    db.commit()
+    db.refresh(take)
+
+    return schemas.StockTakePostOut(
+        stock_take_id=take.id,
+        status=take.status,
+        posted_at=take.posted_at,
+        total_lines=total_lines,
+        adjusted_products=adjusted,
+    )
+
+
+@router.post("/{stock_take_id}/cancel", response_model=schemas.StockTakeOut)
+def cancel_stock_take(
+    stock_take_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user),
+):
+    take = _get_stock_take(db, stock_take_id, lock=True)
+    _require_draft(take)
+    take.status = "CANCELLED"
+    db.commit()
+    db.refresh(take)
+    return take
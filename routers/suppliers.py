@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 import models, schemas
-from db import get_db
+from db import get_db, get_async_read_db
 from routers.auth import get_current_user
 
 router = APIRouter(
@@ -29,9 +31,9 @@ def create_supplier(
 
 
 @router.get("/", response_model=list[schemas.SupplierOut])
-def list_suppliers(
-    db: Session = Depends(get_db),
+async def list_suppliers(
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: models.User = Depends(get_current_user),
 ):
-    suppliers = db.query(models.Supplier).order_by(models.Supplier.name).all()
-    return suppliers
+    result = await db.execute(select(models.Supplier).order_by(models.Supplier.name))
+    return result.scalars().all()
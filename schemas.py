@@ -1,6 +1,6 @@
 # schemas.py
 from pydantic import BaseModel, ConfigDict, EmailStr
-from typing import Optional, List
+from typing import Any, Optional, List
 from datetime import datetime, date
 from decimal import Decimal
 from enum import Enum
@@ -467,8 +467,15 @@ class PurchasePlanOut(BaseModel):
     target_date: Optional[datetime]
     notes: Optional[str]
     status: str
+    created_at: Optional[datetime] = None
     items: List[PurchasePlanItemOut]
 
+    # progress (dihitung di SQL saat list / get)
+    total_planned_qty: Optional[Decimal] = None
+    total_received_qty: Optional[Decimal] = None
+    percent_received: Optional[Decimal] = None
+    outstanding_value: Optional[Decimal] = None
+
 class AccountBase(BaseModel):
     name: str
     type: str
@@ -485,4 +492,240 @@ class AccountOut(AccountBase):
     updated_at: datetime | None = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# ===== Stock Take (cycle count) =====
+
+class StockTakeCreate(BaseModel):
+    notes: Optional[str] = None
+
+
+class StockTakeOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    status: str
+    notes: Optional[str] = None
+    created_at: Optional[datetime] = None
+    posted_at: Optional[datetime] = None
+
+
+class StockTakeCountIn(BaseModel):
+    product_id: Optional[int] = None   # salah satu: product_id atau sku
+    sku: Optional[str] = None
+    counted_qty: Decimal
+
+
+class StockTakeCountsIn(BaseModel):
+    counts: List[StockTakeCountIn]
+
+
+class StockTakeCountsOut(BaseModel):
+    stock_take_id: int
+    lines_received: int
+    total_lines: int
+
+
+class StockTakeVarianceLine(BaseModel):
+    product_id: int
+    sku: str
+    product_name: str
+    system_qty: Decimal
+    counted_qty: Decimal
+    variance: Decimal
+
+
+class StockTakeVarianceOut(BaseModel):
+    stock_take_id: int
+    status: str
+    total_lines: int
+    lines_with_variance: int
+    net_variance: Decimal
+    lines: List[StockTakeVarianceLine]
+
+
+class StockTakePostOut(BaseModel):
+    stock_take_id: int
+    status: str
+    posted_at: Optional[datetime] = None
+    total_lines: int
+    adjusted_products: int
+
+
+# ===== Buildable qty (recipe) =====
+
+class BuildableOut(BaseModel):
+    product_id: int
+    sku: str
+    product_name: str
+    stock_qty: Decimal
+    buildable_qty: Decimal
+    limiting_component_id: Optional[int] = None
+    baseline_buildable_qty: Optional[Decimal] = None   # hanya diisi di mode what-if
+
+
+class BuildableWhatIfItem(BaseModel):
+    product_id: int
+    qty: Decimal   # qty pembelian hipotetis
+
+
+class BuildableWhatIfIn(BaseModel):
+    purchases: List[BuildableWhatIfItem]
+
+
+# ===== Production Orders (build batch) =====
+
+class BuildBatchIn(BaseModel):
+    notes: Optional[str] = None
+    items: List[BuildFromRecipeIn]
+
+
+class ProductionOrderItemOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    product_id: int
+    qty: Decimal
+
+
+class ProductionOrderOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    status: str
+    notes: Optional[str] = None
+    created_at: Optional[datetime] = None
+    items: List[ProductionOrderItemOut] = []
+
+
+class BuildBatchOut(BaseModel):
+    production_order_id: int
+    status: str
+    lines: List[BuildFromRecipeOut]
+
+
+class RecipeCostOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    product_id: int
+    unit_cost: Decimal
+    computed_at: Optional[datetime] = None
+
+
+# ===== MRP (material requirements planning) =====
+
+class MrpDemandItem(BaseModel):
+    product_id: int
+    qty: Decimal
+
+
+class MrpIn(BaseModel):
+    source: str = "planned"              # planned = hanya `demand`; forecast = forecast horizon + `demand`
+    demand: List[MrpDemandItem] = []
+    # dipakai kalau source = forecast (lihat forecasting.forecast)
+    horizon_days: int = 14
+    method: str = "ses"
+    history_days: int = 90
+    product_ids: Optional[List[int]] = None   # batasi product yang di-forecast, kosong = semua aktif
+
+
+class MrpLine(BaseModel):
+    product_id: int
+    sku: str
+    product_name: str
+    unit: Optional[str] = None
+    make_or_buy: str                 # MAKE (punya recipe) / BUY
+    gross_requirement: Decimal
+    stock_qty: Decimal
+    on_order_qty: Decimal            # sisa PurchasePlan OPEN / PARTIAL / DRAFT belum kedaluwarsa
+    net_requirement: Decimal
+    supplier_id: Optional[int] = None
+    supplier_name: Optional[str] = None
+
+
+class MrpSupplierGroup(BaseModel):
+    supplier_id: Optional[int] = None
+    supplier_name: Optional[str] = None
+    items: List[MrpLine]
+
+
+class MrpOut(BaseModel):
+    lines: List[MrpLine]
+    suppliers: List[MrpSupplierGroup]
+
+
+# ===== Reorder engine =====
+
+class ReorderRunIn(BaseModel):
+    lead_time_days: int = 7
+    review_days: int = 14        # stok untuk berapa hari setelah barang datang
+    lookback_days: int = 30      # histori pemakaian yang dipakai
+    service_z: float = 1.65      # ~95% service level
+    apply_min_stock: bool = False   # tulis reorder point ke products.min_stock
+    dry_run: bool = False
+
+
+class ReorderSuggestionOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    product_id: int
+    sku: str
+    product_name: str
+    avg_daily_usage: Decimal
+    reorder_point: Decimal
+    reorder_qty: Decimal
+    stock_qty: Decimal
+    on_order_qty: Decimal
+    supplier_id: Optional[int] = None
+    supplier_name: Optional[str] = None
+
+
+class ReorderRunOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    evaluated_products: int
+    suggestions: List[ReorderSuggestionOut]
+    created_plan_ids: List[int]
+
+
+# ===== Customer dedup / merge =====
+
+class CustomerDuplicateOut(BaseModel):
+    customer_id_a: int
+    name_a: str
+    customer_id_b: int
+    name_b: str
+    score: float
+    reasons: List[str]
+
+
+class CustomerMergeIn(BaseModel):
+    source_ids: List[int]   # customer yang digabung ke customer target
+
+
+class CustomerMergeOut(BaseModel):
+    target_id: int
+    merged_ids: List[int]
+    sales_reassigned: int
+
+
+# ===== Background jobs =====
+
+class JobOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    type: str
+    status: str
+    params: Optional[dict] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    progress_current: int = 0
+    progress_total: Optional[int] = None
+    progress_message: Optional[str] = None
+    cancel_requested: bool = False
+    attempts: int = 0
+    created_by: Optional[int] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
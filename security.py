@@ -1,5 +1,11 @@
 # security.py
+import asyncio
+import math
 import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -14,13 +20,27 @@ SECRET_KEY = os.getenv("SECRET_KEY", "changeme-super-secret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 480))  # 8 jam default
 
+# Cost bcrypt bisa diatur lewat env. min = max = BCRYPT_ROUNDS, jadi hash lama
+# dengan cost berbeda terdeteksi needs_update dan di-rehash saat login berikutnya.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+
 # Configure password context with bcrypt
 pwd_context = CryptContext(
     schemes=["bcrypt"],
     deprecated="auto",
-    bcrypt__default_rounds=12,
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
 )
 
+# Pool khusus hashing: bcrypt melepas GIL, jadi thread cukup. Dibatasi supaya
+# lonjakan login tidak memakan thread pool request biasa.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
 
 def verify_password(plain_password: str, password_hash: str) -> bool:
     """
@@ -56,6 +76,86 @@ def get_password_hash(password: str) -> str:
         raise
 
 
+class HashPoolBusy(Exception):
+    """Antrian hashing penuh; request sebaiknya dicoba lagi."""
+
+
+def _verify_and_update(plain_password: str, password_hash: str) -> tuple[bool, Optional[str]]:
+    try:
+        return pwd_context.verify_and_update(plain_password, password_hash)
+    except ValueError as e:
+        if "72 bytes" in str(e):
+            return pwd_context.verify_and_update(plain_password[:72], password_hash)
+        raise
+
+
+async def _run_hashing(fn, *args):
+    if not _hash_slots.acquire(blocking=False):
+        raise HashPoolBusy()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, fn, *args)
+    finally:
+        _hash_slots.release()
+
+
+async def verify_password_async(plain_password: str, password_hash: str) -> tuple[bool, Optional[str]]:
+    """
+    Verify di pool hashing. Return (valid, new_hash); new_hash terisi kalau
+    hash lama perlu di-upgrade (cost BCRYPT_ROUNDS berubah).
+    """
+    return await _run_hashing(_verify_and_update, plain_password, password_hash)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hashing(get_password_hash, password)
+
+
+class LoginThrottle:
+    """
+    Batasi percobaan login gagal per key (username / IP) dalam jendela waktu.
+    In-memory per proses.
+    """
+
+    def __init__(self, max_failures: int, window_seconds: int, max_keys: int = 50000):
+        self.max_failures = max_failures
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._failures: dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, key: str, now: float) -> deque | None:
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window_seconds:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def retry_after(self, key: str) -> int:
+        """Detik sampai key boleh mencoba lagi (0 = boleh sekarang)."""
+        now = time.monotonic()
+        with self._lock:
+            failures = self._prune(key, now)
+            if failures is None or len(failures) < self.max_failures:
+                return 0
+            return max(1, math.ceil(failures[0] + self.window_seconds - now))
+
+    def record_failure(self, key: str):
+        now = time.monotonic()
+        with self._lock:
+            if key not in self._failures and len(self._failures) >= self.max_keys:
+                for stale in list(self._failures):
+                    self._prune(stale, now)
+            self._failures.setdefault(key, deque()).append(now)
+
+    def reset(self, key: str):
+        with self._lock:
+            self._failures.pop(key, None)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """
     Create JWT access token.
@@ -0,0 +1,67 @@
+# tests/conftest.py
+"""
+Fixture bersama: app jalan di atas file SQLite sementara (lihat db.py), jadi
+test tidak pernah menyentuh DATABASE_URL dari .env.
+"""
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# harus di-set sebelum db.py di-import (load_dotenv tidak menimpa env yang sudah ada)
+_tmpdir = tempfile.TemporaryDirectory(prefix="makadam-test-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmpdir.name, 'test.db')}"
+os.environ.pop("DATABASE_READ_URL", None)
+os.environ["DB_STARTUP_CHECK"] = "off"
+os.environ["DB_AUTO_MIGRATE"] = "0"
+
+TEST_USER = "tester"
+
+
+@pytest.fixture(scope="session")
+def app():
+    import main
+    import manage
+
+    manage.migrate(configure_logger=False)
+    return main.app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+
+    import models
+    from db import SessionLocal
+    from security import create_access_token
+
+    with SessionLocal() as db:
+        db.add(models.User(username=TEST_USER, password_hash="!", is_admin=True))
+        db.commit()
+
+    with TestClient(app) as c:
+        c.headers["Authorization"] = f"Bearer {create_access_token({'sub': TEST_USER})}"
+        yield c
+
+
+_SKU_COUNTER = itertools.count(1)
+
+
+@pytest.fixture
+def make_product(client):
+    """Buat produk lewat API, return id."""
+
+    def _make(product_type="RAW", stock=0, sku=None, **kw):
+        sku = sku or f"{product_type}-{os.getpid()}-{next(_SKU_COUNTER)}"
+        r = client.post("/products/", json=dict(
+            sku=sku, name=sku, product_type=product_type, stock_qty=stock, **kw,
+        ))
+        assert r.status_code == 201, r.text
+        return r.json()["id"]
+
+    return _make
@@ -0,0 +1,71 @@
+from starlette.requests import Request
+
+from routers import auth
+from security import LoginThrottle
+
+
+def _request(forwarded=None, peer="10.0.0.1"):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": "POST", "path": "/", "headers": headers, "client": (peer, 1234)})
+
+
+def test_client_ip_uses_trusted_hop(monkeypatch):
+    # client bisa menulis entry kiri sendiri; yang dipercaya hanya yang ditambahkan proxy
+    assert auth.client_ip(_request("6.6.6.6, 203.0.113.7")) == "203.0.113.7"
+    assert auth.client_ip(_request()) == "10.0.0.1"
+
+    monkeypatch.setattr(auth, "TRUSTED_PROXY_HOPS", 2)
+    assert auth.client_ip(_request("6.6.6.6, 203.0.113.7, 10.0.0.2")) == "203.0.113.7"
+
+    monkeypatch.setattr(auth, "TRUSTED_PROXY_HOPS", 0)
+    assert auth.client_ip(_request("203.0.113.7")) == "10.0.0.1"
+
+
+def _login(client, username, password, ip):
+    return client.post(
+        "/auth/login",
+        data={"username": username, "password": password},
+        headers={"X-Forwarded-For": ip},
+    )
+
+
+def test_ip_throttle_per_client_and_reset_on_success(client, monkeypatch):
+    monkeypatch.setattr(auth, "_ip_throttle", LoginThrottle(2, 300))
+    r = client.post("/auth/register", json={"username": "kasir-shift", "password": "rahasia-123"})
+    assert r.status_code == 200, r.text
+
+    assert _login(client, "kasir-a", "salah", "203.0.113.10").status_code == 401
+    assert _login(client, "kasir-b", "salah", "203.0.113.10").status_code == 401
+    assert _login(client, "kasir-c", "salah", "203.0.113.10").status_code == 429
+
+    # IP lain di belakang proxy yang sama tidak ikut terkunci
+    assert _login(client, "kasir-shift", "salah", "203.0.113.20").status_code == 401
+    assert _login(client, "kasir-shift", "rahasia-123", "203.0.113.20").status_code == 200
+    assert _login(client, "kasir-d", "salah", "203.0.113.20").status_code == 401
+    assert _login(client, "kasir-e", "salah", "203.0.113.20").status_code == 401
+
+
+def test_deactivation_outside_orm_reaches_cache(client, monkeypatch):
+    from sqlalchemy import update
+
+    import models
+    from db import SessionLocal
+    from security import create_access_token
+
+    with SessionLocal() as db:
+        db.add(models.User(username="kasir-cache", password_hash="!", is_admin=False))
+        db.commit()
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'kasir-cache'})}"}
+
+    monkeypatch.setattr(auth, "AUTH_CACHE_RECHECK_SECONDS", 3600)
+    monkeypatch.setattr(auth, "_last_recheck", float("-inf"))
+    assert client.get("/jobs/", headers=headers).status_code == 200
+
+    # UPDATE Core (atau worker lain / SQL manual): tidak ada event ORM
+    with SessionLocal() as db:
+        db.execute(update(models.User).where(models.User.username == "kasir-cache").values(is_active=False))
+        db.commit()
+    assert client.get("/jobs/", headers=headers).status_code == 200   # masih dari cache
+
+    monkeypatch.setattr(auth, "_last_recheck", float("-inf"))
+    assert client.get("/jobs/", headers=headers).status_code == 401
@@ -0,0 +1,46 @@
+from routers.customers import PHONE_QUERY_RE, phone_prefixes
+
+
+def test_phone_query_needs_digits():
+    assert PHONE_QUERY_RE.match("0812")
+    assert PHONE_QUERY_RE.match("+62 812-3")
+    assert not PHONE_QUERY_RE.match("...")
+    assert not PHONE_QUERY_RE.match("(-)")
+    assert not PHONE_QUERY_RE.match("(1)")
+    assert phone_prefixes("...") == set()
+
+
+def test_search_punctuation_only_query(client):
+    r = client.post("/customers/", json={"name": "Titik Tiga", "phone": "0812-555"})
+    assert r.status_code == 201, r.text
+
+    for q in ("...", "(-)", "."):
+        r = client.get("/customers/", params={"q": q})
+        assert r.status_code == 200, r.text
+
+
+def test_search_by_phone_prefix(client):
+    r = client.post("/customers/", json={"name": "Budi Telepon", "phone": "+62 813-777-1"})
+    assert r.status_code == 201, r.text
+
+    r = client.get("/customers/", params={"q": "0813777"})
+    assert r.status_code == 200, r.text
+    assert "Budi Telepon" in [c["name"] for c in r.json()]
+
+
+def test_duplicates_run_as_job(client):
+    import jobs
+
+    for name in ("Siti Rahmawati", "Siti Rahmawaty"):
+        r = client.post("/customers/", json={"name": name, "phone": "0812-9090-77"})
+        assert r.status_code == 201, r.text
+
+    r = client.post("/customers/duplicates", params={"min_score": 0.5})
+    assert r.status_code == 202, r.text
+    assert r.json()["type"] == "customer_duplicates"
+
+    assert jobs.Worker(concurrency=1, poll_interval=0.05).run(once=True) == 1
+    job = client.get(f"/jobs/{r.json()['id']}").json()
+    assert job["status"] == "SUCCEEDED", job
+    pairs = {(c["name_a"], c["name_b"]) for c in job["result"]["candidates"]}
+    assert ("Siti Rahmawati", "Siti Rahmawaty") in pairs
@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+import db
+import manage
+
+# tabel yang dibuat create_all sebelum ada migrasi (revisi 0001)
+BASELINE_TABLES = {
+    "accounts", "cash_ledger", "customers", "expenses", "product_recipes", "products",
+    "purchase_order_items", "purchase_orders", "purchase_plan_items", "purchase_plans",
+    "sales_order_items", "sales_orders", "stock_movements", "suppliers", "users",
+}
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrate.db'}")
+    monkeypatch.setattr(db, "get_engine", lambda: engine)
+    yield engine
+    engine.dispose()
+
+
+def _schema(engine):
+    insp = inspect(engine)
+    return {
+        table: sorted(index["name"] for index in insp.get_indexes(table))
+        for table in insp.get_table_names()
+        if table != "alembic_version"
+    }
+
+
+def _expected(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'models.db'}")
+    db.Base.metadata.create_all(engine)
+    try:
+        return _schema(engine)
+    finally:
+        engine.dispose()
+
+
+def _legacy_baseline(engine):
+    """Database produksi lama: schema baseline tanpa alembic_version."""
+    manage.migrate(manage.BASELINE_REVISION, configure_logger=False)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE alembic_version"))
+    assert set(_schema(engine)) == BASELINE_TABLES
+
+
+def test_baseline_create_all_db_gets_feature_tables(engine, tmp_path):
+    _legacy_baseline(engine)
+
+    assert manage.migrate(configure_logger=False) == manage.BASELINE_REVISION
+    assert _schema(engine) == _expected(tmp_path)
+
+
+def test_partially_created_db_upgrades(engine, tmp_path):
+    # create_all versi aplikasi di tengah seri: sebagian tabel fitur sudah ada
+    tables = db.Base.metadata.tables
+    db.Base.metadata.create_all(engine, tables=[tables[name] for name in BASELINE_TABLES | {"stock_takes", "jobs"}])
+
+    manage.migrate(configure_logger=False)
+    assert _schema(engine) == _expected(tmp_path)
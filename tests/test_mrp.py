@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+
+def _line(body, product_id):
+    return next(line for line in body["lines"] if line["product_id"] == product_id)
+
+
+def _bom(client, make_product):
+    raw = make_product("RAW", stock=30)
+    paket = make_product("INTERNAL")
+    r = client.post("/recipes/", json={"product_id": paket, "component_product_id": raw, "qty_per_unit": 2})
+    assert r.status_code == 201, r.text
+    return raw, paket
+
+
+def test_mrp_planned_demand(client, make_product):
+    raw, paket = _bom(client, make_product)
+
+    r = client.post("/purchase-plans/mrp", json={"demand": [{"product_id": paket, "qty": 20}]})
+    assert r.status_code == 200, r.text
+    line = _line(r.json(), raw)
+    assert float(line["gross_requirement"]) == 40
+    assert float(line["net_requirement"]) == 10
+
+    assert client.post("/purchase-plans/mrp", json={"demand": []}).status_code == 400
+
+
+def test_mrp_forecast_demand(client, make_product):
+    import models
+    from db import SessionLocal
+
+    raw, paket = _bom(client, make_product)
+    today = datetime.combine(datetime.now().date(), datetime.min.time())
+    with SessionLocal() as db:
+        db.add_all(
+            models.StockMovement(
+                product_id=paket, type="OUT", ref_type="SALE", qty_change=10,
+                movement_date=today - timedelta(days=d, hours=-12),
+            )
+            for d in range(1, 15)
+        )
+        db.commit()
+
+    r = client.post("/purchase-plans/mrp", json={
+        "source": "forecast", "method": "ma", "horizon_days": 7, "product_ids": [paket],
+    })
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert float(_line(body, paket)["gross_requirement"]) == 70
+    assert float(_line(body, raw)["net_requirement"]) == 110
+
+    r = client.post("/purchase-plans/mrp", json={"source": "bogus"})
+    assert r.status_code == 400
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta, timezone
+
+
+def _plan(client, items):
+    r = client.post("/purchase-plans/", json={"supplier_name": "Sup Plan", "items": items})
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+def test_list_progress_per_page(client, make_product):
+    a = make_product("RAW", base_cost=1000)
+    b = make_product("RAW", base_cost=500)
+    first = _plan(client, [{"product_id": a, "planned_qty": 10}, {"product_id": b, "planned_qty": 4}])
+    second = _plan(client, [{"product_id": b, "planned_qty": 6}])
+
+    r = client.get("/purchase-plans/", params={"limit": 1})
+    assert r.status_code == 200, r.text
+    page = r.json()
+    assert [p["id"] for p in page] == [second]
+    assert float(page[0]["total_planned_qty"]) == 6
+    assert float(page[0]["outstanding_value"]) == 3000
+
+    r = client.get("/purchase-plans/", params={"limit": 1, "before_id": second})
+    assert [p["id"] for p in r.json()] == [first]
+
+    r = client.get(f"/purchase-plans/{first}")
+    assert r.status_code == 200, r.text
+    plan = r.json()
+    assert float(plan["total_planned_qty"]) == 14
+    assert float(plan["total_received_qty"]) == 0
+    assert float(plan["outstanding_value"]) == 12000
+    assert len(plan["items"]) == 2
+
+    assert client.get("/purchase-plans/999999").status_code == 404
+
+
+def _usage(product_id, qty_per_day, days=10):
+    import models
+    from db import SessionLocal
+
+    now = datetime.now(timezone.utc)
+    with SessionLocal() as db:
+        db.add_all(
+            models.StockMovement(
+                product_id=product_id, type="OUT", ref_type="SALE", qty_change=qty_per_day,
+                movement_date=now - timedelta(days=d),
+            )
+            for d in range(1, days + 1)
+        )
+        db.commit()
+
+
+def _draft_for(client, product_id):
+    r = client.post("/purchase-plans/reorder-run", json={})
+    assert r.status_code == 200, r.text
+    suggestion = next(s for s in r.json()["suggestions"] if s["product_id"] == product_id)
+    plans = client.get("/purchase-plans/", params={"status": "DRAFT", "limit": 200}).json()
+    plan = next(p for p in plans if any(i["product_id"] == product_id for i in p["items"]))
+    return suggestion, plan
+
+
+def _mrp_on_order(client, product_id):
+    r = client.post("/purchase-plans/mrp", json={"demand": [{"product_id": product_id, "qty": 1}]})
+    assert r.status_code == 200, r.text
+    return float(r.json()["lines"][0]["on_order_qty"])
+
+
+def test_draft_counts_as_on_order_for_mrp_and_reorder(client, make_product):
+    raw = make_product("RAW", stock=0)
+    _usage(raw, 5)
+    suggestion, plan = _draft_for(client, raw)
+    qty = float(suggestion["reorder_qty"])
+    assert qty > 0
+
+    # MRP dan reorder melihat draft yang sama
+    assert _mrp_on_order(client, raw) == qty
+    r = client.post("/purchase-plans/reorder-run", json={"dry_run": True})
+    assert raw not in [s["product_id"] for s in r.json()["suggestions"]]
+
+    r = client.post(f"/purchase-plans/{plan['id']}/cancel")
+    assert r.status_code == 200, r.text
+    assert r.json()["status"] == "CANCELLED"
+    assert _mrp_on_order(client, raw) == 0
+    assert client.post(f"/purchase-plans/{plan['id']}/confirm").status_code == 400
+
+
+def test_confirm_draft(client, make_product):
+    raw = make_product("RAW", stock=0)
+    _usage(raw, 3)
+    _, plan = _draft_for(client, raw)
+
+    r = client.post(f"/purchase-plans/{plan['id']}/confirm")
+    assert r.status_code == 200, r.text
+    assert r.json()["status"] == "OPEN"
+    assert client.post(f"/purchase-plans/{plan['id']}/confirm").status_code == 400
+
+
+def test_stale_draft_expires(client, make_product):
+    import models
+    import planning
+    from db import SessionLocal
+
+    raw = make_product("RAW", stock=0)
+    _usage(raw, 4)
+    _, plan = _draft_for(client, raw)
+
+    with SessionLocal() as db:
+        db.query(models.PurchasePlan).filter(models.PurchasePlan.id == plan["id"]).update(
+            {"created_at": datetime.now(timezone.utc) - timedelta(days=planning.DRAFT_EXPIRY_DAYS + 1)}
+        )
+        db.commit()
+    assert _mrp_on_order(client, raw) == 0
+
+    # run berikutnya membatalkan draft lama dan membuat draft baru
+    _, new_plan = _draft_for(client, raw)
+    assert new_plan["id"] != plan["id"]
+    assert client.get(f"/purchase-plans/{plan['id']}").json()["status"] == "CANCELLED"
+
+
+def test_reorder_usage_ignores_partial_today(client, make_product):
+    import models
+    from db import SessionLocal
+
+    raw = make_product("RAW", stock=0)
+    _usage(raw, 3, days=30)
+    with SessionLocal() as db:
+        db.add(models.StockMovement(
+            product_id=raw, type="OUT", ref_type="SALE", qty_change=300,
+            movement_date=datetime.now(timezone.utc),
+        ))
+        db.commit()
+
+    r = client.post("/purchase-plans/reorder-run", json={"dry_run": True, "lookback_days": 30})
+    assert r.status_code == 200, r.text
+    suggestion = next(s for s in r.json()["suggestions"] if s["product_id"] == raw)
+    # 30 hari penuh x 3; penjualan hari ini tidak menggeser rata-rata
+    assert float(suggestion["avg_daily_usage"]) == 3
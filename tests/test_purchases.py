@@ -0,0 +1,55 @@
+def _plan_item(client, product_id, qty=10):
+    r = client.post("/purchase-plans/", json={"supplier_name": "Sup Terima", "items": [
+        {"product_id": product_id, "planned_qty": qty},
+    ]})
+    assert r.status_code == 201, r.text
+    plan = r.json()
+    return plan["id"], plan["items"][0]["id"]
+
+
+def _purchase(client, product_id, plan_item_id, qty=4):
+    return client.post("/purchases/", json={
+        "supplier_id": None, "supplier_name": "Sup Terima", "invoice_number": None,
+        "purchase_date": "2026-10-19", "payment_method": "CREDIT", "notes": None,
+        "items": [{"product_id": product_id, "qty": qty, "unit_cost": 1000, "plan_item_id": plan_item_id}],
+    })
+
+
+def test_receive_against_open_plan(client, make_product):
+    raw = make_product("RAW")
+    plan_id, plan_item_id = _plan_item(client, raw)
+
+    r = _purchase(client, raw, plan_item_id)
+    assert r.status_code == 201, r.text
+    plan = client.get(f"/purchase-plans/{plan_id}").json()
+    assert plan["status"] == "PARTIAL"
+    assert float(plan["total_received_qty"]) == 4
+
+
+def test_receive_rejects_other_product(client, make_product):
+    raw, other = make_product("RAW"), make_product("RAW")
+    plan_id, plan_item_id = _plan_item(client, raw)
+
+    r = _purchase(client, other, plan_item_id)
+    assert r.status_code == 400, r.text
+    assert client.get(f"/purchase-plans/{plan_id}").json()["status"] == "OPEN"
+
+
+def test_receive_rejects_draft_and_cancelled_plans(client, make_product):
+    import models
+    from db import SessionLocal
+
+    raw = make_product("RAW")
+    draft_id, draft_item = _plan_item(client, raw)
+    with SessionLocal() as db:
+        db.query(models.PurchasePlan).filter(models.PurchasePlan.id == draft_id).update({"status": "DRAFT"})
+        db.commit()
+    assert _purchase(client, raw, draft_item).status_code == 400
+    assert client.get(f"/purchase-plans/{draft_id}").json()["status"] == "DRAFT"
+
+    cancelled_id, cancelled_item = _plan_item(client, raw)
+    assert client.post(f"/purchase-plans/{cancelled_id}/cancel").status_code == 200
+    assert _purchase(client, raw, cancelled_item).status_code == 400
+    plan = client.get(f"/purchase-plans/{cancelled_id}").json()
+    assert plan["status"] == "CANCELLED"
+    assert float(plan["total_received_qty"]) == 0
@@ -0,0 +1,44 @@
+import time
+
+from fastapi import Request, Response
+
+import db
+
+
+def _request(headers=None, cookies=None):
+    raw = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    if cookies:
+        raw.append((b"cookie", "; ".join(f"{k}={v}" for k, v in cookies.items()).encode()))
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def _marker(monkeypatch):
+    monkeypatch.setattr(db, "has_read_replica", lambda: True)
+    response = Response()
+    db.mark_write(response)
+    return response.headers[db.WRITE_MARKER_HEADER], response.headers["set-cookie"]
+
+
+def test_write_marker_from_cookie_or_header(monkeypatch):
+    marker, cookie = _marker(monkeypatch)
+    assert cookie.startswith(f"{db.WRITE_MARKER_COOKIE}={marker};")
+
+    # worker lain tidak butuh state proses: cukup penanda yang dibawa client
+    assert db.wrote_recently(_request(cookies={db.WRITE_MARKER_COOKIE: marker}))
+    assert db.wrote_recently(_request(headers={db.WRITE_MARKER_HEADER: marker}))
+    assert db.read_route(_request(headers={db.WRITE_MARKER_HEADER: marker})) == "primary"
+    assert not db.wrote_recently(_request())
+
+
+def test_write_marker_rejects_forged_or_expired(monkeypatch):
+    marker, _ = _marker(monkeypatch)
+    until, _, signature = marker.partition(".")
+
+    far = str(int(until) + 3600)
+    assert not db.wrote_recently(_request(headers={db.WRITE_MARKER_HEADER: f"{far}.{signature}"}))
+    assert not db.wrote_recently(
+        _request(headers={db.WRITE_MARKER_HEADER: f"{far}.{db._marker_signature(far)}"})
+    )
+
+    monkeypatch.setattr(time, "time", lambda: int(until) + 1)
+    assert not db.wrote_recently(_request(headers={db.WRITE_MARKER_HEADER: marker}))
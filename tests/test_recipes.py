@@ -0,0 +1,174 @@
+def _add_recipe(client, product_id, component_id, qty):
+    r = client.post("/recipes/", json={
+        "product_id": product_id, "component_product_id": component_id, "qty_per_unit": qty,
+    })
+    assert r.status_code == 201, r.text
+
+
+def _buildable(rows, product_id):
+    return next(row for row in rows if row["product_id"] == product_id)
+
+
+def test_buildable_shared_raw_component(client, make_product):
+    # paket = 1 A + 1 B, A = 2 RAW, B = 3 RAW -> 5 RAW per paket
+    raw = make_product("RAW", stock=80)
+    sub_a = make_product("INTERNAL")
+    sub_b = make_product("INTERNAL")
+    paket = make_product("INTERNAL")
+    _add_recipe(client, sub_a, raw, 2)
+    _add_recipe(client, sub_b, raw, 3)
+    _add_recipe(client, paket, sub_a, 1)
+    _add_recipe(client, paket, sub_b, 1)
+
+    r = client.get("/recipes/buildable")
+    assert r.status_code == 200, r.text
+    row = _buildable(r.json(), paket)
+    assert float(row["buildable_qty"]) == 16
+    assert row["limiting_component_id"] == raw
+
+    r = client.post("/recipes/buildable/what-if", json={"purchases": [{"product_id": raw, "qty": 20}]})
+    assert r.status_code == 200, r.text
+    row = _buildable(r.json(), paket)
+    assert float(row["buildable_qty"]) == 20
+    assert float(row["baseline_buildable_qty"]) == 16
+
+
+def test_buildable_uses_sub_assembly_stock(client, make_product):
+    # 4 unit A sudah jadi: 4 paket cukup 3 RAW/unit, sisanya 5 RAW/unit -> (80 - 12) // 5 + 4 = 17
+    raw = make_product("RAW", stock=80)
+    sub_a = make_product("INTERNAL", stock=4)
+    sub_b = make_product("INTERNAL")
+    paket = make_product("INTERNAL")
+    _add_recipe(client, sub_a, raw, 2)
+    _add_recipe(client, sub_b, raw, 3)
+    _add_recipe(client, paket, sub_a, 1)
+    _add_recipe(client, paket, sub_b, 1)
+
+    rows = client.get("/recipes/buildable").json()
+    assert float(_buildable(rows, paket)["buildable_qty"]) == 17
+    assert float(_buildable(rows, sub_a)["buildable_qty"]) == 40
+
+
+def _cached_costs(product_ids):
+    import models
+    from db import SessionLocal
+
+    with SessionLocal() as db:
+        return {
+            pid: float(cost)
+            for pid, cost in db.query(models.RecipeCost.product_id, models.RecipeCost.unit_cost)
+            .filter(models.RecipeCost.product_id.in_(product_ids))
+        }
+
+
+def test_recipe_cost_cached_on_write_not_on_read(client, make_product):
+    import models
+    from db import SessionLocal
+
+    raw = make_product("RAW", base_cost=1000)
+    sub = make_product("INTERNAL")
+    paket = make_product("INTERNAL")
+    _add_recipe(client, sub, raw, 2)
+    _add_recipe(client, paket, sub, 3)
+    assert _cached_costs([sub, paket]) == {sub: 2000, paket: 6000}
+
+    r = client.put(f"/products/{raw}", json={"base_cost": 1500})
+    assert r.status_code == 200, r.text
+    assert _cached_costs([sub, paket]) == {sub: 3000, paket: 9000}
+
+    # GET tidak menulis: cache yang hilang dihitung di memori saja
+    with SessionLocal() as db:
+        db.query(models.RecipeCost).filter(models.RecipeCost.product_id == paket).delete()
+        db.commit()
+    r = client.get(f"/recipes/{paket}/cost")
+    assert r.status_code == 200, r.text
+    assert float(r.json()["unit_cost"]) == 9000
+    assert _cached_costs([paket]) == {}
+
+
+def test_recipe_cost_cycle_is_not_cached(client, make_product):
+    raw = make_product("RAW", base_cost=100)
+    a = make_product("INTERNAL")
+    b = make_product("INTERNAL")
+    paket = make_product("INTERNAL")
+    _add_recipe(client, a, raw, 1)
+    _add_recipe(client, paket, a, 1)
+    _add_recipe(client, a, b, 1)
+    _add_recipe(client, b, a, 1)
+
+    assert _cached_costs([a, b, paket]) == {}
+    assert client.get(f"/recipes/{paket}/cost").status_code == 400
+    r = client.get("/recipes/costs", params={"product_id": [a, b, paket]})
+    assert r.status_code == 200, r.text
+    assert r.json() == []
+
+
+def _stock(client, product_id):
+    r = client.get(f"/products/{product_id}")
+    assert r.status_code == 200, r.text
+    return float(r.json()["stock_qty"])
+
+
+def test_build_batch_reports_all_shortages(client, make_product):
+    raw_a = make_product("RAW", stock=5)
+    raw_b = make_product("RAW", stock=1)
+    raw_ok = make_product("RAW", stock=100)
+    paket = make_product("INTERNAL")
+    _add_recipe(client, paket, raw_a, 2)
+    _add_recipe(client, paket, raw_b, 1)
+    _add_recipe(client, paket, raw_ok, 1)
+
+    r = client.post("/recipes/build-batch", json={"items": [{"product_id": paket, "qty_to_build": 3}]})
+    assert r.status_code == 400, r.text
+    detail = r.json()["detail"]
+    names = {pid: client.get(f"/products/{pid}").json()["name"] for pid in (raw_a, raw_b, raw_ok)}
+    assert f"{names[raw_a]}: butuh 6.00, stok 5.00, kurang 1.00" in detail
+    assert f"{names[raw_b]}: butuh 3.00, stok 1.00, kurang 2.00" in detail
+    assert names[raw_ok] not in detail
+    # semua atau tidak sama sekali
+    assert [_stock(client, pid) for pid in (raw_a, raw_b, raw_ok, paket)] == [5, 1, 100, 0]
+
+
+def test_build_batch_locks_once_in_id_order_and_nets_sub_assembly(client, make_product):
+    from sqlalchemy import event
+
+    from db import get_engine
+
+    raw = make_product("RAW", stock=10)
+    sub = make_product("INTERNAL")
+    paket = make_product("INTERNAL")
+    _add_recipe(client, sub, raw, 2)
+    _add_recipe(client, paket, sub, 1)
+
+    statements = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if "FROM products" in statement and "ORDER BY products.id" in statement:
+            statements.append(statement)
+
+    engine = get_engine()
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        # sub belum ada stoknya: line pertama membuatnya untuk line kedua
+        r = client.post("/recipes/build-batch", json={"items": [
+            {"product_id": sub, "qty_to_build": 4},
+            {"product_id": paket, "qty_to_build": 3},
+        ]})
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+    assert r.status_code == 201, r.text
+    assert len(statements) == 1
+
+    lines = r.json()["lines"]
+    assert [line["product_id"] for line in lines] == [sub, paket]
+    assert float(lines[1]["components"][0]["stock_before"]) == 4
+    assert [_stock(client, pid) for pid in (raw, sub, paket)] == [2, 1, 3]
+
+    # urutan terbalik: sub-assembly belum dibuild saat paket butuh
+    r = client.post("/recipes/build-batch", json={"items": [
+        {"product_id": paket, "qty_to_build": 2},
+        {"product_id": sub, "qty_to_build": 1},
+    ]})
+    assert r.status_code == 400, r.text
+    assert "kurang 1.00" in r.json()["detail"]
+    assert [_stock(client, pid) for pid in (raw, sub, paket)] == [2, 1, 3]
@@ -0,0 +1,134 @@
+import os
+import time
+
+import jobs
+
+
+def _run_worker():
+    return jobs.Worker(concurrency=1, poll_interval=0.05).run(once=True)
+
+
+def _job_files(job_id):
+    import models
+    from db import SessionLocal
+
+    with SessionLocal() as db:
+        return db.get(models.Job, job_id).params["files"]
+
+
+def test_admin_restore_is_a_job(client, make_product):
+    raw = make_product("RAW", stock=7)
+    # tabel dengan FK ke products ikut backup, jadi products bisa dikosongkan
+    take = client.post("/stock-takes/", json={}).json()
+    r = client.post(f"/stock-takes/{take['id']}/counts", json={"counts": [{"product_id": raw, "counted_qty": 6}]})
+    assert r.status_code == 200, r.text
+    backup_file = client.get("/admin/backup").content
+    products_before = len(client.get("/products/", params={"limit": 1000}).json())
+
+    r = client.post("/admin/restore", content=backup_file, headers={"Content-Type": "application/gzip"})
+    assert r.status_code == 202, r.text
+    job = r.json()
+    assert job["type"] == "restore"
+    assert job["status"] == "QUEUED"
+
+    assert _run_worker() == 1
+    job = client.get(f"/jobs/{job['id']}").json()
+    assert job["status"] == "SUCCEEDED", job
+    assert job["progress_current"] == job["progress_total"]
+    assert len(client.get("/products/", params={"limit": 1000}).json()) == products_before
+    assert client.get(f"/stock-takes/{take['id']}/variance").json()["total_lines"] == 1
+    assert not any(os.path.exists(path) for path in _job_files(job["id"]))
+
+
+def test_admin_restore_chain_is_a_job(client):
+    full = client.get("/admin/backup").content
+
+    r = client.post(
+        "/admin/restore/chain",
+        files=[("files", ("full.json.gz", full, "application/gzip"))],
+    )
+    assert r.status_code == 202, r.text
+    assert _run_worker() == 1
+    job = client.get(f"/jobs/{r.json()['id']}").json()
+    assert job["status"] == "SUCCEEDED", job
+    assert job["result"]["files"][0]["filename"] == "full.json.gz"
+
+
+def test_restore_progress_per_batch(client, make_product, tmp_path, monkeypatch):
+    import backup
+
+    for _ in range(3):
+        make_product("RAW")
+    path = tmp_path / "full.json.gz"
+    path.write_bytes(client.get("/admin/backup").content)
+    _, counts = backup.scan_file(str(path))
+
+    monkeypatch.setattr(backup, "RESTORE_CHUNK_SIZE", 2)
+    calls = []
+    backup.run_restore_chain([str(path)], check_chain=False, progress=lambda s, rows: calls.append((s, rows)))
+
+    products = [rows for section, rows in calls if section == "products"]
+    assert len(products) >= 2
+    assert sum(products) == counts["products"]
+    assert sum(rows for _, rows in calls) == sum(counts.values())
+
+
+def test_legacy_backup_keeps_tables_of_empty_sections(tmp_path):
+    import json
+
+    import backup
+    import models
+    from db import SessionLocal
+
+    with SessionLocal() as db:
+        db.add(models.SalesOrder(customer_name="Tetap Ada", total_amount=1000))
+        db.commit()
+        sales_before = db.query(models.SalesOrder).count()
+
+    # format export lama: meta tanpa type, sales/purchases selalu ditulis walau kosong
+    path = tmp_path / "legacy.json"
+    path.write_text(json.dumps({
+        "meta": {"generated_at": "2025-01-01T00:00:00", "app": "pos", "version": "1"},
+        "expenses": [{"id": 1, "category": "LISTRIK", "amount": "50000"}],
+        "sales": [],
+        "purchases": [],
+    }))
+    result = backup.run_restore_chain([str(path)], check_chain=False)[0]
+    assert result["restored"]["expenses"] == 1
+
+    with SessionLocal() as db:
+        assert db.query(models.SalesOrder).count() == sales_before
+        assert db.query(models.Expense).count() == 1
+
+
+def test_cleanup_job_files(client, tmp_path, monkeypatch):
+    import models
+    from db import SessionLocal
+
+    monkeypatch.setattr(jobs, "JOB_FILES_DIR", str(tmp_path))
+    r = client.post("/jobs/backup")
+    assert r.status_code == 202, r.text
+    assert _run_worker() == 1
+    backup_job = r.json()["id"]
+    assert client.get(f"/jobs/{backup_job}/download").status_code == 200
+
+    old = time.time() - jobs.JOB_FILE_TTL_SECONDS - 60
+    leftover, queued_input = tmp_path / "upload-leftover", tmp_path / "upload-queued"
+    for path in (leftover, queued_input):
+        path.write_bytes(b"{}")
+    for path in [leftover, queued_input, *tmp_path.glob("backup-*")]:
+        os.utime(path, (old, old))
+    fresh = tmp_path / "upload-fresh"
+    fresh.write_bytes(b"{}")
+
+    with SessionLocal() as db:
+        queued = models.Job(type="restore", status="QUEUED", params={"files": [str(queued_input)]})
+        db.add(queued)
+        db.commit()
+        assert jobs.cleanup_job_files(db) == 2
+        queued.status = "CANCELLED"
+        db.commit()
+
+    assert not leftover.exists()
+    assert queued_input.exists() and fresh.exists()
+    assert client.get(f"/jobs/{backup_job}/download").status_code == 410